@@ -0,0 +1,138 @@
+"""Adaptive per-provider concurrency limits (additive increase, multiplicative decrease)."""
+
+import re
+from typing import Any, Dict, Optional
+
+
+# Weights of the newest successful run in the recent and long-run latency averages
+RECENT_LATENCY_ALPHA = 0.3
+BASELINE_LATENCY_ALPHA = 0.05
+
+# Successful runs needed before latency spikes are looked for
+MIN_LATENCY_SAMPLES = 10
+
+
+def is_rate_limited(error: Optional[str], pattern: "re.Pattern[str]") -> bool:
+    """Whether a failed run's error (the CLI's stderr) says it hit an upstream rate limit."""
+    return bool(error) and pattern.search(error) is not None
+
+
+class AIMDLimit:
+    """
+    Concurrency limit that follows the capacity a provider actually has.
+
+    Like TCP congestion control: every successful run while the limit is
+    in use adds 1/limit, so the limit grows by about one per round of
+    runs. A run that hit an upstream rate limit, or a recent latency
+    average more than latency_tolerance times the long-run average, cuts
+    the limit by the backoff factor. Only one cut is made per round, since
+    runs started before a cut report the same congestion.
+
+    Other failures (bad prompts, timeouts) leave the limit alone.
+    """
+
+    def __init__(
+        self,
+        initial: int,
+        minimum: int,
+        maximum: int,
+        backoff: float,
+        latency_tolerance: float
+    ):
+        """
+        Args:
+            initial: Limit to start with
+            minimum: Limit never goes below this
+            maximum: Limit never goes above this
+            backoff: Factor the limit is multiplied by on congestion (0 to 1)
+            latency_tolerance: Recent/long-run latency ratio counted as a spike; 0 disables
+        """
+        self.minimum = max(minimum, 1)
+        self.maximum = max(maximum, self.minimum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+
+        self.recent_latency: Optional[float] = None
+        self.baseline_latency: Optional[float] = None
+        self._latency_samples = 0
+        # Runs finished since the last cut; starts high so the first signal counts
+        self._since_decrease = float("inf")
+
+        self.increases = 0
+        self.decreases = 0
+        self.last_decrease_reason: Optional[str] = None
+
+    @property
+    def value(self) -> int:
+        """The limit as a number of runs."""
+        return int(self.limit)
+
+    def record(self, success: bool, latency: float, rate_limited: bool, saturated: bool) -> bool:
+        """
+        Adjust the limit after a run.
+
+        Args:
+            success: Whether the run succeeded
+            latency: Seconds the run took
+            rate_limited: Whether it failed on an upstream rate limit
+            saturated: Whether every slot was in use, so the limit was
+                actually what held requests back
+
+        Returns:
+            Whether the limit (as a number of runs) went up
+        """
+        self._since_decrease += 1
+        if rate_limited:
+            self._decrease("rate_limited")
+            return False
+        if not success:
+            return False
+
+        if self._latency_spike(latency):
+            self._decrease("latency")
+            return False
+
+        if not saturated or self.limit >= self.maximum:
+            return False
+        before = self.value
+        self.limit = min(self.maximum, self.limit + 1 / self.limit)
+        if self.value > before:
+            self.increases += 1
+            return True
+        return False
+
+    def _latency_spike(self, latency: float) -> bool:
+        """Fold a successful run's latency into the averages; True if recent runs are far slower."""
+        if self.recent_latency is None:
+            self.recent_latency = self.baseline_latency = latency
+        else:
+            self.recent_latency += RECENT_LATENCY_ALPHA * (latency - self.recent_latency)
+            self.baseline_latency += BASELINE_LATENCY_ALPHA * (latency - self.baseline_latency)
+        self._latency_samples += 1
+        return (
+            self.latency_tolerance > 0
+            and self._latency_samples >= MIN_LATENCY_SAMPLES
+            and self.recent_latency > self.latency_tolerance * self.baseline_latency
+        )
+
+    def _decrease(self, reason: str):
+        if self._since_decrease < self.limit:
+            return
+        self.limit = max(self.minimum, self.limit * self.backoff)
+        self._since_decrease = 0
+        self.decreases += 1
+        self.last_decrease_reason = reason
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot for the API."""
+        return {
+            "limit": self.value,
+            "min_limit": self.minimum,
+            "max_limit": self.maximum,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "last_decrease_reason": self.last_decrease_reason,
+            "recent_latency": self.recent_latency,
+            "baseline_latency": self.baseline_latency,
+        }
@@ -0,0 +1,236 @@
+"""
+Worker agent: runs prompts sent by a coordinator's RemoteProviders.
+
+The agent runs the local providers with their own scheduler limits and
+worker pools, like a server would, and answers over a TCP connection
+carrying JSON lines (see backend/providers/remote.py). On SIGTERM or
+SIGINT it drains: new runs are refused, so coordinators send them to
+other workers, and the agent exits once the runs it has finish.
+
+Usage:
+    python -m backend.agent
+    python -m backend.agent --host 0.0.0.0 --port 7101 --name node1
+"""
+
+import argparse
+import asyncio
+import hmac
+import json
+import signal
+import socket
+from typing import Any, Awaitable, Callable, Dict, Set
+
+from .config import config
+from .providers import registry
+from .providers.output import JSON
+from .providers.remote import DEFAULT_PORT, MAX_MESSAGE_BYTES, PROTOCOL_VERSION, encode
+from .scheduler import SchedulerError, scheduler
+
+
+Send = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# Seconds a drained agent keeps refusing runs before it exits, so runs sent
+# before a coordinator heard of the drain are refused rather than lost
+DRAIN_GRACE = 0.5
+
+
+class WorkerAgent:
+    """Serves coordinator connections; every connection can carry many concurrent runs."""
+
+    def __init__(self, name: str, token: str):
+        """
+        Args:
+            name: Name reported to coordinators
+            token: REMOTE_TOKEN coordinators must send; empty accepts any
+        """
+        self.name = name
+        self.token = token
+        self.draining = False
+        self.in_flight = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._connections: Set[Send] = set()
+
+    def status(self) -> Dict[str, Any]:
+        """Availability and load of every provider, sent in hello and pong."""
+        providers = {}
+        for name in registry.list_all():
+            status = registry.cached_status(name)
+            queue = scheduler.queue(name)
+            providers[name] = {
+                "available": bool(status and status["available"]),
+                "version": status["version"] if status else None,
+                "error": status["error"] if status else "not checked yet",
+                "busy": queue.in_flight + queue.queue_depth,
+                "limit": queue.limit,
+            }
+        return {"name": self.name, "draining": self.draining, "providers": providers}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one coordinator connection until it closes."""
+        lock = asyncio.Lock()
+        tasks: Dict[int, asyncio.Task] = {}
+
+        async def send(message: Dict[str, Any]):
+            async with lock:
+                writer.write(encode(message))
+                await writer.drain()
+
+        try:
+            hello = json.loads(await reader.readline() or "null")
+            if not isinstance(hello, dict) or hello.get("op") != "hello":
+                await send({"op": "error", "error": "expected hello"})
+                return
+            if not hmac.compare_digest(str(hello.get("token") or ""), self.token):
+                await send({"op": "error", "error": "invalid token"})
+                return
+            if hello.get("version") != PROTOCOL_VERSION:
+                await send({"op": "error", "error": f"protocol version {PROTOCOL_VERSION} required"})
+                return
+            await send({"op": "hello", "version": PROTOCOL_VERSION, **self.status()})
+            self._connections.add(send)
+
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                op, call_id = message.get("op"), message.get("id")
+                if op == "ping":
+                    await send({"op": "pong", "id": call_id, **self.status()})
+                elif op == "run":
+                    task = asyncio.ensure_future(self._run(message, send))
+                    tasks[call_id] = task
+                    task.add_done_callback(lambda _, call_id=call_id: tasks.pop(call_id, None))
+                elif op == "cancel":
+                    # Runs that already finished have nothing to cancel
+                    if call_id in tasks:
+                        tasks[call_id].cancel()
+                else:
+                    await send({"op": "error", "id": call_id, "error": f"unknown op {op!r}"})
+        except (OSError, ValueError):
+            pass  # Connection dropped or garbled; its runs are cancelled below
+        finally:
+            self._connections.discard(send)
+            for task in list(tasks.values()):
+                task.cancel()
+            writer.close()
+
+    async def _run(self, message: Dict[str, Any], send: Send):
+        """Run one prompt and send its result, or its events when streaming."""
+        call_id = message["id"]
+        provider = registry.get(message.get("provider", ""))
+        try:
+            if provider is None:
+                await send({"op": "error", "id": call_id, "error": f"Provider '{message.get('provider')}' not found"})
+                return
+            if self.draining:
+                await send({"op": "refused", "id": call_id, "error": f"Worker {self.name} is draining"})
+                return
+            self.in_flight += 1
+            self._idle.clear()
+            try:
+                await self._execute(provider, message, send)
+            finally:
+                self.in_flight -= 1
+                if self.in_flight == 0:
+                    self._idle.set()
+        except SchedulerError as e:
+            await send({"op": "refused", "id": call_id, "error": str(e), "retry_after": e.retry_after})
+        except OSError:
+            pass  # The coordinator went away
+
+    async def _execute(self, provider, message: Dict[str, Any], send: Send):
+        call_id = message["id"]
+        prompt, working_directory = message["prompt"], message.get("working_directory")
+        json_mode = message.get("mode") == JSON
+        async with scheduler.slot(provider.name):
+            if message.get("stream"):
+                if json_mode:
+                    events = provider.execute_json_stream(prompt, working_directory)
+                else:
+                    events = provider.execute_stream(prompt, working_directory)
+                async for event in events:
+                    await send({"op": "event", "id": call_id, "event": event})
+                return
+            # The coordinator cancels runs at its timeout; this only guards against a lost cancel
+            timeout = config.for_provider(provider.name, "EXECUTION_TIMEOUT", config.EXECUTION_TIMEOUT)
+            execution = provider.execute_json if json_mode else provider.execute
+            try:
+                result = await asyncio.wait_for(execution(prompt, working_directory), timeout)
+            except asyncio.TimeoutError:
+                result = {
+                    "success": False,
+                    "response": "",
+                    "error": f"Execution timed out after {timeout:g}s",
+                    "execution_time": timeout,
+                    "timed_out": True
+                }
+        await send({"op": "result", "id": call_id, "result": result})
+
+    async def drain(self, timeout: float) -> bool:
+        """
+        Refuse new runs and wait for the running ones to finish.
+
+        Connected coordinators are told right away, so they stop sending
+        runs here without waiting for their next health check.
+
+        Returns:
+            Whether every run finished within timeout seconds
+        """
+        self.draining = True
+        await asyncio.gather(
+            *(send({"op": "draining"}) for send in list(self._connections)),
+            return_exceptions=True
+        )
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            await asyncio.sleep(DRAIN_GRACE)
+
+
+async def serve(args):
+    """Run the agent until SIGTERM or SIGINT, then drain and stop."""
+    agent = WorkerAgent(args.name, config.REMOTE_TOKEN)
+    await registry.get_all_statuses(config.AVAILABILITY_TTL)
+    refresh_task = asyncio.ensure_future(
+        registry.refresh_periodically(config.AVAILABILITY_REFRESH_INTERVAL)
+    )
+    registry.start_pools()
+    server = await asyncio.start_server(agent.handle, args.host, args.port, limit=MAX_MESSAGE_BYTES)
+    print(f"Worker agent {args.name} listening on {args.host}:{args.port}", flush=True)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    await stop.wait()
+
+    print(f"Draining ({agent.in_flight} runs in flight)", flush=True)
+    if not await agent.drain(args.drain_timeout):
+        print(f"Stopping with {agent.in_flight} runs still in flight", flush=True)
+    server.close()
+    refresh_task.cancel()
+    await registry.close_pools()
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Run prompts for a coordinator's RemoteProviders")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--name", default=socket.gethostname(),
+                        help="Name reported to coordinators (default: the host name)")
+    parser.add_argument("--drain-timeout", type=float, default=config.EXECUTION_TIMEOUT,
+                        help="Seconds to wait for running prompts on shutdown (default: EXECUTION_TIMEOUT)")
+    args = parser.parse_args()
+    asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""Files holding CLI output too large to return inline (/api/artifacts)."""
+
+import asyncio
+import codecs
+import os
+import re
+import time
+import uuid
+from typing import BinaryIO, Optional, Tuple
+
+from .config import config
+
+
+# Artifact ids are uuid4 hex strings; anything else is never a valid path
+ARTIFACT_ID = re.compile(r"^[0-9a-f]{32}$")
+
+# Seconds between purges of expired artifacts
+PURGE_INTERVAL = 600
+
+
+class ArtifactStore:
+    """
+    Output files in a directory, deleted after ARTIFACT_RETENTION seconds.
+
+    Artifacts are plain files named by id, so every worker process
+    serving the same directory can return any of them.
+    """
+
+    def __init__(self, directory: str, retention: float):
+        self.directory = directory
+        self.retention = retention
+
+    def create(self) -> Tuple[str, BinaryIO]:
+        """
+        Create an empty artifact.
+
+        Returns:
+            (artifact id, file opened for binary writing)
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        artifact_id = uuid.uuid4().hex
+        return artifact_id, open(os.path.join(self.directory, artifact_id), "wb")
+
+    def path(self, artifact_id: str) -> Optional[str]:
+        """Path of an artifact, or None if the id is malformed or it no longer exists."""
+        if not ARTIFACT_ID.match(artifact_id):
+            return None
+        path = os.path.join(self.directory, artifact_id)
+        return path if os.path.isfile(path) else None
+
+    def purge(self) -> int:
+        """
+        Delete artifacts older than the retention period.
+
+        Returns:
+            Number of artifacts deleted
+        """
+        cutoff = time.time() - self.retention
+        deleted = 0
+        try:
+            entries = list(os.scandir(self.directory))
+        except FileNotFoundError:
+            return 0
+        for entry in entries:
+            if not ARTIFACT_ID.match(entry.name):
+                continue
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.unlink(entry.path)
+                    deleted += 1
+            except FileNotFoundError:
+                pass  # Purged by another worker
+        return deleted
+
+    async def purge_periodically(self, interval: float):
+        """
+        Purge forever, every interval seconds.
+
+        Meant to run as a background task for the lifetime of the app.
+        """
+        while True:
+            self.purge()
+            await asyncio.sleep(interval)
+
+
+class CappedOutput:
+    """
+    Collects a CLI's stdout with bounded memory.
+
+    The first inline_bytes are kept in memory. If the output grows past
+    that, everything is written to an artifact instead and only the
+    first inline_bytes stay in memory as a preview. Output past
+    max_bytes is dropped.
+    """
+
+    def __init__(self, store: ArtifactStore, inline_bytes: int, max_bytes: int):
+        """
+        Args:
+            store: Where to write output that doesn't fit inline
+            inline_bytes: Bytes returned inline
+            max_bytes: Bytes kept in total, inline or in the artifact
+        """
+        self.store = store
+        self.inline_bytes = inline_bytes
+        self.max_bytes = max(max_bytes, inline_bytes)
+        self.head = bytearray()
+        self.total = 0  # Bytes received, including dropped ones
+        self.artifact_id: Optional[str] = None
+        self._file: Optional[BinaryIO] = None
+
+    @property
+    def truncated(self) -> bool:
+        """Whether the inline output is missing part of what the CLI printed."""
+        return self.total > self.inline_bytes
+
+    def write(self, data: bytes):
+        """Add the next piece of stdout."""
+        kept = min(self.total, self.max_bytes)
+        self.total += len(data)
+        if kept + len(data) > self.max_bytes:
+            data = data[:self.max_bytes - kept]
+            if not data:
+                return
+
+        if self._file is None and kept + len(data) <= self.inline_bytes:
+            self.head += data
+            return
+        if self._file is None:
+            self.artifact_id, self._file = self.store.create()
+            self._file.write(self.head)
+            self.head += data[:self.inline_bytes - len(self.head)]
+        self._file.write(data)
+
+    def close(self):
+        """Finish writing the artifact, if any."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """Delete the artifact of a run whose output won't be returned."""
+        self.close()
+        if self.artifact_id is not None:
+            path = self.store.path(self.artifact_id)
+            if path is not None:
+                os.unlink(path)
+            self.artifact_id = None
+
+    def text(self) -> str:
+        """The inline output, decoded; a character cut off at the limit is left out."""
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        return decoder.decode(bytes(self.head), final=not self.truncated)
+
+    def result_fields(self) -> dict:
+        """Fields added to an execute() result when the output was truncated."""
+        if not self.truncated:
+            return {}
+        return {"truncated": True, "output_bytes": self.total, "artifact_id": self.artifact_id}
+
+
+# Global artifact store instance
+artifact_store = ArtifactStore(config.ARTIFACTS_DIR, config.ARTIFACT_RETENTION)
@@ -0,0 +1,238 @@
+"""Response cache for provider executions."""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+from .config import config
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Normalize line endings and surrounding whitespace so trivially different prompts share a key."""
+    return prompt.replace("\r\n", "\n").strip()
+
+
+def working_directory_identity(working_directory: Optional[str]) -> str:
+    """
+    Identify a working directory independent of how its path was spelled.
+
+    Uses the resolved path plus device/inode, so a directory that is
+    deleted and recreated at the same path gets a new identity.
+    """
+    path = os.path.realpath(working_directory or os.getcwd())
+    try:
+        st = os.stat(path)
+        return f"{path}:{st.st_dev}:{st.st_ino}"
+    except OSError:
+        return path
+
+
+def prompt_key(
+    provider: str,
+    prompt: str,
+    working_directory: Optional[str],
+    output_format: str = "text"
+) -> str:
+    """
+    Build the key identifying an execution.
+
+    Args:
+        provider: Provider name
+        prompt: The prompt as sent by the client
+        working_directory: Working directory for execution
+        output_format: Requested output format; "text" leaves the key as it always was
+
+    Returns:
+        Hex digest of provider, normalized prompt, working directory identity
+        and output format
+    """
+    digest = hashlib.sha256()
+    parts = [provider, normalize_prompt(prompt), working_directory_identity(working_directory)]
+    if output_format != "text":
+        parts.append(output_format)
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class CacheBackend(ABC):
+    """Storage for cached results."""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the stored value, or None if missing or expired."""
+        pass
+
+    @abstractmethod
+    def set(self, key: str, value: Dict[str, Any], ttl: float):
+        """Store a value for ttl seconds, evicting the least recently used entry if full."""
+        pass
+
+    @abstractmethod
+    def clear(self):
+        """Remove all entries."""
+        pass
+
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU cache."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float):
+        self._entries[key] = (time.time() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """On-disk LRU cache so hits survive restarts."""
+
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_response_cache_access ON response_cache (last_access)"
+        )
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at <= now:
+                self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute(
+                "UPDATE response_cache SET last_access = ? WHERE key = ?", (now, key)
+            )
+        return json.loads(value)
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now)
+            )
+            self._conn.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                "SELECT key FROM response_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache")
+
+
+class ResponseCache:
+    """
+    Caches successful provider results keyed on provider, prompt and working directory.
+
+    Disabled unless CACHE_ENABLED is set; clients can also bypass it or set
+    their own TTL per request.
+    """
+
+    def __init__(self, backend: CacheBackend, default_ttl: float, enabled: bool = True):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+
+    def get(
+        self,
+        provider: str,
+        prompt: str,
+        working_directory: Optional[str],
+        output_format: str = "text"
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result.
+
+        Returns:
+            The cached execute() result, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        return self.backend.get(prompt_key(provider, prompt, working_directory, output_format))
+
+    def set(
+        self,
+        provider: str,
+        prompt: str,
+        working_directory: Optional[str],
+        result: Dict[str, Any],
+        ttl: Optional[float] = None,
+        output_format: str = "text"
+    ):
+        """
+        Store a result if caching is enabled and the execution succeeded.
+
+        Truncated results aren't stored, since their artifact is deleted
+        on its own schedule.
+
+        Args:
+            ttl: Seconds to keep the entry; defaults to CACHE_TTL, 0 skips storing
+            output_format: Output format the result was produced in
+        """
+        ttl = self.default_ttl if ttl is None else ttl
+        if not self.enabled or not result.get("success") or result.get("truncated") or ttl <= 0:
+            return
+        self.backend.set(prompt_key(provider, prompt, working_directory, output_format), result, ttl)
+
+
+def create_cache() -> ResponseCache:
+    """Build the response cache from configuration."""
+    if config.CACHE_BACKEND == "sqlite":
+        backend: CacheBackend = SQLiteCacheBackend(config.CACHE_PATH, config.CACHE_MAX_ENTRIES)
+    else:
+        backend = MemoryCacheBackend(config.CACHE_MAX_ENTRIES)
+    return ResponseCache(backend, config.CACHE_TTL, enabled=config.CACHE_ENABLED)
+
+
+# Global cache instance
+response_cache = create_cache()
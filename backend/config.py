@@ -13,5 +13,156 @@ class Config:
     HOST = os.getenv("HOST", "0.0.0.0")
     DEFAULT_PROVIDER = os.getenv("DEFAULT_PROVIDER", "claude")
 
+    # Server processes; with more than one, global state lives in SHARED_STATE_PATH
+    WORKERS = int(os.getenv("WORKERS", "1"))
+    SHARED_STATE_PATH = os.getenv("SHARED_STATE_PATH", "data/shared.db")
+
+    # API keys: comma-separated "name:key" or "name:key:requests_per_minute"; empty disables auth
+    API_KEYS = os.getenv("API_KEYS", "")
+    API_ADMINS = os.getenv("API_ADMINS", "")  # Key names that may see everyone's usage
+
+    # Token-bucket rate limits in requests per minute (0 disables)
+    API_KEY_RATE_LIMIT = float(os.getenv("API_KEY_RATE_LIMIT", "0"))
+    API_KEY_RATE_BURST = int(os.getenv("API_KEY_RATE_BURST", "10"))
+    # Per provider CLI executions; override with e.g. CLAUDE_RATE_LIMIT
+    RATE_LIMIT = float(os.getenv("RATE_LIMIT", "0"))
+    RATE_LIMIT_BURST = int(os.getenv("RATE_LIMIT_BURST", "10"))
+
+    # Usage accounting (/api/usage)
+    USAGE_DB_PATH = os.getenv("USAGE_DB_PATH", "data/usage.db")
+    USAGE_FLUSH_INTERVAL = float(os.getenv("USAGE_FLUSH_INTERVAL", "10"))
+
+    # CLI output limits (override with e.g. CLAUDE_OUTPUT_MAX_BYTES). Stdout past
+    # OUTPUT_INLINE_BYTES is saved as an artifact (/api/artifacts) and only its start is
+    # returned inline; stdout past OUTPUT_MAX_BYTES is dropped, and only the last
+    # STDERR_MAX_BYTES of stderr are kept
+    OUTPUT_INLINE_BYTES = int(os.getenv("OUTPUT_INLINE_BYTES", str(1024 * 1024)))
+    OUTPUT_MAX_BYTES = int(os.getenv("OUTPUT_MAX_BYTES", str(100 * 1024 * 1024)))
+    STDERR_MAX_BYTES = int(os.getenv("STDERR_MAX_BYTES", str(64 * 1024)))
+    ARTIFACTS_DIR = os.getenv("ARTIFACTS_DIR", "data/artifacts")
+    ARTIFACT_RETENTION = float(os.getenv("ARTIFACT_RETENTION", str(24 * 3600)))
+
+    # Provider availability checks
+    AVAILABILITY_TTL = float(os.getenv("AVAILABILITY_TTL", "60"))
+    AVAILABILITY_REFRESH_INTERVAL = float(os.getenv("AVAILABILITY_REFRESH_INTERVAL", "30"))
+    FAIL_FAST_UNAVAILABLE = os.getenv("FAIL_FAST_UNAVAILABLE", "true").lower() in ("1", "true", "yes")
+
+    # Circuit breaker: after CIRCUIT_FAILURE_THRESHOLD failures in a row, or CIRCUIT_FAILURE_RATE
+    # of the last CIRCUIT_WINDOW runs (once CIRCUIT_MIN_CALLS have run), requests are refused
+    # for CIRCUIT_OPEN_TIME seconds, then one probe is let through
+    # (override with e.g. GEMINI_CIRCUIT_OPEN_TIME)
+    CIRCUIT_BREAKER = os.getenv("CIRCUIT_BREAKER", "true").lower() in ("1", "true", "yes")
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))  # 0 disables
+    CIRCUIT_FAILURE_RATE = float(os.getenv("CIRCUIT_FAILURE_RATE", "0.5"))  # 0 disables
+    CIRCUIT_WINDOW = int(os.getenv("CIRCUIT_WINDOW", "20"))
+    CIRCUIT_MIN_CALLS = int(os.getenv("CIRCUIT_MIN_CALLS", "10"))
+    CIRCUIT_OPEN_TIME = float(os.getenv("CIRCUIT_OPEN_TIME", "30"))
+
+    # Remote worker agents (python -m backend.agent): prompts for REMOTE_PROVIDERS are sent
+    # to the least-loaded of REMOTE_WORKERS instead of run on this machine
+    REMOTE_WORKERS = os.getenv("REMOTE_WORKERS", "")  # Comma-separated host:port
+    REMOTE_PROVIDERS = os.getenv("REMOTE_PROVIDERS", "")  # Comma-separated; empty means every provider
+    REMOTE_TOKEN = os.getenv("REMOTE_TOKEN", "")  # Shared secret agents check on connect
+    REMOTE_HEALTH_INTERVAL = float(os.getenv("REMOTE_HEALTH_INTERVAL", "5"))
+    REMOTE_TIMEOUT = float(os.getenv("REMOTE_TIMEOUT", "5"))  # Connect and health check replies
+
+    # Pre-spawned CLI workers per provider (0 disables)
+    WORKER_POOL_SIZE = int(os.getenv("WORKER_POOL_SIZE", "0"))
+    WORKER_POOL_MAX_IDLE = float(os.getenv("WORKER_POOL_MAX_IDLE", "300"))
+
+    # Seconds a CLI may run before it is killed (override with e.g. CODEX_EXECUTION_TIMEOUT)
+    EXECUTION_TIMEOUT = float(os.getenv("EXECUTION_TIMEOUT", "600"))
+    # Longest timeout a request may ask for (override with e.g. CODEX_MAX_EXECUTION_TIMEOUT)
+    MAX_EXECUTION_TIMEOUT = float(os.getenv("MAX_EXECUTION_TIMEOUT", "3600"))
+
+    # Scheduling (per provider; override with e.g. CLAUDE_MAX_CONCURRENCY)
+    MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "4"))
+    MAX_QUEUE_SIZE = int(os.getenv("MAX_QUEUE_SIZE", "32"))
+    QUEUE_TIMEOUT = float(os.getenv("QUEUE_TIMEOUT", "60"))
+
+    # Adaptive concurrency (AIMD): the limit starts at MAX_CONCURRENCY, grows while runs are
+    # healthy and is cut on upstream rate limits or latency spikes, staying between
+    # ADAPTIVE_MIN_CONCURRENCY and ADAPTIVE_MAX_CONCURRENCY (override with e.g. CLAUDE_ADAPTIVE_BACKOFF)
+    ADAPTIVE_CONCURRENCY = os.getenv("ADAPTIVE_CONCURRENCY", "false").lower() in ("1", "true", "yes")
+    ADAPTIVE_MIN_CONCURRENCY = int(os.getenv("ADAPTIVE_MIN_CONCURRENCY", "1"))
+    ADAPTIVE_MAX_CONCURRENCY = int(os.getenv("ADAPTIVE_MAX_CONCURRENCY", "16"))
+    ADAPTIVE_BACKOFF = float(os.getenv("ADAPTIVE_BACKOFF", "0.5"))
+    ADAPTIVE_LATENCY_TOLERANCE = float(os.getenv("ADAPTIVE_LATENCY_TOLERANCE", "2"))  # 0 ignores latency
+    # Failed runs whose error output matches this count as upstream rate limits
+    RATE_LIMIT_ERROR_PATTERN = os.getenv(
+        "RATE_LIMIT_ERROR_PATTERN",
+        r"(?i)rate[ _-]?limit|too many requests|\b429\b|quota|resource[ _-]?exhausted|overloaded"
+    )
+
+    # Priority classes: interactive requests get free slots before batch requests,
+    # except batch requests that have waited PRIORITY_MAX_WAIT seconds
+    PRIORITY_MAX_WAIT = float(os.getenv("PRIORITY_MAX_WAIT", "10"))
+    API_BATCH_KEYS = os.getenv("API_BATCH_KEYS", "")  # Key names whose requests default to batch
+    API_KEY_WEIGHTS = os.getenv("API_KEY_WEIGHTS", "")  # "name:weight" shares of slots (default 1)
+
+    # Chat WebSocket (/ws): heartbeat frame interval and prompts running at once per connection
+    WS_HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "15"))
+    WS_MAX_PROMPTS = int(os.getenv("WS_MAX_PROMPTS", "4"))
+
+    # Batch requests
+    BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+    BATCH_MAX_PARALLELISM = int(os.getenv("BATCH_MAX_PARALLELISM", "8"))
+
+    # Background jobs
+    JOBS_DB_PATH = os.getenv("JOBS_DB_PATH", "data/jobs.db")
+    JOB_RETENTION = float(os.getenv("JOB_RETENTION", str(7 * 24 * 3600)))
+
+    # Conversation sessions (/api/sessions); idle sessions are deleted after SESSION_RETENTION
+    SESSIONS_DB_PATH = os.getenv("SESSIONS_DB_PATH", "data/sessions.db")
+    SESSION_RETENTION = float(os.getenv("SESSION_RETENTION", str(7 * 24 * 3600)))
+    SESSION_MAX_TRANSCRIPT_CHARS = int(os.getenv("SESSION_MAX_TRANSCRIPT_CHARS", "100000"))
+
+    # Workspaces: comma-separated "name:/path/to/source"; each run gets a private copy
+    WORKSPACES = os.getenv("WORKSPACES", "")
+    WORKSPACE_ROOT = os.getenv("WORKSPACE_ROOT", "data/workspaces")
+    WORKSPACE_POOL_SIZE = int(os.getenv("WORKSPACE_POOL_SIZE", "2"))  # Copies prepared ahead per workspace
+    WORKSPACE_MAX_COPIES = int(os.getenv("WORKSPACE_MAX_COPIES", "8"))  # Further runs wait for a copy
+
+    # Share one execution between identical concurrent /api/ask requests
+    COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "true").lower() in ("1", "true", "yes")
+
+    # Response cache (opt-in)
+    CACHE_ENABLED = os.getenv("CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # memory or sqlite
+    CACHE_PATH = os.getenv("CACHE_PATH", "data/cache.db")
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1000"))
+    CACHE_TTL = float(os.getenv("CACHE_TTL", "3600"))
+
+    # Routing: providers whose recent error rate is above the threshold are tried last
+    ROUTING_ERROR_THRESHOLD = float(os.getenv("ROUTING_ERROR_THRESHOLD", "0.5"))
+    ROUTING_RECOVERY_TIME = float(os.getenv("ROUTING_RECOVERY_TIME", "30"))
+    ROUTING_EWMA_ALPHA = float(os.getenv("ROUTING_EWMA_ALPHA", "0.2"))
+
+    # Fake provider for benchmarks and load tests (see benchmarks/load_test.py)
+    FAKE_PROVIDER_ENABLED = os.getenv("FAKE_PROVIDER_ENABLED", "false").lower() in ("1", "true", "yes")
+    FAKE_MODE = os.getenv("FAKE_MODE", "process")  # process (stub CLI) or inline (no subprocess)
+    FAKE_LATENCY = float(os.getenv("FAKE_LATENCY", "0.1"))
+    FAKE_OUTPUT_BYTES = int(os.getenv("FAKE_OUTPUT_BYTES", "1024"))
+    FAKE_CHUNKS = int(os.getenv("FAKE_CHUNKS", "1"))
+    FAKE_ERROR_RATE = float(os.getenv("FAKE_ERROR_RATE", "0"))
+
+    @staticmethod
+    def for_provider(provider: str, key: str, default):
+        """
+        Read a per-provider override such as CLAUDE_MAX_CONCURRENCY.
+
+        Args:
+            provider: Provider name
+            key: Setting name without the provider prefix
+            default: Value used when no override is set; its type is used to parse the override
+
+        Returns:
+            The override if set, otherwise default
+        """
+        value = os.getenv(f"{provider.upper()}_{key}")
+        if value is None or value == "":
+            return default
+        return type(default)(value)
+
 
 config = Config()
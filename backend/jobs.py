@@ -0,0 +1,268 @@
+"""Background jobs for long-running prompts, persisted in SQLite."""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .config import config
+from .models import PromptRequest, PromptResponse
+from .shared import pid_alive
+
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+# Seconds between checks for jobs cancelled through another worker
+CANCEL_POLL_INTERVAL = 1.0
+
+
+class JobStore:
+    """SQLite-backed storage for job state, so it survives a restart."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                request TEXT NOT NULL,
+                result TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL,
+                owner_pid INTEGER
+            )
+            """
+        )
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "owner_pid" not in columns:
+            # Databases created before jobs had an owning worker
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN owner_pid INTEGER")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+
+    def create(self, request: PromptRequest) -> Dict[str, Any]:
+        """Insert a new queued job and return it."""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, request, created_at, owner_pid) VALUES (?, ?, ?, ?, ?)",
+                (job_id, QUEUED, request.model_dump_json(), time.time(), os.getpid())
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job by id, or None if it doesn't exist."""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list_by_status(self, *statuses: str) -> List[Dict[str, Any]]:
+        """Get all jobs in any of the given statuses, oldest first."""
+        placeholders = ", ".join("?" for _ in statuses)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM jobs WHERE status IN ({placeholders}) ORDER BY created_at",
+                statuses
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def update(self, job_id: str, **fields: Any):
+        """
+        Update columns of a job.
+
+        A "result" field is serialized from a PromptResponse.
+        """
+        if isinstance(fields.get("result"), PromptResponse):
+            fields["result"] = fields["result"].model_dump_json()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ?",
+                (*fields.values(), job_id)
+            )
+
+    def claim(self, job_id: str, previous_owner: Optional[int]) -> bool:
+        """
+        Make this process the owner of a job, unless another worker claimed it first.
+
+        Returns:
+            True if the job is now owned by this process
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET owner_pid = ? WHERE id = ? AND owner_pid IS ?",
+                (os.getpid(), job_id, previous_owner)
+            )
+        return cursor.rowcount == 1
+
+    def cancel_unfinished(self, job_id: str) -> bool:
+        """
+        Mark a queued or running job cancelled.
+
+        Returns:
+            False if the job had already finished
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+                (CANCELLED, time.time(), job_id, QUEUED, RUNNING)
+            )
+        return cursor.rowcount == 1
+
+    def purge(self, older_than: float):
+        """Delete finished jobs that finished more than older_than seconds ago."""
+        placeholders = ", ".join("?" for _ in FINISHED_STATUSES)
+        with self._lock:
+            self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({placeholders}) AND finished_at < ?",
+                (*FINISHED_STATUSES, time.time() - older_than)
+            )
+
+    def _to_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["request"] = PromptRequest.model_validate_json(job["request"])
+        if job["result"]:
+            job["result"] = PromptResponse.model_validate_json(job["result"])
+        return job
+
+
+class JobManager:
+    """Runs jobs as background tasks and records their progress in a JobStore."""
+
+    def __init__(self, store: JobStore):
+        self.store = store
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._runner: Optional[Callable[[PromptRequest], Awaitable[PromptResponse]]] = None
+        self._stopping = False
+        self._watcher: Optional[asyncio.Task] = None
+
+    def start(self, runner: Callable[[PromptRequest], Awaitable[PromptResponse]]):
+        """
+        Start running jobs, recovering any left over from a previous process.
+
+        Jobs that were running when the server stopped are marked failed,
+        since the CLI may already have had side effects. Queued jobs are
+        started again. With several workers, only jobs whose owning worker
+        has died are recovered, and each by exactly one worker.
+
+        Args:
+            runner: Coroutine function that executes a prompt and never raises
+        """
+        self._runner = runner
+        self._stopping = False
+        self.store.purge(config.JOB_RETENTION)
+
+        for job in self.store.list_by_status(RUNNING, QUEUED):
+            if not self._orphaned(job) or not self.store.claim(job["id"], job["owner_pid"]):
+                continue
+            if job["status"] == QUEUED:
+                self._spawn(job["id"], job["request"])
+                continue
+            self.store.update(
+                job["id"],
+                status=FAILED,
+                finished_at=time.time(),
+                result=PromptResponse(
+                    success=False,
+                    provider=job["request"].provider or config.DEFAULT_PROVIDER,
+                    response="",
+                    error="Job was interrupted by a server restart"
+                )
+            )
+
+        if config.WORKERS > 1:
+            self._watcher = asyncio.ensure_future(self._watch_cancellations())
+
+    async def stop(self):
+        """Cancel running job tasks; their jobs are recovered on the next start."""
+        self._stopping = True
+        if self._watcher is not None:
+            self._watcher.cancel()
+            self._watcher = None
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+
+    def submit(self, request: PromptRequest) -> Dict[str, Any]:
+        """Create a job for the request and start running it."""
+        job = self.store.create(request)
+        self._spawn(job["id"], request)
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued or running job.
+
+        A job run by another worker is marked cancelled in the store; that
+        worker notices within CANCEL_POLL_INTERVAL and stops it.
+
+        Returns:
+            False if the job had already finished
+        """
+        task = self._tasks.get(job_id)
+        if task is None:
+            return self.store.cancel_unfinished(job_id)
+        task.cancel()
+        return True
+
+    def _orphaned(self, job: Dict[str, Any]) -> bool:
+        """Whether no live worker is running a job (this process has only just started)."""
+        owner = job["owner_pid"]
+        return owner is None or owner == os.getpid() or not pid_alive(owner)
+
+    async def _watch_cancellations(self):
+        """Stop local jobs that another worker marked cancelled."""
+        while True:
+            await asyncio.sleep(CANCEL_POLL_INTERVAL)
+            for job_id, task in list(self._tasks.items()):
+                job = self.store.get(job_id)
+                if job is not None and job["status"] == CANCELLED:
+                    task.cancel()
+
+    def _spawn(self, job_id: str, request: PromptRequest):
+        task = asyncio.ensure_future(self._run(job_id, request))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _run(self, job_id: str, request: PromptRequest):
+        self.store.update(job_id, status=RUNNING, started_at=time.time())
+        try:
+            result = await self._runner(request)
+        except asyncio.CancelledError:
+            # Jobs interrupted by shutdown stay "running" so start() recovers them
+            if not self._stopping:
+                self.store.update(job_id, status=CANCELLED, finished_at=time.time())
+            raise
+        self.store.update(
+            job_id,
+            status=SUCCEEDED if result.success else FAILED,
+            finished_at=time.time(),
+            result=result
+        )
+
+
+def create_job_manager() -> JobManager:
+    """Build the job manager from configuration."""
+    return JobManager(JobStore(config.JOBS_DB_PATH))
+
+
+# Global job manager instance
+job_manager = create_job_manager()
@@ -0,0 +1,270 @@
+"""Prometheus-format metrics for the wrapper and the CLI processes it runs."""
+
+import math
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+# Histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+
+
+def _format_labels(labelnames: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric(ABC):
+    """Common parts of a labelled metric family."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(self._samples())
+        return lines
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        """Sample lines of the family, after its HELP and TYPE lines."""
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    def set_max(self, value: float, **labels: str):
+        """Raise the value to `value` if it is higher."""
+        key = self._key(labels)
+        self._values[key] = max(self._values.get(key, value), value)
+
+    def _samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets) + (math.inf,)
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._key(labels)
+        counts = self._counts.setdefault(key, [0] * len(self.buckets))
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for key, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(self._sums[key])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metric families and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Render every metric in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+
+def peak_rss_bytes(pid: int) -> Optional[int]:
+    """
+    Peak resident set size of a running process, or None where unavailable.
+
+    Read from /proc, so Linux only. getrusage(RUSAGE_CHILDREN) is no
+    substitute: it counts the server's own memory, which every child
+    shares between fork and exec.
+    """
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+# Global registry instance
+metrics = MetricsRegistry()
+
+REQUESTS = metrics.counter(
+    "cli_wrapper_requests_total",
+    "Prompt requests received (single, streaming, batch items and jobs).",
+    ["provider"]
+)
+CACHE_HITS = metrics.counter(
+    "cli_wrapper_cache_hits_total",
+    "Requests answered from the response cache.",
+    ["provider"]
+)
+EXECUTIONS = metrics.counter(
+    "cli_wrapper_executions_total",
+    "CLI executions by outcome (success, error, cancelled).",
+    ["provider", "outcome"]
+)
+TIMEOUTS = metrics.counter(
+    "cli_wrapper_timeouts_total",
+    "CLI executions killed for exceeding their timeout.",
+    ["provider"]
+)
+QUEUE_WAIT = metrics.histogram(
+    "cli_wrapper_queue_wait_seconds",
+    "Time spent waiting for a concurrency slot.",
+    ["provider", "priority"]
+)
+SPAWN_TIME = metrics.histogram(
+    "cli_wrapper_spawn_seconds",
+    "Time to start the CLI process (near zero for pooled workers).",
+    ["provider", "pooled"]
+)
+RUN_TIME = metrics.histogram(
+    "cli_wrapper_run_seconds",
+    "Time from process start to process exit.",
+    ["provider"]
+)
+RESPONSE_BYTES = metrics.histogram(
+    "cli_wrapper_response_bytes",
+    "Size of CLI stdout per execution.",
+    ["provider"],
+    buckets=BYTES_BUCKETS
+)
+LIVE_SUBPROCESSES = metrics.gauge(
+    "cli_wrapper_live_subprocesses",
+    "CLI processes currently executing a prompt.",
+    ["provider"]
+)
+CONCURRENCY_LIMIT = metrics.gauge(
+    "cli_wrapper_concurrency_limit",
+    "Current adaptive concurrency limit (ADAPTIVE_CONCURRENCY).",
+    ["provider"]
+)
+CIRCUIT_STATE = metrics.gauge(
+    "cli_wrapper_circuit_state",
+    "Circuit breaker state: 0 closed, 1 half-open, 2 open.",
+    ["provider"]
+)
+POOL_IDLE_WORKERS = metrics.gauge(
+    "cli_wrapper_pool_idle_workers",
+    "Pre-spawned workers waiting for a prompt.",
+    ["provider"]
+)
+CHILD_PEAK_RSS = metrics.gauge(
+    "cli_wrapper_child_peak_rss_bytes",
+    "Largest peak resident set size seen for a CLI process (Linux only).",
+    ["provider"]
+)
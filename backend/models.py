@@ -1,7 +1,7 @@
 """Pydantic models for request/response handling."""
 
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from typing import Any, Literal, Optional, List, Dict
 
 
 class PromptRequest(BaseModel):
@@ -10,6 +10,35 @@ class PromptRequest(BaseModel):
     provider: Optional[str] = None  # Provider name (defaults to configured default)
     prompt: str  # The prompt to send
     working_directory: Optional[str] = None  # Working directory for execution
+    timeout: Optional[float] = Field(None, gt=0)  # Seconds before the CLI is killed (defaults to EXECUTION_TIMEOUT)
+    cache_ttl: Optional[float] = None  # Seconds to cache the response (defaults to CACHE_TTL, 0 disables)
+    bypass_cache: bool = False  # Skip the cache lookup; a fresh response still refreshes the cache
+    fallback: Optional[List[str]] = None  # Providers to try, in order, if the first one fails
+    hedge_delay: Optional[float] = Field(None, ge=0)  # Seconds before also trying a fallback provider
+    session_id: Optional[str] = None  # Continue this session (from POST /api/sessions)
+    workspace: Optional[str] = None  # Run in a private copy of this workspace (see WORKSPACES)
+    return_diff: bool = False  # With workspace, return the changes the run made as a unified diff
+    output_format: Literal["text", "json"] = "text"  # json runs the CLI's machine-readable mode
+    priority: Optional[Literal["interactive", "batch"]] = None  # Defaults from the API key (see API_BATCH_KEYS)
+
+
+class TokenUsage(BaseModel):
+    """Tokens and cost reported by a CLI's machine-readable output."""
+
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    cached_input_tokens: Optional[int] = None
+    cost_usd: Optional[float] = None  # Only reported by Claude
+
+
+class ToolEvent(BaseModel):
+    """A tool call made by the CLI's agent, such as a shell command or file edit."""
+
+    id: Optional[str] = None
+    name: str
+    input: Optional[Dict[str, Any]] = None
+    output: Optional[str] = None
+    is_error: bool = False
 
 
 class PromptResponse(BaseModel):
@@ -20,6 +49,93 @@ class PromptResponse(BaseModel):
     response: str
     error: Optional[str] = None
     execution_time: Optional[float] = None  # Execution time in seconds
+    cached: bool = False  # Served from the response cache
+    coalesced: bool = False  # Shared the execution of an identical request already running
+    session_id: Optional[str] = None  # Session the prompt was part of
+    diff: Optional[str] = None  # Changes made in the workspace copy, when return_diff was set
+    usage: Optional[TokenUsage] = None  # With output_format "json", when the CLI reports it
+    tool_events: Optional[List[ToolEvent]] = None  # With output_format "json"
+    truncated: bool = False  # response holds only the start of the output
+    output_bytes: Optional[int] = None  # Size of the full output, when truncated
+    artifact_id: Optional[str] = None  # Full output at GET /api/artifacts/{id}, when truncated
+
+
+class SessionCreateRequest(BaseModel):
+    """Request model for starting a conversation session."""
+
+    provider: Optional[str] = None  # Provider name (defaults to configured default)
+    working_directory: Optional[str] = None  # Working directory for every turn
+
+
+class SessionMessage(BaseModel):
+    """One message of a session."""
+
+    role: str  # user or assistant
+    content: str
+    created_at: float  # Unix time
+
+
+class SessionResponse(BaseModel):
+    """State of a conversation session."""
+
+    id: str
+    provider: str
+    working_directory: Optional[str] = None
+    mode: str  # native (the CLI keeps the conversation) or transcript (replayed by the server)
+    turns: int
+    created_at: float  # Unix time
+    updated_at: float  # Unix time
+    messages: Optional[List[SessionMessage]] = None  # Only when fetching a single session
+
+
+class SessionListResponse(BaseModel):
+    """Response model for listing sessions."""
+
+    sessions: List[SessionResponse]
+
+
+class BatchRequest(BaseModel):
+    """Request model for running many prompts in one call."""
+
+    items: List[PromptRequest]  # Prompts to run; each may name its own provider
+    parallelism: Optional[int] = None  # Items run at once (capped at BATCH_MAX_PARALLELISM)
+    stream: bool = False  # Stream results as NDJSON in completion order
+
+
+class BatchItemResponse(PromptResponse):
+    """Result for one batch item."""
+
+    index: int  # Position of the item in BatchRequest.items
+
+
+class BatchResponse(BaseModel):
+    """Response model for a batch, in input order."""
+
+    results: List[BatchItemResponse]
+
+
+class JobResponse(BaseModel):
+    """State of a background job."""
+
+    id: str
+    status: str  # queued, running, succeeded, failed or cancelled
+    provider: str
+    created_at: float  # Unix time
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[PromptResponse] = None  # Set once the job has finished
+
+
+class CircuitBreakerStats(BaseModel):
+    """State of a provider's circuit breaker."""
+
+    state: str  # closed, open or half_open
+    consecutive_failures: int
+    failure_rate: float  # Failed fraction of the recent runs counted while closed
+    opens: int  # Times the breaker has opened
+    rejections: int  # Requests refused while open or half-open
+    opened_at: Optional[float] = None  # Unix time the breaker last opened
+    retry_after: Optional[int] = None  # Seconds until a probe is let through, while open
 
 
 class ProviderInfo(BaseModel):
@@ -30,9 +146,140 @@ class ProviderInfo(BaseModel):
     available: bool
     version: Optional[str] = None
     error: Optional[str] = None
+    checked_at: Optional[float] = None  # Unix time of the availability check
+    age: Optional[float] = None  # Seconds since the availability check
+    circuit: Optional[CircuitBreakerStats] = None  # Unless CIRCUIT_BREAKER is off
 
 
 class ProvidersListResponse(BaseModel):
     """Response listing available providers."""
 
     providers: List[ProviderInfo]
+
+
+class PriorityQueueStats(BaseModel):
+    """Scheduler state for one priority class of a provider."""
+
+    queue_depth: int  # Requests of this class waiting for a slot
+    total_started: int
+    avg_wait_time: float  # Seconds
+    max_wait_time: float  # Seconds
+
+
+class AdaptiveConcurrencyStats(BaseModel):
+    """State of a provider's adaptive concurrency limit."""
+
+    limit: int  # Runs allowed at once right now
+    min_limit: int
+    max_limit: int
+    increases: int
+    decreases: int
+    last_decrease_reason: Optional[str] = None  # rate_limited or latency
+    recent_latency: Optional[float] = None  # Seconds, short-term average of successful runs
+    baseline_latency: Optional[float] = None  # Seconds, long-term average of successful runs
+
+
+class ProviderQueueStats(BaseModel):
+    """Scheduler state for a single provider."""
+
+    in_flight: int  # Executions currently running
+    queue_depth: int  # Requests waiting for a slot
+    max_concurrency: int
+    concurrency_limit: int  # Current limit; differs from max_concurrency with ADAPTIVE_CONCURRENCY
+    max_queue_size: int
+    total_started: int
+    total_rejected: int  # Turned away because the queue was full
+    total_timed_out: int  # Gave up waiting for a slot
+    avg_wait_time: float  # Seconds
+    max_wait_time: float  # Seconds
+    global_in_flight: Optional[int] = None  # Across all workers, when WORKERS > 1
+    priorities: Dict[str, PriorityQueueStats]  # interactive and batch
+    adaptive: Optional[AdaptiveConcurrencyStats] = None  # With ADAPTIVE_CONCURRENCY
+
+
+class SchedulerStatsResponse(BaseModel):
+    """Scheduler state for all providers."""
+
+    providers: Dict[str, ProviderQueueStats]
+
+
+class ProviderHealthStats(BaseModel):
+    """Recent performance of a provider, as used for routing."""
+
+    avg_latency: Optional[float] = None  # Seconds, moving average of successful executions
+    error_rate: float  # Moving average, 0 to 1
+    samples: int
+    healthy: bool  # False while tried after other providers
+
+
+class RoutingStatsResponse(BaseModel):
+    """Routing health for every provider that has run a prompt."""
+
+    providers: Dict[str, ProviderHealthStats]
+
+
+class WorkspaceInfo(BaseModel):
+    """State of a workspace's pool of copies."""
+
+    name: str
+    source: str  # Directory the copies are made from
+    copies: int  # Copies that exist
+    idle: int  # Copies ready to be leased
+    leased: int  # Copies in use by a run
+    max_copies: int
+
+
+class WorkspacesListResponse(BaseModel):
+    """Response listing configured workspaces."""
+
+    workspaces: List[WorkspaceInfo]
+
+
+class RemoteProviderStatus(BaseModel):
+    """A provider on a remote worker, as of its last health check."""
+
+    available: bool
+    version: Optional[str] = None
+    error: Optional[str] = None
+    busy: int  # Runs in flight or queued on the worker, from every coordinator
+    limit: int  # The worker's concurrency limit
+    load: float  # Estimated runs per slot now; the least-loaded worker gets the next run
+
+
+class RemoteWorkerInfo(BaseModel):
+    """State of a remote worker agent (REMOTE_WORKERS)."""
+
+    address: str
+    name: Optional[str] = None  # As the agent calls itself
+    connected: bool
+    draining: bool  # Drained through the API; no new runs are sent
+    remote_draining: bool  # The agent is shutting down
+    in_flight: int  # Runs this server has sent that haven't finished
+    runs: int  # Runs the worker has taken from this server
+    providers: Dict[str, RemoteProviderStatus]
+    error: Optional[str] = None  # Why the worker was last disconnected
+    last_seen: Optional[float] = None  # Unix time of the last health check reply
+
+
+class RemoteWorkersResponse(BaseModel):
+    """Response listing remote worker agents."""
+
+    workers: List[RemoteWorkerInfo]
+
+
+class UsageEntry(BaseModel):
+    """Usage by one client on one provider."""
+
+    client: str  # API key name, or "anonymous" without API keys
+    provider: str
+    requests: int
+    prompt_bytes: int
+    response_bytes: int
+    cli_seconds: float  # Seconds CLIs ran; cache hits count 0
+
+
+class UsageResponse(BaseModel):
+    """Usage totals per client and provider."""
+
+    since: Optional[str] = None  # First day counted (YYYY-MM-DD, UTC); None for all time
+    usage: List[UsageEntry]
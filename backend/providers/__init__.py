@@ -1,11 +1,19 @@
 """Provider registry and management."""
 
-from typing import Dict, Optional
+import asyncio
+import time
+from typing import Dict, Any, Optional
 
+from ..config import config
+from ..shared import shared_state
 from .base import CLIProvider
+from .breaker import create_breaker
+from .pool import WorkerPool
+from .remote import RemoteCluster, RemoteProvider
 from .claude import ClaudeProvider
 from .gemini import GeminiProvider
 from .codex import CodexProvider
+from .fake import FakeProvider
 
 
 class ProviderRegistry:
@@ -14,6 +22,8 @@ class ProviderRegistry:
     def __init__(self):
         """Initialize the registry with default providers."""
         self._providers: Dict[str, CLIProvider] = {}
+        self._status: Dict[str, Dict[str, Any]] = {}
+        self._checks: Dict[str, asyncio.Task] = {}
         self._register_default_providers()
 
     def _register_default_providers(self):
@@ -21,6 +31,8 @@ class ProviderRegistry:
         self.register(ClaudeProvider())
         self.register(GeminiProvider())
         self.register(CodexProvider())
+        if config.FAKE_PROVIDER_ENABLED:
+            self.register(FakeProvider())
 
     def register(self, provider: CLIProvider):
         """
@@ -29,7 +41,9 @@ class ProviderRegistry:
         Args:
             provider: A CLIProvider instance to register
         """
+        provider.breaker = create_breaker(provider.name)
         self._providers[provider.name] = provider
+        self._status.pop(provider.name, None)
 
     def get(self, name: str) -> Optional[CLIProvider]:
         """
@@ -53,5 +67,127 @@ class ProviderRegistry:
         return self._providers.copy()
 
 
+    def start_pools(self):
+        """
+        Start pre-spawned worker pools for providers that support them.
+
+        Pool size comes from WORKER_POOL_SIZE (or e.g. CLAUDE_WORKER_POOL_SIZE);
+        0 disables the pool.
+        """
+        for name, provider in self._providers.items():
+            size = config.for_provider(name, "WORKER_POOL_SIZE", config.WORKER_POOL_SIZE)
+            command = provider.pool_command
+            if size <= 0 or not command:
+                continue
+            provider.pool = WorkerPool(command, size, config.WORKER_POOL_MAX_IDLE)
+            provider.pool.start()
+
+    def start_remote(self, cluster: RemoteCluster):
+        """
+        Run REMOTE_PROVIDERS (default: every provider) on the cluster's worker agents.
+
+        Each is replaced by a RemoteProvider of the same name, so the rest
+        of the app is unchanged.
+        """
+        names = [name.strip() for name in config.REMOTE_PROVIDERS.split(",") if name.strip()]
+        for name, provider in list(self._providers.items()):
+            if (names and name not in names) or isinstance(provider, RemoteProvider):
+                continue
+            self.register(RemoteProvider(provider, cluster))
+
+    async def close_pools(self):
+        """Kill idle pooled workers and disable the pools."""
+        for provider in self._providers.values():
+            if provider.pool is not None:
+                await provider.pool.close()
+                provider.pool = None
+
+    def cached_status(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the last availability result without running a check.
+
+        Args:
+            name: Provider name
+
+        Returns:
+            The check_availability() result plus "checked_at" and "age"
+            (seconds), or None if the provider has not been checked yet
+        """
+        status = self._status.get(name)
+        if shared_state is not None:
+            # Another worker may have checked more recently
+            shared = shared_state.get_status(name)
+            if shared is not None and (status is None or shared["checked_at"] > status["checked_at"]):
+                status = self._status[name] = shared
+        if status is None:
+            return None
+        return {**status, "age": time.time() - status["checked_at"]}
+
+    async def get_status(self, name: str, ttl: float, refresh: bool = False) -> Dict[str, Any]:
+        """
+        Get availability for a provider, re-checking only when stale.
+
+        Args:
+            name: Provider name
+            ttl: Maximum age in seconds of a cached result
+            refresh: Check again even if the cached result is fresh
+
+        Returns:
+            Same shape as cached_status()
+        """
+        status = self.cached_status(name)
+        if refresh or status is None or status["age"] > ttl:
+            await self._check(name)
+            status = self.cached_status(name)
+        return status
+
+    async def get_all_statuses(self, ttl: float, refresh: bool = False) -> Dict[str, Dict[str, Any]]:
+        """
+        Get availability for every provider, checking stale ones in parallel.
+
+        Returns:
+            Dictionary of provider name to status
+        """
+        names = list(self._providers)
+        statuses = await asyncio.gather(
+            *(self.get_status(name, ttl, refresh) for name in names)
+        )
+        return dict(zip(names, statuses))
+
+    async def refresh_periodically(self, interval: float):
+        """
+        Re-check every provider forever, every interval seconds.
+
+        Meant to run as a background task for the lifetime of the app.
+        Results another worker stored less than interval seconds ago are
+        reused rather than checked again.
+        """
+        while True:
+            await asyncio.gather(
+                *(self.get_status(name, interval) for name in list(self._providers)),
+                return_exceptions=True
+            )
+            await asyncio.sleep(interval)
+
+    async def _check(self, name: str):
+        """Run check_availability(), sharing one check between concurrent callers."""
+        task = self._checks.get(name)
+        if task is None:
+            task = asyncio.ensure_future(self._run_check(name))
+            self._checks[name] = task
+            task.add_done_callback(lambda _: self._checks.pop(name, None))
+        await asyncio.shield(task)
+
+    async def _run_check(self, name: str):
+        provider = self._providers[name]
+        try:
+            status = await provider.check_availability()
+        except Exception as e:
+            status = {"available": False, "version": None, "error": str(e)}
+        self._status[name] = {**status, "checked_at": time.time()}
+        if shared_state is not None:
+            await asyncio.to_thread(shared_state.set_status, name, self._status[name])
+
+
 # Global registry instance
 registry = ProviderRegistry()
@@ -1,12 +1,286 @@
-"""Abstract base class for CLI providers."""
+"""Abstract base class for CLI providers and the shared subprocess runner."""
 
+import asyncio
+import codecs
+import os
+import shutil
+import signal
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, AsyncIterator, List, Tuple, TYPE_CHECKING
+
+from ..artifacts import CappedOutput, artifact_store
+from ..config import config
+from ..metrics import (
+    CHILD_PEAK_RSS, EXECUTIONS, LIVE_SUBPROCESSES, RESPONSE_BYTES, RUN_TIME, SPAWN_TIME,
+    peak_rss_bytes
+)
+from .output import OutputParser
+
+if TYPE_CHECKING:
+    from .breaker import CircuitBreaker
+    from .pool import WorkerPool
+
+
+# Size of each read from a CLI's stdout when streaming
+STREAM_CHUNK_SIZE = 4096
+
+# Size of each read from a CLI's output when collecting it whole
+OUTPUT_CHUNK_SIZE = 65536
+
+# Seconds a `--version` availability check may take
+VERSION_CHECK_TIMEOUT = 30
+
+# Seconds between samples of a running CLI's peak memory
+RSS_SAMPLE_INTERVAL = 0.25
+
+
+class WorkingDirectoryError(Exception):
+    """Raised when a CLI is asked to run in a directory that doesn't exist."""
+
+
+def resolve_command(argv: List[str]) -> List[str]:
+    """
+    Resolve the executable in argv via PATH.
+
+    Also finds Windows launchers such as claude.cmd, which a shell would
+    otherwise have resolved for us.
+
+    Raises:
+        FileNotFoundError: if the executable is not on PATH
+    """
+    executable = shutil.which(argv[0])
+    if executable is None:
+        raise FileNotFoundError(argv[0])
+    return [executable, *argv[1:]]
+
+
+async def spawn_cli(
+    argv: List[str],
+    working_directory: Optional[str] = None
+) -> asyncio.subprocess.Process:
+    """
+    Start a CLI directly (no shell) with stdin, stdout and stderr piped.
+
+    The CLI becomes the leader of a new process group (a new process
+    group on Windows), so kill_process_tree() can also reach anything it
+    starts, such as agent tool subprocesses.
+
+    Raises:
+        FileNotFoundError: if the executable is not on PATH
+        WorkingDirectoryError: if working_directory isn't a directory
+    """
+    if working_directory is not None and not os.path.isdir(working_directory):
+        raise WorkingDirectoryError(f"Working directory not found: {working_directory}")
+    if os.name == "nt":
+        group_kwargs = {"creationflags": 0x00000200}  # CREATE_NEW_PROCESS_GROUP
+    else:
+        group_kwargs = {"start_new_session": True}
+    return await asyncio.create_subprocess_exec(
+        *resolve_command(argv),
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=working_directory,
+        **group_kwargs
+    )
+
+
+def kill_process_tree(process: asyncio.subprocess.Process):
+    """
+    Kill a CLI started by spawn_cli() and every process in its group.
+
+    Safe to call on a process that has already exited.
+    """
+    if process.stdin is not None:
+        process.stdin.close()
+    try:
+        if os.name == "nt":
+            if process.returncode is None:
+                process.kill()
+        else:
+            # Children can outlive the leader, so signal the group regardless
+            os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+async def terminate(process: asyncio.subprocess.Process):
+    """Kill a CLI's process group and wait for it to be reaped."""
+    kill_process_tree(process)
+    await process.wait()
+
+
+async def communicate(
+    process: asyncio.subprocess.Process,
+    stdin_data: Optional[str] = None
+) -> Tuple[bytes, bytes]:
+    """
+    Send stdin_data and collect output, killing the process group if cancelled.
+
+    Cancellation comes from timeouts and client disconnects; without the
+    kill, the CLI would keep running and holding upstream quota.
+    """
+    try:
+        return await process.communicate(
+            stdin_data.encode("utf-8") if stdin_data is not None else None
+        )
+    except BaseException:
+        await asyncio.shield(terminate(process))
+        raise
+
+
+async def feed_stdin(process: asyncio.subprocess.Process, data: Optional[str]):
+    """Write data to the process's stdin, then close it."""
+    try:
+        if data:
+            process.stdin.write(data.encode("utf-8"))
+            await process.stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass  # CLI exited without reading all input; its exit status tells the story
+    finally:
+        process.stdin.close()
+
+
+async def read_tail(stream: asyncio.StreamReader, limit: int) -> bytes:
+    """Read a stream to the end, keeping only its last limit bytes."""
+    buffer = bytearray()
+    while True:
+        data = await stream.read(OUTPUT_CHUNK_SIZE)
+        if not data:
+            break
+        buffer += data
+        # Trim in batches rather than on every read
+        if len(buffer) > 2 * limit:
+            del buffer[:len(buffer) - limit]
+    return bytes(buffer[max(len(buffer) - limit, 0):])
+
+
+async def communicate_capped(
+    process: asyncio.subprocess.Process,
+    stdin_data: Optional[str],
+    stdout: CappedOutput,
+    stderr_limit: int
+) -> bytes:
+    """
+    Like communicate(), but with bounded memory.
+
+    stdout is written to the CappedOutput as it is read; only the last
+    stderr_limit bytes of stderr are kept.
+
+    Returns:
+        The kept stderr
+    """
+    stdin_task = asyncio.ensure_future(feed_stdin(process, stdin_data))
+    stderr_task = asyncio.ensure_future(read_tail(process.stderr, stderr_limit))
+    try:
+        while True:
+            data = await process.stdout.read(OUTPUT_CHUNK_SIZE)
+            if not data:
+                break
+            stdout.write(data)
+        stderr = await stderr_task
+        await process.wait()
+        return stderr
+    except BaseException:
+        stdin_task.cancel()
+        stderr_task.cancel()
+        await asyncio.shield(terminate(process))
+        raise
+    finally:
+        stdout.close()
+
+
+async def run_cli(
+    argv: List[str],
+    stdin_data: Optional[str] = None,
+    working_directory: Optional[str] = None,
+    timeout: Optional[float] = None
+) -> Tuple[int, bytes, bytes]:
+    """
+    Run a CLI to completion, piping stdin_data to it.
+
+    Returns:
+        (returncode, stdout, stderr)
+
+    Raises:
+        FileNotFoundError: if the executable is not on PATH
+        asyncio.TimeoutError: if it runs longer than timeout (it is killed)
+    """
+    process = await spawn_cli(argv, working_directory)
+    try:
+        stdout, stderr = await asyncio.wait_for(communicate(process, stdin_data), timeout)
+    except asyncio.TimeoutError:
+        raise asyncio.TimeoutError(f"'{argv[0]}' did not finish within {timeout:g}s")
+    return process.returncode, stdout, stderr
+
+
+def build_result(
+    returncode: int,
+    stdout: CappedOutput,
+    stderr: bytes,
+    start_time: float,
+    default_error: str
+) -> Dict[str, Any]:
+    """
+    Build an execute() result from a finished CLI run.
+
+    If stdout didn't fit inline, response holds its start and the result
+    also carries truncated, output_bytes and artifact_id.
+    """
+    execution_time = time.time() - start_time
+
+    if returncode != 0:
+        stdout.discard()
+        error_msg = stderr.decode("utf-8", errors="replace").strip()
+        return {
+            "success": False,
+            "response": "",
+            "error": error_msg or default_error,
+            "execution_time": execution_time
+        }
+
+    return {
+        "success": True,
+        "response": stdout.text(),
+        "error": None,
+        "execution_time": execution_time,
+        **stdout.result_fields()
+    }
+
+
+def build_version_status(
+    returncode: int,
+    stdout: bytes,
+    stderr: bytes,
+    default_error: str
+) -> Dict[str, Any]:
+    """Build a check_availability() result from a finished `--version` run."""
+    if returncode == 0:
+        version = stdout.decode("utf-8", errors="replace").strip()
+        return {
+            "available": True,
+            "version": version if version else "installed",
+            "error": None
+        }
+
+    error_msg = stderr.decode("utf-8", errors="replace").strip()
+    return {
+        "available": False,
+        "version": None,
+        "error": error_msg or default_error
+    }
 
 
 class CLIProvider(ABC):
     """Abstract base class for CLI providers."""
 
+    # Pre-spawned workers, set up by ProviderRegistry.start_pools()
+    pool: Optional["WorkerPool"] = None
+
+    # Set by ProviderRegistry.register() unless CIRCUIT_BREAKER is off
+    breaker: Optional["CircuitBreaker"] = None
+
     @property
     @abstractmethod
     def name(self) -> str:
@@ -19,6 +293,16 @@ class CLIProvider(ABC):
         """Display name for UI (e.g., 'Claude Code', 'Gemini CLI')."""
         pass
 
+    @property
+    def command(self) -> Optional[List[str]]:
+        """
+        argv that runs the CLI non-interactively, reading the prompt from stdin.
+
+        Used by _execute_cli() and _stream_cli(). Providers that build
+        their command differently can leave this as None.
+        """
+        return None
+
     @abstractmethod
     async def execute(
         self,
@@ -38,6 +322,38 @@ class CLIProvider(ABC):
         """
         pass
 
+    async def execute_stream(
+        self,
+        prompt: str,
+        working_directory: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute CLI command with prompt, yielding output as it arrives.
+
+        The default implementation runs execute() and yields the whole
+        response as a single chunk. Providers that can read their CLI's
+        stdout incrementally should override this.
+
+        Yields:
+            {"type": "chunk", "data": str} for each piece of output, then
+            a final event:
+            {
+                "type": "done",
+                "success": bool,
+                "error": Optional[str],
+                "execution_time": float (seconds)
+            }
+        """
+        result = await self.execute(prompt, working_directory)
+        if result.get("response"):
+            yield {"type": "chunk", "data": result["response"]}
+        yield {
+            "type": "done",
+            "success": result["success"],
+            "error": result.get("error"),
+            "execution_time": result.get("execution_time")
+        }
+
     @abstractmethod
     async def check_availability(self) -> Dict[str, Any]:
         """
@@ -51,3 +367,426 @@ class CLIProvider(ABC):
             }
         """
         pass
+
+    def session_command(self, session_id: str, resume: bool) -> Optional[List[str]]:
+        """
+        argv that runs one turn of a conversation the CLI keeps itself.
+
+        Args:
+            session_id: UUID identifying the conversation
+            resume: False for the first turn, True to continue it
+
+        Returns:
+            None (the default) if the CLI can't keep conversations; the
+            session layer then replays a transcript through execute()
+        """
+        return None
+
+    async def execute_session(
+        self,
+        prompt: str,
+        working_directory: Optional[str],
+        session_id: str,
+        resume: bool
+    ) -> Dict[str, Any]:
+        """
+        Run one turn of a CLI-kept conversation with session_command().
+
+        Returns the same result as execute().
+        """
+        start_time = time.time()
+        try:
+            return await self._execute_cli(
+                prompt,
+                working_directory,
+                start_time,
+                f"{self.display_name} returned an error",
+                command=self.session_command(session_id, resume)
+            )
+        except FileNotFoundError:
+            return {
+                "success": False,
+                "response": "",
+                "error": f"{self.display_name} not found in PATH",
+                "execution_time": time.time() - start_time
+            }
+        except Exception as e:
+            return {
+                "success": False,
+                "response": "",
+                "error": f"Error executing {self.display_name}: {str(e)}",
+                "execution_time": time.time() - start_time
+            }
+
+    async def execute_session_stream(
+        self,
+        prompt: str,
+        working_directory: Optional[str],
+        session_id: str,
+        resume: bool
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run one turn of a CLI-kept conversation, yielding execute_stream() events.
+        """
+        start_time = time.time()
+        try:
+            async for event in self._stream_cli(
+                prompt,
+                working_directory,
+                start_time,
+                f"{self.display_name} returned an error",
+                command=self.session_command(session_id, resume)
+            ):
+                yield event
+        except FileNotFoundError:
+            yield {
+                "type": "done",
+                "success": False,
+                "error": f"{self.display_name} not found in PATH",
+                "execution_time": time.time() - start_time
+            }
+        except Exception as e:
+            yield {
+                "type": "done",
+                "success": False,
+                "error": f"Error executing {self.display_name}: {str(e)}",
+                "execution_time": time.time() - start_time
+            }
+
+    @property
+    def json_command(self) -> Optional[List[str]]:
+        """
+        argv that runs the CLI with machine-readable output, reading the prompt from stdin.
+
+        None (the default) if the CLI has no such mode; output_parser()
+        must then also return None.
+        """
+        return None
+
+    def output_parser(self) -> Optional[OutputParser]:
+        """A new parser for the output of json_command, or None."""
+        return None
+
+    async def execute_json(
+        self,
+        prompt: str,
+        working_directory: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Run json_command and parse its output as it is read.
+
+        Returns:
+            The execute() result, with response set to the final answer,
+            plus "usage" and "tool_events" (see OutputParser). A final
+            answer longer than OUTPUT_INLINE_BYTES is saved as an artifact,
+            as in _execute_cli()
+        """
+        result = {"success": False, "response": "", "error": None, "execution_time": 0.0}
+        async for event in self.execute_json_stream(prompt, working_directory):
+            if event["type"] == "done":
+                result = {key: value for key, value in event.items() if key != "type"}
+                result.setdefault("response", "")
+
+        inline_bytes, max_bytes, _ = self._output_limits()
+        if len(result["response"]) > inline_bytes // 4:
+            output = CappedOutput(artifact_store, inline_bytes, max_bytes)
+            output.write(result["response"].encode("utf-8"))
+            output.close()
+            if output.truncated:
+                result["response"] = output.text()
+                result.update(output.result_fields())
+        return result
+
+    async def execute_json_stream(
+        self,
+        prompt: str,
+        working_directory: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run json_command, yielding execute_stream() events as the output is parsed.
+
+        Besides "chunk" events for answer text, yields a "tool" event for
+        each finished tool call. The "done" event also carries response,
+        usage and tool_events.
+        """
+        start_time = time.time()
+        if self.json_command is None:
+            yield {
+                "type": "done",
+                "success": False,
+                "error": f"{self.display_name} has no JSON output mode",
+                "execution_time": 0.0
+            }
+            return
+        try:
+            async for event in self._stream_cli(
+                prompt,
+                working_directory,
+                start_time,
+                f"{self.display_name} returned an error",
+                command=self.json_command,
+                parser=self.output_parser()
+            ):
+                yield event
+        except FileNotFoundError:
+            yield {
+                "type": "done",
+                "success": False,
+                "error": f"{self.display_name} not found in PATH",
+                "execution_time": time.time() - start_time
+            }
+        except Exception as e:
+            yield {
+                "type": "done",
+                "success": False,
+                "error": f"Error executing {self.display_name}: {str(e)}",
+                "execution_time": time.time() - start_time
+            }
+
+    @property
+    def pool_command(self) -> Optional[List[str]]:
+        """
+        argv for a pre-spawned worker that reads its prompt from stdin.
+
+        Defaults to command; None disables the worker pool for a provider.
+        """
+        return self.command
+
+    def _output_limits(self) -> Tuple[int, int, int]:
+        """(OUTPUT_INLINE_BYTES, OUTPUT_MAX_BYTES, STDERR_MAX_BYTES) for this provider."""
+        return (
+            config.for_provider(self.name, "OUTPUT_INLINE_BYTES", config.OUTPUT_INLINE_BYTES),
+            config.for_provider(self.name, "OUTPUT_MAX_BYTES", config.OUTPUT_MAX_BYTES),
+            config.for_provider(self.name, "STDERR_MAX_BYTES", config.STDERR_MAX_BYTES),
+        )
+
+    def _acquire_worker(self, working_directory: Optional[str]) -> Optional[asyncio.subprocess.Process]:
+        """Take a pre-spawned worker if the pool is enabled and can serve this request."""
+        if self.pool is None or working_directory is not None:
+            return None
+        return self.pool.acquire()
+
+    async def _execute_cli(
+        self,
+        prompt: str,
+        working_directory: Optional[str],
+        start_time: float,
+        default_error: str,
+        command: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Run command with the prompt on stdin and return an execute() result.
+
+        Uses a pre-spawned worker when one is ready, unless a different
+        command is given. Output is capped by _output_limits(): stdout
+        that doesn't fit inline goes to an artifact (see build_result()).
+
+        A working_directory that doesn't exist fails the run with
+        "caller_error" set, since the request rather than the CLI is at fault.
+
+        Raises:
+            FileNotFoundError: if the CLI is not on PATH
+        """
+        try:
+            process = await self._start_process(working_directory, command)
+        except WorkingDirectoryError as e:
+            return {
+                "success": False,
+                "response": "",
+                "error": str(e),
+                "execution_time": time.time() - start_time,
+                "caller_error": True
+            }
+        started = time.perf_counter()
+        sampler = asyncio.ensure_future(self._sample_peak_rss(process))
+        outcome = "cancelled"
+        inline_bytes, max_bytes, stderr_limit = self._output_limits()
+        stdout = CappedOutput(artifact_store, inline_bytes, max_bytes)
+        try:
+            try:
+                stderr = await communicate_capped(process, prompt, stdout, stderr_limit)
+            except BaseException:
+                stdout.discard()
+                raise
+            result = build_result(process.returncode, stdout, stderr, start_time, default_error)
+            outcome = "success" if result["success"] else "error"
+            RESPONSE_BYTES.observe(stdout.total, provider=self.name)
+            return result
+        finally:
+            self._record_exit(started, outcome, sampler)
+
+    async def _stream_cli(
+        self,
+        prompt: str,
+        working_directory: Optional[str],
+        start_time: float,
+        default_error: str,
+        command: Optional[List[str]] = None,
+        parser: Optional[OutputParser] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run command with the prompt on stdin, yielding execute_stream() events.
+
+        Uses a pre-spawned worker when one is ready, unless a different
+        command is given. With a parser, stdout is parsed as it is read
+        (see _stream_process()).
+
+        Like _execute_cli(), a working_directory that doesn't exist ends
+        with a "done" event with "caller_error" set.
+
+        Raises:
+            FileNotFoundError: if the CLI is not on PATH
+        """
+        try:
+            process = await self._start_process(working_directory, command)
+        except WorkingDirectoryError as e:
+            yield {
+                "type": "done",
+                "success": False,
+                "error": str(e),
+                "execution_time": time.time() - start_time,
+                "caller_error": True
+            }
+            return
+        started = time.perf_counter()
+        sampler = asyncio.ensure_future(self._sample_peak_rss(process))
+        outcome = "cancelled"
+        response_bytes = 0
+        try:
+            async for event in self._stream_process(process, start_time, default_error, prompt, parser):
+                if event["type"] == "chunk":
+                    response_bytes += len(event["data"].encode("utf-8"))
+                elif event["type"] == "done":
+                    outcome = "success" if event["success"] else "error"
+                    RESPONSE_BYTES.observe(response_bytes, provider=self.name)
+                yield event
+        finally:
+            self._record_exit(started, outcome, sampler)
+
+    async def _start_process(
+        self,
+        working_directory: Optional[str],
+        command: Optional[List[str]] = None
+    ) -> asyncio.subprocess.Process:
+        """
+        Take a pre-spawned worker or spawn the command, recording spawn metrics.
+
+        Pooled workers run self.command, so a different command always spawns.
+
+        Raises:
+            FileNotFoundError: if the CLI is not on PATH
+            WorkingDirectoryError: if working_directory isn't a directory
+        """
+        started = time.perf_counter()
+        process = self._acquire_worker(working_directory) if command is None else None
+        pooled = process is not None
+        if process is None:
+            process = await spawn_cli(command or self.command, working_directory)
+        SPAWN_TIME.observe(
+            time.perf_counter() - started,
+            provider=self.name,
+            pooled="true" if pooled else "false"
+        )
+        LIVE_SUBPROCESSES.inc(provider=self.name)
+        return process
+
+    async def _sample_peak_rss(self, process: asyncio.subprocess.Process):
+        """Track the process's peak memory until cancelled by _record_exit()."""
+        while process.returncode is None:
+            peak = peak_rss_bytes(process.pid)
+            if peak is None:
+                return
+            CHILD_PEAK_RSS.set_max(peak, provider=self.name)
+            await asyncio.sleep(RSS_SAMPLE_INTERVAL)
+
+    def _record_exit(self, started: float, outcome: str, sampler: asyncio.Task):
+        """Record metrics for a process started by _start_process() that has finished."""
+        sampler.cancel()
+        LIVE_SUBPROCESSES.dec(provider=self.name)
+        RUN_TIME.observe(time.perf_counter() - started, provider=self.name)
+        EXECUTIONS.inc(provider=self.name, outcome=outcome)
+
+    async def _stream_process(
+        self,
+        process: asyncio.subprocess.Process,
+        start_time: float,
+        default_error: str,
+        stdin_data: Optional[str] = None,
+        parser: Optional[OutputParser] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield a running process's stdout in chunks.
+
+        Yields the same events as execute_stream(). stdin_data is written
+        and stderr is collected in the background, so neither a large
+        prompt nor a chatty CLI can fill a pipe and stall. If the consumer
+        stops iterating early, the process group is killed.
+
+        With a parser, each piece of stdout is fed to it and its events are
+        yielded instead of raw chunks; the "done" event then also carries
+        the fields from parser.finish(), and fails if the output reported
+        an error.
+
+        Stdout past OUTPUT_MAX_BYTES is read but dropped, and the "done"
+        event then carries truncated and output_bytes.
+        """
+        _, max_bytes, stderr_limit = self._output_limits()
+        stdin_task = asyncio.ensure_future(feed_stdin(process, stdin_data))
+        stderr_task = asyncio.ensure_future(read_tail(process.stderr, stderr_limit))
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        total = 0
+
+        try:
+            while True:
+                data = await process.stdout.read(STREAM_CHUNK_SIZE)
+                if not data:
+                    break
+                kept = max_bytes - total
+                total += len(data)
+                if kept <= 0:
+                    continue
+                text = decoder.decode(data[:kept])
+                if parser is not None:
+                    for event in parser.feed(text):
+                        yield event
+                elif text:
+                    yield {"type": "chunk", "data": text}
+
+            tail = decoder.decode(b"", final=True)
+            if parser is not None:
+                for event in parser.feed(tail) + parser.flush():
+                    yield event
+            elif tail:
+                yield {"type": "chunk", "data": tail}
+
+            stderr = await stderr_task
+            await process.wait()
+            execution_time = time.time() - start_time
+            parsed = parser.finish() if parser is not None else {}
+            output_error = parsed.pop("error", None)
+            if total > max_bytes:
+                parsed.update(truncated=True, output_bytes=total)
+
+            if process.returncode != 0:
+                error_msg = stderr.decode("utf-8", errors="replace").strip()
+                yield {
+                    "type": "done",
+                    "success": False,
+                    "error": output_error or error_msg or default_error,
+                    "execution_time": execution_time,
+                    **parsed
+                }
+                return
+
+            yield {
+                "type": "done",
+                "success": output_error is None,
+                "error": output_error,
+                "execution_time": execution_time,
+                **parsed
+            }
+        finally:
+            stdin_task.cancel()
+            if process.returncode is None:
+                await asyncio.shield(terminate(process))
+            stderr_task.cancel()
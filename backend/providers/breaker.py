@@ -0,0 +1,203 @@
+"""Per-provider circuit breakers that stop sending prompts to a failing CLI."""
+
+import math
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from ..config import config
+from ..metrics import CIRCUIT_STATE
+from ..scheduler import SchedulerError
+
+
+# Breaker states; CIRCUIT_STATE reports them by index
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+STATES = (CLOSED, HALF_OPEN, OPEN)
+
+
+class CircuitOpenError(SchedulerError):
+    """Raised when a provider's circuit breaker is open and the request isn't run."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one provider.
+
+    Closed, every call runs. The breaker opens after failure_threshold
+    failures in a row, or once at least min_calls of the last window
+    calls have finished and failure_rate of them failed. Open, calls are
+    refused without spawning a process. After open_time seconds it is
+    half-open: a single probe call runs, and the breaker closes if it
+    succeeds or opens again if it fails. Other calls are refused until the
+    probe finishes.
+
+    Outcomes of calls started before the breaker opened are ignored, so a
+    slow success can't close it without a probe.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        failure_rate: float,
+        window: int,
+        min_calls: int,
+        open_time: float
+    ):
+        """
+        Args:
+            name: Provider name, for errors and metrics
+            failure_threshold: Consecutive failures that open the breaker; 0 disables
+            failure_rate: Fraction of failed calls in the window that opens it; 0 disables
+            window: Number of recent calls the failure rate is taken over
+            min_calls: Calls needed in the window before the failure rate counts
+            open_time: Seconds to stay open before letting a probe through
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.failure_rate = failure_rate
+        self.min_calls = max(min_calls, 1)
+        self.open_time = open_time
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opens = 0
+        self.rejections = 0
+        self.opened_at: Optional[float] = None  # Unix time
+        self._outcomes: Deque[bool] = deque(maxlen=max(window, 1))
+        self._open_until = 0.0
+        self._probing = False
+
+    def acquire(self) -> bool:
+        """
+        Admit a call, or refuse it.
+
+        Returns:
+            True if the call is the half-open probe, whose outcome decides
+            whether the breaker closes
+
+        Raises:
+            CircuitOpenError: if the breaker is open, or half-open with a
+                probe already running
+        """
+        if self.state == OPEN and time.monotonic() >= self._open_until:
+            self._set_state(HALF_OPEN)
+        if self.state == CLOSED:
+            return False
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+
+        self.rejections += 1
+        raise CircuitOpenError(
+            f"Provider '{self.name}' is failing (circuit breaker {self.state.replace('_', '-')}); "
+            f"not sending requests to it for now",
+            retry_after=self.retry_after
+        )
+
+    def record(self, success: bool, probe: bool = False):
+        """
+        Record the outcome of an admitted call.
+
+        Args:
+            success: Whether the call succeeded
+            probe: Whether it was the half-open probe (acquire() returned True)
+        """
+        if probe:
+            self._probing = False
+            if success:
+                self._reset()
+            else:
+                self._open()
+            return
+        if self.state != CLOSED:
+            return
+
+        self._outcomes.append(success)
+        if success:
+            self.consecutive_failures = 0
+            return
+        self.consecutive_failures += 1
+        if self.failure_threshold > 0 and self.consecutive_failures >= self.failure_threshold:
+            self._open()
+        elif self.failure_rate > 0 and len(self._outcomes) >= self.min_calls:
+            failures = self._outcomes.count(False)
+            if failures >= self.failure_rate * len(self._outcomes):
+                self._open()
+
+    def abandon(self, probe: bool):
+        """
+        Give up on an admitted call that ended without an outcome (cancelled, refused by the queue).
+
+        Args:
+            probe: Whether it was the half-open probe; if so, the next call probes instead
+        """
+        if probe:
+            self._probing = False
+
+    @property
+    def accepting(self) -> bool:
+        """Whether acquire() would admit a call now; doesn't claim the probe."""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN and time.monotonic() < self._open_until:
+            return False
+        return not self._probing
+
+    @property
+    def retry_after(self) -> int:
+        """Whole seconds until the breaker lets a probe through (at least 1)."""
+        return max(1, math.ceil(self._open_until - time.monotonic()))
+
+    def _open(self):
+        self._open_until = time.monotonic() + self.open_time
+        self.opened_at = time.time()
+        self.opens += 1
+        self._set_state(OPEN)
+
+    def _reset(self):
+        self.consecutive_failures = 0
+        self._outcomes.clear()
+        self._set_state(CLOSED)
+
+    def _set_state(self, state: str):
+        self.state = state
+        CIRCUIT_STATE.set(STATES.index(state), provider=self.name)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot for the API."""
+        if self.state == OPEN and time.monotonic() >= self._open_until:
+            state = HALF_OPEN  # Due for a probe
+        else:
+            state = self.state
+        outcomes = len(self._outcomes)
+        return {
+            "state": state,
+            "consecutive_failures": self.consecutive_failures,
+            "failure_rate": self._outcomes.count(False) / outcomes if outcomes else 0.0,
+            "opens": self.opens,
+            "rejections": self.rejections,
+            "opened_at": self.opened_at,
+            "retry_after": self.retry_after if state == OPEN else None,
+        }
+
+
+def create_breaker(name: str) -> Optional[CircuitBreaker]:
+    """
+    Circuit breaker for a provider from the CIRCUIT_* settings.
+
+    Returns:
+        A CircuitBreaker, or None when CIRCUIT_BREAKER is off
+    """
+    if not config.CIRCUIT_BREAKER:
+        return None
+    return CircuitBreaker(
+        name,
+        failure_threshold=config.for_provider(name, "CIRCUIT_FAILURE_THRESHOLD", config.CIRCUIT_FAILURE_THRESHOLD),
+        failure_rate=config.for_provider(name, "CIRCUIT_FAILURE_RATE", config.CIRCUIT_FAILURE_RATE),
+        window=config.for_provider(name, "CIRCUIT_WINDOW", config.CIRCUIT_WINDOW),
+        min_calls=config.for_provider(name, "CIRCUIT_MIN_CALLS", config.CIRCUIT_MIN_CALLS),
+        open_time=config.for_provider(name, "CIRCUIT_OPEN_TIME", config.CIRCUIT_OPEN_TIME)
+    )
@@ -1,16 +1,78 @@
 """Claude Code CLI provider implementation."""
 
-import asyncio
-import os
-import tempfile
 import time
-from typing import Dict, Any, Optional
-
-from .base import CLIProvider
+from typing import Dict, Any, Optional, AsyncIterator, List
+
+from .base import CLIProvider, run_cli, build_version_status, VERSION_CHECK_TIMEOUT
+from .output import JSONLinesParser, flatten_content
+
+
+class ClaudeOutputParser(JSONLinesParser):
+    """
+    Parses `claude --output-format stream-json` events.
+
+    Text blocks of assistant messages are streamed as they arrive; a tool
+    call is reported once its result comes back. The final "result" event
+    carries the answer, token usage and cost.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._pending_tools: Dict[str, Dict[str, Any]] = {}
+
+    def handle(self, event: Dict[str, Any]) -> List[Dict[str, Any]]:
+        kind = event.get("type")
+        if kind == "result":
+            if isinstance(event.get("result"), str):
+                self.final_text = event["result"]
+            usage = event.get("usage") or {}
+            self.add_usage(
+                usage.get("input_tokens"),
+                usage.get("output_tokens"),
+                usage.get("cache_read_input_tokens"),
+                event.get("total_cost_usd")
+            )
+            if event.get("is_error"):
+                self.error = event.get("result") or event.get("subtype") or "Claude CLI reported an error"
+            return []
+
+        if kind not in ("assistant", "user"):
+            return []
+        content = (event.get("message") or {}).get("content")
+        if not isinstance(content, list):
+            return []
+
+        events = []
+        for block in content:
+            if not isinstance(block, dict):
+                continue
+            block_type = block.get("type")
+            if block_type == "text":
+                events.extend(self.text(block.get("text", "")))
+            elif block_type == "tool_use":
+                self._pending_tools[block.get("id")] = block
+            elif block_type == "tool_result":
+                call = self._pending_tools.pop(block.get("tool_use_id"), {})
+                events.extend(self.tool(
+                    call.get("name", "unknown"),
+                    call.get("input"),
+                    flatten_content(block.get("content")),
+                    bool(block.get("is_error")),
+                    block.get("tool_use_id")
+                ))
+        return events
+
+    def flush(self) -> List[Dict[str, Any]]:
+        events = super().flush()
+        # Tool calls that never got a result, e.g. when the CLI was stopped
+        for tool_id, call in self._pending_tools.items():
+            events.extend(self.tool(call.get("name", "unknown"), call.get("input"), tool_id=tool_id))
+        self._pending_tools = {}
+        return events
 
 
 class ClaudeProvider(CLIProvider):
-    """Provider for Claude Code CLI using temporary file approach."""
+    """Provider for Claude Code CLI, piping the prompt to `claude --print` on stdin."""
 
     @property
     def name(self) -> str:
@@ -22,67 +84,46 @@ class ClaudeProvider(CLIProvider):
         """Display name for UI."""
         return "Claude Code"
 
+    @property
+    def command(self) -> List[str]:
+        """Claude reads the prompt from stdin in --print mode."""
+        return ["claude", "--print"]
+
+    @property
+    def json_command(self) -> List[str]:
+        """stream-json prints one event per line; it requires --verbose in --print mode."""
+        return ["claude", "--print", "--output-format", "stream-json", "--verbose"]
+
+    def output_parser(self) -> ClaudeOutputParser:
+        """Parser for json_command's events."""
+        return ClaudeOutputParser()
+
+    def session_command(self, session_id: str, resume: bool) -> List[str]:
+        """Claude keeps conversations itself, per working directory."""
+        if resume:
+            return ["claude", "--print", "--resume", session_id]
+        return ["claude", "--print", "--session-id", session_id]
+
     async def execute(
         self,
         prompt: str,
         working_directory: Optional[str] = None
     ) -> Dict[str, Any]:
         """
-        Execute Claude CLI with prompt using temporary file approach.
+        Execute Claude CLI with prompt piped on stdin.
 
         This method:
-        1. Writes prompt to a temporary file
-        2. Uses platform-specific command (type on Windows, cat on Unix)
-        3. Pipes to claude --print
-        4. Returns parsed response
+        1. Takes a pre-spawned worker, or starts `claude --print` directly (no shell)
+        2. Writes the prompt to its stdin
+        3. Returns parsed response
         """
-        temp_file = None
         start_time = time.time()
 
         try:
-            # Write prompt to temporary file
-            with tempfile.NamedTemporaryFile(
-                mode='w',
-                suffix='.txt',
-                delete=False,
-                encoding='utf-8'
-            ) as f:
-                f.write(prompt)
-                temp_file = f.name
-
-            # Build platform-specific command
-            if os.name == 'nt':  # Windows
-                cmd = f'type "{temp_file}" | claude --print'
-            else:  # Linux/Mac
-                cmd = f'cat "{temp_file}" | claude --print'
-
-            # Execute command
-            process = await asyncio.create_subprocess_shell(
-                cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd=working_directory
+            return await self._execute_cli(
+                prompt, working_directory, start_time, "Claude CLI returned an error"
             )
 
-            stdout, stderr = await process.communicate()
-            execution_time = time.time() - start_time
-
-            if process.returncode != 0:
-                error_msg = stderr.decode("utf-8", errors="replace").strip()
-                return {
-                    "success": False,
-                    "response": "",
-                    "error": error_msg or "Claude CLI returned an error",
-                    "execution_time": execution_time
-                }
-
-            return {
-                "success": True,
-                "response": stdout.decode("utf-8", errors="replace"),
-                "error": None,
-                "execution_time": execution_time
-            }
-
         except FileNotFoundError:
             execution_time = time.time() - start_time
             return {
@@ -99,13 +140,39 @@ class ClaudeProvider(CLIProvider):
                 "error": f"Error executing Claude CLI: {str(e)}",
                 "execution_time": execution_time
             }
-        finally:
-            # Clean up temporary file
-            if temp_file and os.path.exists(temp_file):
-                try:
-                    os.remove(temp_file)
-                except Exception:
-                    pass  # Ignore cleanup errors
+
+    async def execute_stream(
+        self,
+        prompt: str,
+        working_directory: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute Claude CLI with prompt, yielding stdout as it arrives.
+
+        Runs the same command as execute().
+        """
+        start_time = time.time()
+
+        try:
+            async for event in self._stream_cli(
+                prompt, working_directory, start_time, "Claude CLI returned an error"
+            ):
+                yield event
+
+        except FileNotFoundError:
+            yield {
+                "type": "done",
+                "success": False,
+                "error": "Claude CLI not found. Please ensure Claude Code is installed and in PATH.",
+                "execution_time": time.time() - start_time
+            }
+        except Exception as e:
+            yield {
+                "type": "done",
+                "success": False,
+                "error": f"Error executing Claude CLI: {str(e)}",
+                "execution_time": time.time() - start_time
+            }
 
     async def check_availability(self) -> Dict[str, Any]:
         """
@@ -114,28 +181,10 @@ class ClaudeProvider(CLIProvider):
         Tries to run 'claude --version' to verify installation.
         """
         try:
-            process = await asyncio.create_subprocess_shell(
-                'claude --version',
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+            returncode, stdout, stderr = await run_cli(
+                ["claude", "--version"], timeout=VERSION_CHECK_TIMEOUT
             )
-
-            stdout, stderr = await process.communicate()
-
-            if process.returncode == 0:
-                version = stdout.decode("utf-8", errors="replace").strip()
-                return {
-                    "available": True,
-                    "version": version if version else "installed",
-                    "error": None
-                }
-            else:
-                error_msg = stderr.decode("utf-8", errors="replace").strip()
-                return {
-                    "available": False,
-                    "version": None,
-                    "error": error_msg or "Claude CLI check failed"
-                }
+            return build_version_status(returncode, stdout, stderr, "Claude CLI check failed")
 
         except FileNotFoundError:
             return {
@@ -1,16 +1,71 @@
 """Codex CLI provider implementation."""
 
-import asyncio
-import os
-import tempfile
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, AsyncIterator, List
 
-from .base import CLIProvider
+from .base import CLIProvider, run_cli, build_version_status, VERSION_CHECK_TIMEOUT
+from .output import JSONLinesParser, flatten_content
+
+
+class CodexOutputParser(JSONLinesParser):
+    """
+    Parses `codex exec --json` events.
+
+    Each completed item is reported as it arrives: agent messages as
+    text (the last one is the answer) and commands, file changes, MCP
+    tool calls and web searches as tool events. Usage is summed over turns.
+    """
+
+    def handle(self, event: Dict[str, Any]) -> List[Dict[str, Any]]:
+        kind = event.get("type")
+        if kind == "turn.completed":
+            usage = event.get("usage") or {}
+            self.add_usage(
+                usage.get("input_tokens"),
+                usage.get("output_tokens"),
+                usage.get("cached_input_tokens")
+            )
+        elif kind == "turn.failed":
+            self.error = (event.get("error") or {}).get("message") or "Codex turn failed"
+        elif kind == "error":
+            self.error = event.get("message") or "Codex reported an error"
+        elif kind == "item.completed":
+            return self._item(event.get("item") or {})
+        return []
+
+    def _item(self, item: Dict[str, Any]) -> List[Dict[str, Any]]:
+        item_type = item.get("type")
+        failed = item.get("status") == "failed"
+        if item_type == "agent_message":
+            # Separate consecutive messages in the streamed text
+            separator = "\n\n" if self.text_parts else ""
+            self.final_text = item.get("text", "")
+            return self.text(separator + self.final_text)
+        if item_type == "command_execution":
+            return self.tool(
+                "command_execution",
+                {"command": item.get("command")},
+                item.get("aggregated_output"),
+                failed or item.get("exit_code") not in (0, None),
+                item.get("id")
+            )
+        if item_type == "file_change":
+            return self.tool("file_change", {"changes": item.get("changes")}, None, failed, item.get("id"))
+        if item_type == "mcp_tool_call":
+            return self.tool(
+                f"{item.get('server')}.{item.get('tool')}",
+                item.get("arguments"),
+                flatten_content(item.get("result")),
+                failed,
+                item.get("id")
+            )
+        if item_type == "web_search":
+            return self.tool("web_search", {"query": item.get("query")}, None, failed, item.get("id"))
+        return []
 
 
 class CodexProvider(CLIProvider):
-    """Provider for Codex CLI using temporary file approach."""
+    """Provider for Codex CLI, piping the prompt to `codex exec -` on stdin."""
 
     @property
     def name(self) -> str:
@@ -22,55 +77,40 @@ class CodexProvider(CLIProvider):
         """Display name for UI."""
         return "Codex"
 
+    @property
+    def command(self) -> List[str]:
+        """'codex exec -' runs non-interactively, reading the prompt from stdin."""
+        return ["codex", "exec", "-"]
+
+    @property
+    def json_command(self) -> List[str]:
+        """--json prints one event per line instead of the human-readable log."""
+        return ["codex", "exec", "--json", "-"]
+
+    def output_parser(self) -> CodexOutputParser:
+        """Parser for json_command's events."""
+        return CodexOutputParser()
+
     async def execute(
         self,
         prompt: str,
         working_directory: Optional[str] = None
     ) -> Dict[str, Any]:
         """
-        Execute Codex CLI with prompt using exec subcommand for non-interactive mode.
+        Execute Codex CLI with prompt piped on stdin.
 
         This method:
-        1. Escapes the prompt string properly
-        2. Uses 'codex exec' for non-interactive execution
+        1. Takes a pre-spawned worker, or starts `codex exec -` directly (no shell)
+        2. Writes the prompt to its stdin
         3. Returns parsed response
         """
         start_time = time.time()
 
         try:
-            # Escape the prompt for shell (proper escaping for direct string approach)
-            escaped_prompt = prompt.replace('"', '\\"').replace('$', '\\$').replace('`', '\\`')
-
-            # Build command with 'exec' subcommand for non-interactive mode
-            cmd = f'codex exec "{escaped_prompt}"'
-
-            # Execute command
-            process = await asyncio.create_subprocess_shell(
-                cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd=working_directory
+            return await self._execute_cli(
+                prompt, working_directory, start_time, "Codex CLI returned an error"
             )
 
-            stdout, stderr = await process.communicate()
-            execution_time = time.time() - start_time
-
-            if process.returncode != 0:
-                error_msg = stderr.decode("utf-8", errors="replace").strip()
-                return {
-                    "success": False,
-                    "response": "",
-                    "error": error_msg or "Codex CLI returned an error",
-                    "execution_time": execution_time
-                }
-
-            return {
-                "success": True,
-                "response": stdout.decode("utf-8", errors="replace"),
-                "error": None,
-                "execution_time": execution_time
-            }
-
         except FileNotFoundError:
             execution_time = time.time() - start_time
             return {
@@ -88,6 +128,39 @@ class CodexProvider(CLIProvider):
                 "execution_time": execution_time
             }
 
+    async def execute_stream(
+        self,
+        prompt: str,
+        working_directory: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute Codex CLI with prompt, yielding stdout as it arrives.
+
+        Runs the same command as execute().
+        """
+        start_time = time.time()
+
+        try:
+            async for event in self._stream_cli(
+                prompt, working_directory, start_time, "Codex CLI returned an error"
+            ):
+                yield event
+
+        except FileNotFoundError:
+            yield {
+                "type": "done",
+                "success": False,
+                "error": "Codex CLI not found. Please ensure Codex is installed and in PATH.",
+                "execution_time": time.time() - start_time
+            }
+        except Exception as e:
+            yield {
+                "type": "done",
+                "success": False,
+                "error": f"Error executing Codex CLI: {str(e)}",
+                "execution_time": time.time() - start_time
+            }
+
     async def check_availability(self) -> Dict[str, Any]:
         """
         Check if Codex CLI is installed and available.
@@ -95,28 +168,10 @@ class CodexProvider(CLIProvider):
         Tries to run 'codex --version' to verify installation.
         """
         try:
-            process = await asyncio.create_subprocess_shell(
-                'codex --version',
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+            returncode, stdout, stderr = await run_cli(
+                ["codex", "--version"], timeout=VERSION_CHECK_TIMEOUT
             )
-
-            stdout, stderr = await process.communicate()
-
-            if process.returncode == 0:
-                version = stdout.decode("utf-8", errors="replace").strip()
-                return {
-                    "available": True,
-                    "version": version if version else "installed",
-                    "error": None
-                }
-            else:
-                error_msg = stderr.decode("utf-8", errors="replace").strip()
-                return {
-                    "available": False,
-                    "version": None,
-                    "error": error_msg or "Codex CLI check failed"
-                }
+            return build_version_status(returncode, stdout, stderr, "Codex CLI check failed")
 
         except FileNotFoundError:
             return {
@@ -0,0 +1,176 @@
+"""Fake CLI provider for benchmarking the wrapper without a real LLM CLI."""
+
+import asyncio
+import random
+import sys
+import time
+from typing import Dict, Any, Optional, AsyncIterator, List
+
+from ..config import config
+from .base import CLIProvider
+
+
+# Stub CLI run in "process" mode. Reads the prompt from stdin, then writes
+# output_bytes of output in `chunks` pieces spread evenly over `latency`.
+FAKE_CLI_SCRIPT = """
+import random, sys, time
+latency, output_bytes, chunks, error_rate = float(sys.argv[1]), int(sys.argv[2]), int(sys.argv[3]), float(sys.argv[4])
+prompt = sys.stdin.read()
+if random.random() < error_rate:
+    time.sleep(latency)
+    sys.stderr.write("fake CLI error")
+    sys.exit(1)
+body = (prompt[:64] + "\\n").ljust(output_bytes, "x")[:output_bytes]
+size = -(-len(body) // chunks) if body else 0
+for i in range(chunks):
+    time.sleep(latency / chunks)
+    sys.stdout.write(body[i * size:(i + 1) * size])
+    sys.stdout.flush()
+"""
+
+
+def fake_output(prompt: str, output_bytes: int) -> str:
+    """The output the stub CLI produces for a prompt (prompt prefix, then padding)."""
+    return (prompt[:64] + "\n").ljust(output_bytes, "x")[:output_bytes]
+
+
+class FakeProvider(CLIProvider):
+    """
+    Provider that answers with generated output after a fixed latency.
+
+    In "process" mode each prompt runs a small Python stub CLI through the
+    same spawn, pool and streaming path as the real providers; in "inline"
+    mode no process is started, isolating the HTTP and scheduling overhead.
+    Enabled with FAKE_PROVIDER_ENABLED.
+    """
+
+    def __init__(
+        self,
+        latency: Optional[float] = None,
+        output_bytes: Optional[int] = None,
+        chunks: Optional[int] = None,
+        error_rate: Optional[float] = None,
+        mode: Optional[str] = None
+    ):
+        """
+        Args:
+            latency: Seconds from receiving the prompt to the last output
+            output_bytes: Size of each response
+            chunks: Number of pieces the output is written in
+            error_rate: Fraction of prompts that fail (0 to 1)
+            mode: "process" or "inline"
+        """
+        self.latency = config.FAKE_LATENCY if latency is None else latency
+        self.output_bytes = config.FAKE_OUTPUT_BYTES if output_bytes is None else output_bytes
+        self.chunks = max(1, config.FAKE_CHUNKS if chunks is None else chunks)
+        self.error_rate = config.FAKE_ERROR_RATE if error_rate is None else error_rate
+        self.mode = mode or config.FAKE_MODE
+
+    @property
+    def name(self) -> str:
+        """Provider name."""
+        return "fake"
+
+    @property
+    def display_name(self) -> str:
+        """Display name for UI."""
+        return "Fake CLI (benchmark)"
+
+    @property
+    def command(self) -> Optional[List[str]]:
+        """Python stub CLI in "process" mode; None in "inline" mode."""
+        if self.mode != "process":
+            return None
+        return [
+            sys.executable, "-c", FAKE_CLI_SCRIPT,
+            str(self.latency), str(self.output_bytes), str(self.chunks), str(self.error_rate)
+        ]
+
+    async def execute(
+        self,
+        prompt: str,
+        working_directory: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Answer the prompt with generated output after the configured latency."""
+        start_time = time.time()
+
+        if self.command is not None:
+            try:
+                return await self._execute_cli(
+                    prompt, working_directory, start_time, "Fake CLI returned an error"
+                )
+            except Exception as e:
+                return {
+                    "success": False,
+                    "response": "",
+                    "error": f"Error executing fake CLI: {str(e)}",
+                    "execution_time": time.time() - start_time
+                }
+
+        await asyncio.sleep(self.latency)
+        if random.random() < self.error_rate:
+            return {
+                "success": False,
+                "response": "",
+                "error": "fake CLI error",
+                "execution_time": time.time() - start_time
+            }
+        return {
+            "success": True,
+            "response": fake_output(prompt, self.output_bytes),
+            "error": None,
+            "execution_time": time.time() - start_time
+        }
+
+    async def execute_stream(
+        self,
+        prompt: str,
+        working_directory: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Yield the generated output in the configured number of chunks."""
+        start_time = time.time()
+
+        if self.command is not None:
+            try:
+                async for event in self._stream_cli(
+                    prompt, working_directory, start_time, "Fake CLI returned an error"
+                ):
+                    yield event
+            except Exception as e:
+                yield {
+                    "type": "done",
+                    "success": False,
+                    "error": f"Error executing fake CLI: {str(e)}",
+                    "execution_time": time.time() - start_time
+                }
+            return
+
+        if random.random() < self.error_rate:
+            await asyncio.sleep(self.latency)
+            yield {
+                "type": "done",
+                "success": False,
+                "error": "fake CLI error",
+                "execution_time": time.time() - start_time
+            }
+            return
+
+        body = fake_output(prompt, self.output_bytes)
+        size = -(-len(body) // self.chunks) if body else 0
+        for i in range(self.chunks):
+            await asyncio.sleep(self.latency / self.chunks)
+            yield {"type": "chunk", "data": body[i * size:(i + 1) * size]}
+        yield {
+            "type": "done",
+            "success": True,
+            "error": None,
+            "execution_time": time.time() - start_time
+        }
+
+    async def check_availability(self) -> Dict[str, Any]:
+        """Always available; no process is run."""
+        return {
+            "available": True,
+            "version": f"fake ({self.mode})",
+            "error": None
+        }
@@ -1,14 +1,38 @@
 """Gemini CLI provider implementation."""
 
-import asyncio
 import time
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, AsyncIterator, List
 
-from .base import CLIProvider
+from .base import CLIProvider, run_cli, build_version_status, VERSION_CHECK_TIMEOUT
+from .output import JSONDocumentParser
+
+
+class GeminiOutputParser(JSONDocumentParser):
+    """
+    Parses `gemini --output-format json`.
+
+    Gemini prints one document at the end, with the answer and per-model
+    token counts. Its stats only count tool calls by name, so no tool
+    events are reported.
+    """
+
+    def handle(self, document: Dict[str, Any]) -> List[Dict[str, Any]]:
+        error = document.get("error")
+        if error:
+            self.error = error.get("message") if isinstance(error, dict) else str(error)
+        models = (document.get("stats") or {}).get("models") or {}
+        for model in models.values():
+            tokens = model.get("tokens") or {}
+            self.add_usage(tokens.get("prompt"), tokens.get("candidates"), tokens.get("cached"))
+        response = document.get("response")
+        if not isinstance(response, str):
+            return []
+        self.final_text = response
+        return self.text(response)
 
 
 class GeminiProvider(CLIProvider):
-    """Provider for Gemini CLI using direct string approach."""
+    """Provider for Gemini CLI, piping the prompt to `gemini` on stdin."""
 
     @property
     def name(self) -> str:
@@ -20,55 +44,40 @@ class GeminiProvider(CLIProvider):
         """Display name for UI."""
         return "Gemini CLI"
 
+    @property
+    def command(self) -> List[str]:
+        """Gemini runs non-interactively with the prompt piped on stdin."""
+        return ["gemini"]
+
+    @property
+    def json_command(self) -> List[str]:
+        """Prints the answer and stats as one JSON document."""
+        return ["gemini", "--output-format", "json"]
+
+    def output_parser(self) -> GeminiOutputParser:
+        """Parser for json_command's output."""
+        return GeminiOutputParser()
+
     async def execute(
         self,
         prompt: str,
         working_directory: Optional[str] = None
     ) -> Dict[str, Any]:
         """
-        Execute Gemini CLI with prompt using direct string approach.
+        Execute Gemini CLI with prompt piped on stdin.
 
         This method:
-        1. Escapes the prompt string properly
-        2. Passes prompt directly to gemini command
+        1. Takes a pre-spawned worker, or starts `gemini` directly (no shell)
+        2. Writes the prompt to its stdin
         3. Returns parsed response (note: Gemini can be slow, typically 15-30 seconds)
         """
         start_time = time.time()
 
         try:
-            # Escape the prompt for shell (proper escaping for direct string approach)
-            escaped_prompt = prompt.replace('"', '\\"').replace('$', '\\$').replace('`', '\\`')
-
-            # Build command with escaped prompt
-            cmd = f'gemini "{escaped_prompt}"'
-
-            # Execute command
-            process = await asyncio.create_subprocess_shell(
-                cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd=working_directory
+            return await self._execute_cli(
+                prompt, working_directory, start_time, "Gemini CLI returned an error"
             )
 
-            stdout, stderr = await process.communicate()
-            execution_time = time.time() - start_time
-
-            if process.returncode != 0:
-                error_msg = stderr.decode("utf-8", errors="replace").strip()
-                return {
-                    "success": False,
-                    "response": "",
-                    "error": error_msg or "Gemini CLI returned an error",
-                    "execution_time": execution_time
-                }
-
-            return {
-                "success": True,
-                "response": stdout.decode("utf-8", errors="replace"),
-                "error": None,
-                "execution_time": execution_time
-            }
-
         except FileNotFoundError:
             execution_time = time.time() - start_time
             return {
@@ -86,6 +95,39 @@ class GeminiProvider(CLIProvider):
                 "execution_time": execution_time
             }
 
+    async def execute_stream(
+        self,
+        prompt: str,
+        working_directory: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Execute Gemini CLI with prompt, yielding stdout as it arrives.
+
+        Runs the same command as execute().
+        """
+        start_time = time.time()
+
+        try:
+            async for event in self._stream_cli(
+                prompt, working_directory, start_time, "Gemini CLI returned an error"
+            ):
+                yield event
+
+        except FileNotFoundError:
+            yield {
+                "type": "done",
+                "success": False,
+                "error": "Gemini CLI not found. Please ensure Gemini CLI is installed and in PATH.",
+                "execution_time": time.time() - start_time
+            }
+        except Exception as e:
+            yield {
+                "type": "done",
+                "success": False,
+                "error": f"Error executing Gemini CLI: {str(e)}",
+                "execution_time": time.time() - start_time
+            }
+
     async def check_availability(self) -> Dict[str, Any]:
         """
         Check if Gemini CLI is installed and available.
@@ -93,28 +135,10 @@ class GeminiProvider(CLIProvider):
         Tries to run 'gemini --version' to verify installation.
         """
         try:
-            process = await asyncio.create_subprocess_shell(
-                'gemini --version',
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
+            returncode, stdout, stderr = await run_cli(
+                ["gemini", "--version"], timeout=VERSION_CHECK_TIMEOUT
             )
-
-            stdout, stderr = await process.communicate()
-
-            if process.returncode == 0:
-                version = stdout.decode("utf-8", errors="replace").strip()
-                return {
-                    "available": True,
-                    "version": version if version else "installed",
-                    "error": None
-                }
-            else:
-                error_msg = stderr.decode("utf-8", errors="replace").strip()
-                return {
-                    "available": False,
-                    "version": None,
-                    "error": error_msg or "Gemini CLI check failed"
-                }
+            return build_version_status(returncode, stdout, stderr, "Gemini CLI check failed")
 
         except FileNotFoundError:
             return {
@@ -0,0 +1,191 @@
+"""Incremental parsing of CLIs' machine-readable output into a shared schema."""
+
+import json
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+
+# Output formats a request can ask for
+TEXT = "text"
+JSON = "json"
+
+
+class OutputParser(ABC):
+    """
+    Turns a CLI's machine-readable stdout into the normalized result.
+
+    Text is fed in as it is read from the CLI. feed() and, once stdout
+    ends, flush() return events for execute_stream() as soon as they can
+    be recognized, and finish() returns the fields added to the result:
+
+        {
+            "response": str,  # The final answer
+            "usage": Optional[{"input_tokens", "output_tokens", "cached_input_tokens", "cost_usd"}],
+            "tool_events": [{"id", "name", "input", "output", "is_error"}],
+            "error": Optional[str]  # Failure reported in the output itself
+        }
+    """
+
+    def __init__(self):
+        self.text_parts: List[str] = []
+        self.final_text: Optional[str] = None
+        self.usage: Optional[Dict[str, Any]] = None
+        self.tool_events: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+
+    @abstractmethod
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """
+        Parse the next piece of stdout.
+
+        Returns:
+            execute_stream() events: {"type": "chunk", "data": str} for
+            answer text and {"type": "tool", ...tool event} for each tool
+            call once it has finished
+        """
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """Parse whatever is left once stdout has ended; returns the last events."""
+        return []
+
+    def finish(self) -> Dict[str, Any]:
+        """Return the normalized fields; call after flush()."""
+        return {
+            "response": self.final_text if self.final_text is not None else "".join(self.text_parts),
+            "usage": self.usage,
+            "tool_events": self.tool_events,
+            "error": self.error,
+        }
+
+    def add_usage(self, input_tokens=None, output_tokens=None, cached_input_tokens=None, cost_usd=None):
+        """Add token counts and cost to the totals; None leaves a field as it is."""
+        if self.usage is None:
+            self.usage = {
+                "input_tokens": None,
+                "output_tokens": None,
+                "cached_input_tokens": None,
+                "cost_usd": None,
+            }
+        for key, value in (
+            ("input_tokens", input_tokens),
+            ("output_tokens", output_tokens),
+            ("cached_input_tokens", cached_input_tokens),
+            ("cost_usd", cost_usd),
+        ):
+            if value is not None:
+                self.usage[key] = (self.usage[key] or 0) + value
+
+    def text(self, data: str) -> List[Dict[str, Any]]:
+        """Record answer text and return it as a chunk event."""
+        if not data:
+            return []
+        self.text_parts.append(data)
+        return [{"type": "chunk", "data": data}]
+
+    def tool(
+        self,
+        name: str,
+        tool_input: Optional[Dict[str, Any]] = None,
+        output: Optional[str] = None,
+        is_error: bool = False,
+        tool_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Record a finished tool call and return it as a tool event."""
+        event = {"id": tool_id, "name": name, "input": tool_input, "output": output, "is_error": is_error}
+        self.tool_events.append(event)
+        return [{"type": "tool", **event}]
+
+
+class JSONLinesParser(OutputParser):
+    """
+    Parser for CLIs that print one JSON event per line.
+
+    Complete lines are decoded as they arrive; a partial line waits for
+    the rest. Lines that aren't JSON objects, such as warnings, are skipped.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # Pieces of a line still waiting for its newline
+        self._partial: List[str] = []
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        events = []
+        start = 0
+        while True:
+            end = text.find("\n", start)
+            if end < 0:
+                if start < len(text):
+                    self._partial.append(text[start:])
+                return events
+            self._partial.append(text[start:end])
+            line = "".join(self._partial)
+            self._partial = []
+            events.extend(self._parse_line(line))
+            start = end + 1
+
+    def flush(self) -> List[Dict[str, Any]]:
+        line = "".join(self._partial)
+        self._partial = []
+        return self._parse_line(line)
+
+    @abstractmethod
+    def handle(self, event: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Interpret one decoded event; returns execute_stream() events."""
+
+    def _parse_line(self, line: str) -> List[Dict[str, Any]]:
+        line = line.strip()
+        if not line.startswith("{"):
+            return []
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return []
+        return self.handle(event) if isinstance(event, dict) else []
+
+
+class JSONDocumentParser(OutputParser):
+    """
+    Parser for CLIs that print a single JSON document when they finish.
+
+    Nothing can be recognized before the document is complete, so
+    streaming yields the whole answer at the end.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._parts: List[str] = []
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        self._parts.append(text)
+        return []
+
+    def flush(self) -> List[Dict[str, Any]]:
+        raw = "".join(self._parts).strip()
+        self._parts = []
+        # Skip anything printed before the document, such as warnings
+        start = raw.find("{")
+        if start < 0:
+            return []
+        try:
+            document = json.loads(raw[start:])
+        except ValueError:
+            self.error = "CLI output was not valid JSON"
+            return []
+        return self.handle(document) if isinstance(document, dict) else []
+
+    @abstractmethod
+    def handle(self, document: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Interpret the decoded document; returns execute_stream() events."""
+
+
+def flatten_content(content: Any) -> Optional[str]:
+    """Join a tool result's content (a string or a list of text blocks) into a string."""
+    if content is None or isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            block.get("text", "") if isinstance(block, dict) else str(block)
+            for block in content
+        )
+    return json.dumps(content)
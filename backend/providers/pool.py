@@ -0,0 +1,107 @@
+"""Pool of pre-spawned CLI processes waiting for a prompt on stdin."""
+
+import asyncio
+import time
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+from .base import spawn_cli, kill_process_tree
+
+
+class WorkerPool:
+    """
+    Keeps idle CLI processes started ahead of time.
+
+    Each worker is a CLI started in one-shot mode (e.g. `claude --print`)
+    that blocks reading its prompt from stdin, so the process fork and the
+    CLI's own startup happen before a request arrives. One-shot CLIs exit
+    after answering, so every worker serves exactly one request and a
+    replacement is spawned in the background. Workers that die while idle
+    or have been idle longer than max_idle are discarded.
+
+    Workers are started in the server's working directory, so only
+    requests without a working_directory can use them.
+    """
+
+    def __init__(self, command: List[str], size: int, max_idle: float):
+        """
+        Args:
+            command: argv of a CLI invocation that reads the prompt from stdin
+            size: Number of idle workers to keep ready
+            max_idle: Seconds after which an idle worker is replaced
+        """
+        self.command = command
+        self.size = size
+        self.max_idle = max_idle
+        self._idle: Deque[Tuple[float, asyncio.subprocess.Process]] = deque()
+        self._spawning = 0
+        self._closed = False
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def idle_count(self) -> int:
+        """Number of workers ready to take a prompt."""
+        return len(self._idle)
+
+    def start(self):
+        """Spawn workers up to the pool size in the background."""
+        self._closed = False
+        self._refill()
+
+    def acquire(self) -> Optional[asyncio.subprocess.Process]:
+        """
+        Take an idle worker, if one is ready.
+
+        The caller owns the returned process: it must write the prompt to
+        stdin and wait for it to exit. Returns None when no worker is
+        ready, in which case the caller should spawn a process as usual.
+        """
+        now = time.monotonic()
+        worker = None
+        while self._idle:
+            spawned_at, process = self._idle.popleft()
+            if process.returncode is None and now - spawned_at <= self.max_idle:
+                worker = process
+                break
+            self._discard(process)
+
+        if worker is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        self._refill()
+        return worker
+
+    async def close(self):
+        """Stop refilling and kill idle workers."""
+        self._closed = True
+        while self._idle:
+            _, process = self._idle.popleft()
+            self._discard(process)
+            await process.wait()
+
+    def _refill(self):
+        if self._closed:
+            return
+        for _ in range(self.size - len(self._idle) - self._spawning):
+            self._spawning += 1
+            asyncio.ensure_future(self._spawn())
+
+    async def _spawn(self):
+        try:
+            process = await spawn_cli(self.command)
+        except Exception:
+            # CLI missing or not startable; requests fall back to a cold spawn
+            return
+        finally:
+            self._spawning -= 1
+
+        if self._closed:
+            self._discard(process)
+            await process.wait()
+            return
+        self._idle.append((time.monotonic(), process))
+
+    def _discard(self, process: asyncio.subprocess.Process):
+        kill_process_tree(process)
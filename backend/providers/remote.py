@@ -0,0 +1,534 @@
+"""Providers that run prompts on remote worker agents (see backend/agent.py)."""
+
+import asyncio
+import json
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from ..config import config
+from .base import CLIProvider
+from .output import JSON, TEXT
+
+
+PROTOCOL_VERSION = 1
+
+# Port agents listen on by default
+DEFAULT_PORT = 7100
+
+# Longest line either side reads; a result carries up to OUTPUT_INLINE_BYTES of output
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+
+# Replies that end a call
+FINAL_OPS = ("result", "refused", "error", "lost", "pong")
+
+
+def encode(message: Dict[str, Any]) -> bytes:
+    """One protocol message: a JSON object on its own line."""
+    return json.dumps(message, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def parse_address(value: str) -> Tuple[str, int]:
+    """
+    Parse a worker address.
+
+    Args:
+        value: "host:port", or "host" for DEFAULT_PORT
+
+    Returns:
+        (host, port)
+
+    Raises:
+        ValueError: if the port isn't a number
+    """
+    host, _, port = value.strip().rpartition(":")
+    if not host:
+        return value.strip(), DEFAULT_PORT
+    return host.strip("[]"), int(port)
+
+
+class _Call:
+    """One request in flight on a worker connection; replies arrive on its queue."""
+
+    def __init__(self, worker: "RemoteWorker", call_id: int, queue: asyncio.Queue):
+        self.worker = worker
+        self.call_id = call_id
+        self.queue = queue
+        self.finished = False
+
+    async def receive(self) -> Dict[str, Any]:
+        """Wait for the next reply."""
+        message = await self.queue.get()
+        event = message.get("event") or {}
+        if message["op"] in FINAL_OPS or event.get("type") == "done":
+            self.finished = True
+            self.worker._calls.pop(self.call_id, None)
+        return message
+
+    def close(self):
+        """Stop listening for replies; an unfinished run is cancelled on the agent."""
+        if self.finished:
+            return
+        self.finished = True
+        self.worker._calls.pop(self.call_id, None)
+        if self.worker._writer is not None:
+            self.worker._writer.write(encode({"op": "cancel", "id": self.call_id}))
+
+
+class RemoteWorker:
+    """
+    Persistent connection to one worker agent.
+
+    Calls are multiplexed over the one connection by id, so it carries any
+    number of concurrent runs. Health checks (ping) refresh the agent's
+    per-provider availability and load; a failed check or a dropped
+    connection marks the worker disconnected until it reconnects.
+    """
+
+    def __init__(self, address: str, token: str):
+        """
+        Args:
+            address: "host:port" of the agent
+            token: REMOTE_TOKEN the agent expects
+        """
+        self.address = address
+        self.host, self.port = parse_address(address)
+        self.token = token
+        self.name: Optional[str] = None  # As the agent calls itself
+        self.draining = False  # Set through /api/remote; no new runs are sent
+        self.remote_draining = False  # The agent is shutting down
+        self.providers: Dict[str, Dict[str, Any]] = {}  # Last reported status and load
+        self.in_flight: Dict[str, int] = {}  # Runs this process has sent, per provider
+        self.runs = 0  # Runs the agent has taken from this process
+        self.error: Optional[str] = None
+        self.last_seen: Optional[float] = None  # Unix time of the last hello or pong
+        self._external: Dict[str, int] = {}  # Runs from other coordinators at the last ping
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._read_task: Optional[asyncio.Task] = None
+        self._calls: Dict[int, asyncio.Queue] = {}
+        self._next_id = 0
+        self._write_lock = asyncio.Lock()
+
+    @property
+    def connected(self) -> bool:
+        """Whether the connection is up."""
+        return self._writer is not None
+
+    def accepts(self, provider: str) -> bool:
+        """Whether new runs for a provider may be sent here."""
+        status = self.providers.get(provider)
+        return (
+            self.connected
+            and not self.draining
+            and not self.remote_draining
+            and status is not None
+            and status["available"]
+        )
+
+    def load(self, provider: str) -> float:
+        """Runs in flight or queued on the agent for a provider, per slot it has."""
+        status = self.providers.get(provider) or {}
+        busy = self.in_flight.get(provider, 0) + self._external.get(provider, 0)
+        return busy / max(status.get("limit", 1), 1)
+
+    async def connect(self, timeout: float):
+        """
+        Open the connection and exchange hellos.
+
+        Raises:
+            OSError, asyncio.TimeoutError: if the agent can't be reached
+            ConnectionError: if the agent refuses the connection
+        """
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, limit=MAX_MESSAGE_BYTES), timeout
+        )
+        try:
+            writer.write(encode({"op": "hello", "version": PROTOCOL_VERSION, "token": self.token}))
+            await writer.drain()
+            line = await asyncio.wait_for(reader.readline(), timeout)
+            reply = json.loads(line) if line else {"op": "error", "error": "connection closed"}
+            if reply.get("op") != "hello":
+                raise ConnectionError(reply.get("error") or "unexpected reply to hello")
+        except BaseException:
+            writer.close()
+            raise
+        self.name = reply.get("name")
+        self._reader, self._writer = reader, writer
+        self._update(reply)
+        self.error = None
+        self._read_task = asyncio.ensure_future(self._read_loop(reader))
+
+    async def ping(self, timeout: float):
+        """
+        Health check: refresh provider status and load from the agent.
+
+        Raises:
+            asyncio.TimeoutError: if the agent doesn't answer in time
+            ConnectionError: if the connection is down
+        """
+        call = await self.open({"op": "ping"})
+        try:
+            reply = await asyncio.wait_for(call.receive(), timeout)
+        finally:
+            call.close()
+        if reply["op"] != "pong":
+            raise ConnectionError(reply.get("error") or "ping failed")
+        self._update(reply)
+
+    async def open(self, message: Dict[str, Any]) -> _Call:
+        """
+        Send a request.
+
+        Raises:
+            ConnectionError: if the connection is down
+        """
+        if self._writer is None:
+            raise ConnectionError(self.error or "not connected")
+        self._next_id += 1
+        call_id = self._next_id
+        queue: asyncio.Queue = asyncio.Queue()
+        self._calls[call_id] = queue
+        call = _Call(self, call_id, queue)
+        writer = self._writer
+        try:
+            async with self._write_lock:
+                if writer.is_closing():
+                    raise ConnectionError(self.error or "connection closed")
+                writer.write(encode({**message, "id": call_id}))
+                await writer.drain()
+        except OSError as e:
+            call.close()
+            raise ConnectionError(str(e) or "connection closed")
+        return call
+
+    def disconnect(self, error: str):
+        """Drop the connection; calls still running end with a "lost" reply."""
+        self.error = error
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+        if self._read_task is not None and self._read_task is not asyncio.current_task():
+            self._read_task.cancel()
+        self._read_task = None
+        calls, self._calls = self._calls, {}
+        for queue in calls.values():
+            queue.put_nowait({"op": "lost", "error": f"Lost connection to worker {self.address}: {error}"})
+
+    async def _read_loop(self, reader: asyncio.StreamReader):
+        """Route replies to their calls until the connection closes."""
+        error = "connection closed"
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if message.get("op") == "draining":
+                    self.remote_draining = True
+                    continue
+                queue = self._calls.get(message.get("id"))
+                if queue is not None:
+                    queue.put_nowait(message)
+        except (OSError, ValueError) as e:
+            error = str(e) or type(e).__name__
+        if self._reader is reader:
+            self.disconnect(error)
+
+    def _update(self, reply: Dict[str, Any]):
+        """Take status and load from a hello or pong."""
+        self.providers = reply.get("providers", {})
+        self.remote_draining = reply.get("draining", False)
+        self.last_seen = time.time()
+        # What the agent is busy with beyond this process's own runs
+        self._external = {
+            name: max(0, status.get("busy", 0) - self.in_flight.get(name, 0))
+            for name, status in self.providers.items()
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot for the API."""
+        return {
+            "address": self.address,
+            "name": self.name,
+            "connected": self.connected,
+            "draining": self.draining,
+            "remote_draining": self.remote_draining,
+            "in_flight": sum(self.in_flight.values()),
+            "runs": self.runs,
+            "providers": {
+                name: {**status, "load": self.load(name)} for name, status in self.providers.items()
+            },
+            "error": self.error,
+            "last_seen": self.last_seen,
+        }
+
+
+class RemoteCluster:
+    """
+    The worker agents a coordinator dispatches to.
+
+    Every REMOTE_HEALTH_INTERVAL seconds each connected worker is pinged
+    and each disconnected one reconnected. Runs go to the least-loaded
+    worker that has the provider available and isn't draining.
+    """
+
+    def __init__(self, addresses: List[str], token: str, health_interval: float, timeout: float):
+        """
+        Args:
+            addresses: "host:port" of each agent
+            token: Shared secret sent in the hello
+            health_interval: Seconds between health checks
+            timeout: Seconds to wait for a connection or a ping reply
+        """
+        self.workers: Dict[str, RemoteWorker] = {
+            address: RemoteWorker(address, token) for address in addresses
+        }
+        self.health_interval = health_interval
+        self.timeout = timeout
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Connect to every worker, then keep checking them in the background."""
+        await self.check()
+        self._task = asyncio.ensure_future(self._check_periodically())
+
+    async def close(self):
+        """Stop health checks and close every connection."""
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for worker in self.workers.values():
+            worker.disconnect("coordinator shut down")
+
+    async def check(self):
+        """Ping connected workers and reconnect the others, all at once."""
+        await asyncio.gather(*(self._check_worker(worker) for worker in self.workers.values()))
+
+    async def _check_worker(self, worker: RemoteWorker):
+        try:
+            if worker.connected:
+                await worker.ping(self.timeout)
+            else:
+                await worker.connect(self.timeout)
+        except (OSError, ValueError, ConnectionError, asyncio.TimeoutError) as e:
+            worker.disconnect(str(e) or type(e).__name__)
+
+    async def _check_periodically(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self.check()
+
+    def pick(self, provider: str, exclude: Set[str]) -> Optional[RemoteWorker]:
+        """The least-loaded worker accepting runs for a provider (ties: fewest runs so far), or None."""
+        candidates = [
+            worker for address, worker in self.workers.items()
+            if address not in exclude and worker.accepts(provider)
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda worker: (worker.load(provider), worker.runs))
+
+    def availability(self, provider: str) -> Dict[str, Any]:
+        """check_availability() result: available if any connected worker can run the provider."""
+        errors = []
+        for worker in self.workers.values():
+            if not worker.connected:
+                errors.append(f"{worker.address}: {worker.error or 'not connected'}")
+                continue
+            status = worker.providers.get(provider)
+            if status is not None and status["available"]:
+                return {"available": True, "version": status.get("version"), "error": None}
+            errors.append(f"{worker.address}: {(status or {}).get('error') or 'not available'}")
+        return {"available": False, "version": None, "error": "; ".join(errors) or "no remote workers"}
+
+    def get(self, address: str) -> Optional[RemoteWorker]:
+        """Get a worker by address."""
+        return self.workers.get(address)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Snapshot of every worker."""
+        return [worker.stats() for worker in self.workers.values()]
+
+
+class RemoteProvider(CLIProvider):
+    """
+    Runs a provider's prompts on worker agents instead of locally.
+
+    Registered under the local provider's name, so requests, routing,
+    scheduling and caching are unchanged. A worker that refuses a run
+    (draining, or its queue is full) is skipped for the next least-loaded
+    one. A run whose connection drops fails rather than being repeated,
+    since the CLI may already have acted on the prompt.
+
+    working_directory is a path on the worker. Sessions replay a
+    transcript, since a CLI-kept conversation lives on one node.
+    """
+
+    def __init__(self, local: CLIProvider, cluster: RemoteCluster):
+        """
+        Args:
+            local: The provider this one stands in for (name and display name)
+            cluster: Workers to dispatch to
+        """
+        self.local = local
+        self.cluster = cluster
+
+    @property
+    def name(self) -> str:
+        """Provider name, same as the local provider's."""
+        return self.local.name
+
+    @property
+    def display_name(self) -> str:
+        """Display name for UI."""
+        return self.local.display_name
+
+    @property
+    def pool_command(self) -> Optional[List[str]]:
+        """No local worker pool; agents keep their own."""
+        return None
+
+    async def execute(
+        self,
+        prompt: str,
+        working_directory: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Run the prompt on the least-loaded worker."""
+        return await self._execute(TEXT, prompt, working_directory)
+
+    async def execute_json(
+        self,
+        prompt: str,
+        working_directory: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Run the prompt in JSON output mode on the least-loaded worker."""
+        return await self._execute(JSON, prompt, working_directory)
+
+    async def execute_stream(
+        self,
+        prompt: str,
+        working_directory: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Relay the worker's execute_stream() events."""
+        async for event in self._stream(TEXT, prompt, working_directory):
+            yield event
+
+    async def execute_json_stream(
+        self,
+        prompt: str,
+        working_directory: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Relay the worker's execute_json_stream() events."""
+        async for event in self._stream(JSON, prompt, working_directory):
+            yield event
+
+    async def check_availability(self) -> Dict[str, Any]:
+        """Available while at least one connected worker reports the provider available."""
+        return self.cluster.availability(self.name)
+
+    async def _execute(self, mode: str, prompt: str, working_directory: Optional[str]) -> Dict[str, Any]:
+        start_time = time.time()
+        started = await self._start(self._run_message(mode, False, prompt, working_directory))
+        if started is None:
+            return self._failure(self._no_worker_error(), start_time)
+        worker, call, reply = started
+        try:
+            if reply["op"] == "result":
+                return reply["result"]
+            return self._failure(reply["error"], start_time)
+        finally:
+            self._finish(worker, call)
+
+    async def _stream(self, mode: str, prompt: str, working_directory: Optional[str]) -> AsyncIterator[Dict[str, Any]]:
+        start_time = time.time()
+        started = await self._start(self._run_message(mode, True, prompt, working_directory))
+        if started is None:
+            yield {"type": "done", **self._failure(self._no_worker_error(), start_time)}
+            return
+        worker, call, reply = started
+        try:
+            while True:
+                if reply["op"] != "event":
+                    yield {"type": "done", **self._failure(reply["error"], start_time)}
+                    return
+                yield reply["event"]
+                if call.finished:
+                    return
+                reply = await call.receive()
+        finally:
+            self._finish(worker, call)
+
+    def _run_message(self, mode: str, stream: bool, prompt: str, working_directory: Optional[str]) -> Dict[str, Any]:
+        return {
+            "op": "run",
+            "provider": self.name,
+            "mode": mode,
+            "stream": stream,
+            "prompt": prompt,
+            "working_directory": working_directory,
+        }
+
+    async def _start(self, message: Dict[str, Any]) -> Optional[Tuple[RemoteWorker, _Call, Dict[str, Any]]]:
+        """
+        Send a run to the least-loaded worker, moving on to the next while workers refuse it.
+
+        Returns:
+            (worker, call, first reply) from the worker that took the run,
+            to be passed to _finish(); None if no worker did
+        """
+        tried: Set[str] = set()
+        while True:
+            worker = self.cluster.pick(self.name, tried)
+            if worker is None:
+                return None
+            tried.add(worker.address)
+            worker.in_flight[self.name] = worker.in_flight.get(self.name, 0) + 1
+            call = None
+            accepted = False
+            try:
+                call = await worker.open(message)
+                reply = await call.receive()
+                if reply["op"] != "refused":
+                    accepted = True
+                    worker.runs += 1
+                    return worker, call, reply
+            except ConnectionError:
+                pass
+            finally:
+                if not accepted:
+                    self._finish(worker, call)
+
+    def _finish(self, worker: RemoteWorker, call: Optional[_Call]):
+        """Release a run taken by _start(), cancelling it on the agent if it's still going."""
+        if call is not None:
+            call.close()
+        worker.in_flight[self.name] -= 1
+
+    def _no_worker_error(self) -> str:
+        return f"No remote worker available to run {self.display_name}"
+
+    @staticmethod
+    def _failure(error: str, start_time: float) -> Dict[str, Any]:
+        return {
+            "success": False,
+            "response": "",
+            "error": error,
+            "execution_time": time.time() - start_time
+        }
+
+
+def create_cluster() -> Optional[RemoteCluster]:
+    """
+    Cluster of REMOTE_WORKERS.
+
+    Returns:
+        A RemoteCluster, or None when REMOTE_WORKERS is empty
+    """
+    addresses = [address.strip() for address in config.REMOTE_WORKERS.split(",") if address.strip()]
+    if not addresses:
+        return None
+    return RemoteCluster(addresses, config.REMOTE_TOKEN, config.REMOTE_HEALTH_INTERVAL, config.REMOTE_TIMEOUT)
+
+
+# Global remote cluster instance (None without REMOTE_WORKERS)
+remote_cluster = create_cluster()
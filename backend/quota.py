@@ -0,0 +1,370 @@
+"""API keys, token-bucket rate limits and usage accounting."""
+
+import asyncio
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from .config import config
+from .scheduler import SchedulerError
+
+
+# Client name used when API keys are disabled
+ANONYMOUS = "anonymous"
+
+# Name of the client making the current request, set by APIKeyMiddleware
+current_client: ContextVar[str] = ContextVar("current_client", default=ANONYMOUS)
+
+
+class RateLimitError(SchedulerError):
+    """Raised when a client or provider has used up its rate limit."""
+
+
+def parse_api_keys(value: str) -> Dict[str, Tuple[str, Optional[float]]]:
+    """
+    Parse API_KEYS.
+
+    Args:
+        value: Comma-separated "name:key" or "name:key:requests_per_minute" entries
+
+    Returns:
+        Mapping of key to (client name, rate limit override or None)
+
+    Raises:
+        ValueError: if an entry is malformed
+    """
+    keys = {}
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        parts = entry.split(":")
+        if len(parts) not in (2, 3) or not parts[0] or not parts[1]:
+            raise ValueError(f"Invalid API_KEYS entry '{entry}'; expected name:key[:requests_per_minute]")
+        keys[parts[1]] = (parts[0], float(parts[2]) if len(parts) == 3 else None)
+    return keys
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to burst tokens, refilled at rate per minute.
+
+    Each request takes one token. Tokens are refilled lazily when taken,
+    so a check is a few arithmetic operations with no timers or locks.
+    """
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate / 60
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """
+        Take a token if one is available.
+
+        Returns:
+            0 if a token was taken, otherwise seconds until one will be
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """
+    Token buckets per client (API key) and per provider.
+
+    A rate of 0 disables the corresponding limit. Buckets live in this
+    process, so with several workers each worker enforces the limits on
+    its own share of the traffic.
+    """
+
+    def __init__(self, client_rates: Dict[str, Optional[float]]):
+        self._client_rates = client_rates
+        self._clients: Dict[str, Optional[TokenBucket]] = {}
+        self._providers: Dict[str, Optional[TokenBucket]] = {}
+
+    def check_client(self, client: str):
+        """
+        Take a token from the client's bucket.
+
+        Raises:
+            RateLimitError: if the client is over its limit
+        """
+        bucket = self._clients.get(client)
+        if bucket is None and client not in self._clients:
+            rate = self._client_rates.get(client)
+            if rate is None:
+                rate = config.API_KEY_RATE_LIMIT
+            bucket = TokenBucket(rate, config.API_KEY_RATE_BURST) if rate > 0 else None
+            self._clients[client] = bucket
+        if bucket is not None:
+            wait = bucket.take()
+            if wait:
+                raise RateLimitError(
+                    f"Rate limit exceeded for '{client}'; try again in {wait:.1f}s",
+                    math.ceil(wait)
+                )
+
+    def check_provider(self, provider: str):
+        """
+        Take a token from the provider's bucket before running its CLI.
+
+        Raises:
+            RateLimitError: if the provider is over its limit
+        """
+        bucket = self._providers.get(provider)
+        if bucket is None and provider not in self._providers:
+            rate = config.for_provider(provider, "RATE_LIMIT", config.RATE_LIMIT)
+            burst = config.for_provider(provider, "RATE_LIMIT_BURST", config.RATE_LIMIT_BURST)
+            bucket = TokenBucket(rate, burst) if rate > 0 else None
+            self._providers[provider] = bucket
+        if bucket is not None:
+            wait = bucket.take()
+            if wait:
+                raise RateLimitError(
+                    f"Rate limit exceeded for provider '{provider}'; try again in {wait:.1f}s",
+                    math.ceil(wait)
+                )
+
+
+class APIKeyMiddleware:
+    """
+    ASGI middleware requiring an API key on /api/ and /ask requests and /ws connections.
+
+    The key is read from "Authorization: Bearer <key>" or "X-API-Key", or
+    for /ws from the api_key query parameter, since browsers can't set
+    headers on WebSocket requests. The client name it maps to is stored
+    in current_client for the rest of the request or connection. With no
+    keys configured every request is let through as ANONYMOUS.
+    """
+
+    def __init__(self, app, keys: Dict[str, Tuple[str, Optional[float]]]):
+        self.app = app
+        self.keys = keys
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket") or not self.keys or not self._protected(scope):
+            await self.app(scope, receive, send)
+            return
+
+        entry = self.keys.get(self._presented_key(scope))
+        if entry is None and scope["type"] == "websocket":
+            # Closing before accepting rejects the handshake with a 403
+            await receive()
+            await send({"type": "websocket.close", "code": 1008})
+            return
+        if entry is None:
+            body = json.dumps({"detail": "Missing or invalid API key"}).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": 401,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("ascii")),
+                    (b"www-authenticate", b"Bearer"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        token = current_client.set(entry[0])
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_client.reset(token)
+
+    @staticmethod
+    def _protected(scope) -> bool:
+        if scope["type"] == "websocket":
+            return scope["path"] == "/ws"
+        # CORS preflight requests carry no credentials
+        if scope["method"] == "OPTIONS":
+            return False
+        path = scope["path"]
+        return path.startswith("/api/") or path == "/ask"
+
+    @staticmethod
+    def _presented_key(scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                scheme, _, credentials = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer":
+                    return credentials.strip()
+            elif name == b"x-api-key":
+                return value.decode("latin-1").strip()
+        if scope["type"] == "websocket":
+            keys = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("api_key")
+            if keys:
+                return keys[0]
+        return None
+
+
+class UsageStore:
+    """SQLite-backed usage totals per day, client and provider."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS usage (
+                day TEXT NOT NULL,
+                client TEXT NOT NULL,
+                provider TEXT NOT NULL,
+                requests INTEGER NOT NULL DEFAULT 0,
+                prompt_bytes INTEGER NOT NULL DEFAULT 0,
+                response_bytes INTEGER NOT NULL DEFAULT 0,
+                cli_seconds REAL NOT NULL DEFAULT 0,
+                PRIMARY KEY (day, client, provider)
+            )
+            """
+        )
+
+    def add(self, rows: Dict[Tuple[str, str, str], List[float]]):
+        """Add counters, keyed by (day, client, provider), to the stored totals."""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO usage (day, client, provider, requests, prompt_bytes, response_bytes, cli_seconds) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (day, client, provider) DO UPDATE SET "
+                    "requests = requests + excluded.requests, "
+                    "prompt_bytes = prompt_bytes + excluded.prompt_bytes, "
+                    "response_bytes = response_bytes + excluded.response_bytes, "
+                    "cli_seconds = cli_seconds + excluded.cli_seconds",
+                    [(*key, *counters) for key, counters in rows.items()]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def query(self, since: Optional[str] = None, client: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get stored totals per day, client and provider.
+
+        Args:
+            since: Only include days on or after this date (YYYY-MM-DD)
+            client: Only include this client
+        """
+        sql = "SELECT * FROM usage WHERE day >= ?"
+        params: List[Any] = [since or ""]
+        if client is not None:
+            sql += " AND client = ?"
+            params.append(client)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [dict(row) for row in rows]
+
+
+class UsageTracker:
+    """
+    Counts requests, prompt and response bytes and CLI seconds.
+
+    Recording only updates an in-memory counter; the counters are added
+    to the UsageStore every USAGE_FLUSH_INTERVAL seconds and on shutdown.
+    """
+
+    FIELDS = ("requests", "prompt_bytes", "response_bytes", "cli_seconds")
+
+    def __init__(self, store: UsageStore):
+        self.store = store
+        self._pending: Dict[Tuple[str, str, str], List[float]] = {}
+
+    def record(self, client: str, provider: str, prompt_bytes: int, response_bytes: int, cli_seconds: float):
+        """
+        Count one answered request.
+
+        Args:
+            client: Client name
+            provider: Provider that answered
+            prompt_bytes: Size of the prompt in UTF-8 bytes
+            response_bytes: Size of the response in UTF-8 bytes
+            cli_seconds: Seconds the CLI ran; 0 for cache hits
+        """
+        key = (time.strftime("%Y-%m-%d", time.gmtime()), client, provider)
+        counters = self._pending.get(key)
+        if counters is None:
+            counters = self._pending[key] = [0, 0, 0, 0.0]
+        counters[0] += 1
+        counters[1] += prompt_bytes
+        counters[2] += response_bytes
+        counters[3] += cli_seconds
+
+    def flush(self):
+        """Write pending counters to the store."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        self.store.add(pending)
+
+    async def flush_periodically(self, interval: float):
+        """
+        Flush forever, every interval seconds.
+
+        Meant to run as a background task for the lifetime of the app.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            self.flush()
+
+    def totals(self, since: Optional[str] = None, client: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Usage per client and provider, including counters not yet flushed.
+
+        Args:
+            since: Only include days on or after this date (YYYY-MM-DD)
+            client: Only include this client
+
+        Returns:
+            One dict per (client, provider) with the FIELDS summed over days
+        """
+        totals: Dict[Tuple[str, str], Dict[str, Any]] = {}
+
+        def add(row_client: str, provider: str, counters):
+            if client is not None and row_client != client:
+                return
+            entry = totals.setdefault(
+                (row_client, provider),
+                {"client": row_client, "provider": provider, **{field: 0 for field in self.FIELDS}}
+            )
+            for field, value in zip(self.FIELDS, counters):
+                entry[field] += value
+
+        for row in self.store.query(since, client):
+            add(row["client"], row["provider"], [row[field] for field in self.FIELDS])
+        for (day, row_client, provider), counters in self._pending.items():
+            if since is None or day >= since:
+                add(row_client, provider, counters)
+        return sorted(totals.values(), key=lambda entry: (entry["client"], entry["provider"]))
+
+
+# Configured API keys, the names of clients allowed to see everyone's usage
+# and of those whose requests default to batch priority
+api_keys = parse_api_keys(config.API_KEYS)
+usage_admins = {name.strip() for name in config.API_ADMINS.split(",") if name.strip()}
+batch_clients = {name.strip() for name in config.API_BATCH_KEYS.split(",") if name.strip()}
+
+# Global rate limiter instance
+rate_limiter = RateLimiter({name: rate for name, rate in api_keys.values()})
+
+# Global usage tracker instance
+usage_tracker = UsageTracker(UsageStore(config.USAGE_DB_PATH))
@@ -0,0 +1,196 @@
+"""Routing across providers: ordered fallback and hedged requests."""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .config import config
+from .providers import registry
+from .scheduler import SchedulerError
+
+
+class ProviderHealth:
+    """Recent latency and error rate of one provider, as moving averages."""
+
+    def __init__(self):
+        self.avg_latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.samples = 0
+        self.last_failure: Optional[float] = None
+
+    def record(self, success: bool, latency: float):
+        """Fold one execution into the averages."""
+        alpha = config.ROUTING_EWMA_ALPHA
+        self.samples += 1
+        # Failures often return early, so only successes say how fast a provider is
+        if success:
+            if self.avg_latency is None:
+                self.avg_latency = latency
+            else:
+                self.avg_latency = (1 - alpha) * self.avg_latency + alpha * latency
+        self.error_rate = (1 - alpha) * self.error_rate + alpha * (0.0 if success else 1.0)
+        if not success:
+            self.last_failure = time.time()
+
+    @property
+    def healthy(self) -> bool:
+        """
+        False while the error rate is above ROUTING_ERROR_THRESHOLD.
+
+        A provider becomes healthy again once it has gone
+        ROUTING_RECOVERY_TIME seconds without a failure, so it is retried
+        even when routing has been steering traffic away from it.
+        """
+        if self.error_rate < config.ROUTING_ERROR_THRESHOLD or self.last_failure is None:
+            return True
+        return time.time() - self.last_failure > config.ROUTING_RECOVERY_TIME
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot for the API."""
+        return {
+            "avg_latency": self.avg_latency,
+            "error_rate": self.error_rate,
+            "samples": self.samples,
+            "healthy": self.healthy,
+        }
+
+
+class Router:
+    """
+    Runs a prompt against an ordered list of providers.
+
+    Unhealthy providers (high recent error rate, last seen unavailable, or
+    an open circuit breaker) are moved behind healthy ones; otherwise the requested order is kept.
+    A failed attempt falls through to the next provider. With a hedge
+    delay, a primary that hasn't answered in time is raced against the
+    fastest remaining healthy provider and the loser is cancelled.
+    """
+
+    def __init__(self):
+        """Initialize with no history; providers are tracked on first use."""
+        self._health: Dict[str, ProviderHealth] = {}
+
+    def health(self, name: str) -> ProviderHealth:
+        """Get (or create) the health record for a provider."""
+        if name not in self._health:
+            self._health[name] = ProviderHealth()
+        return self._health[name]
+
+    def record(self, name: str, success: bool, latency: float):
+        """Record the outcome of an execution on a provider."""
+        self.health(name).record(success, latency)
+
+    def usable(self, name: str) -> bool:
+        """Whether a provider is healthy, was not unavailable at its last check and its circuit breaker admits calls."""
+        status = registry.cached_status(name)
+        if status is not None and not status["available"]:
+            return False
+        breaker = registry.get(name).breaker
+        if breaker is not None and not breaker.accepting:
+            return False
+        return self.health(name).healthy
+
+    def order(self, candidates: List[str]) -> List[str]:
+        """Usable candidates in the requested order, then the rest in the requested order."""
+        usable = [name for name in candidates if self.usable(name)]
+        return usable + [name for name in candidates if name not in usable]
+
+    async def run(
+        self,
+        candidates: List[str],
+        attempt: Callable[[str], Awaitable[Dict[str, Any]]],
+        hedge_delay: Optional[float] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """
+        Try candidates until one succeeds.
+
+        Args:
+            candidates: Provider names, most preferred first
+            attempt: Runs the prompt on one provider and returns an execute() result
+            hedge_delay: Seconds to wait for the first provider before also
+                starting the next one; None disables hedging
+
+        Returns:
+            (provider name, result) of the first success, or of the last
+            failure with every attempt's error joined
+
+        Raises:
+            SchedulerError: if every attempt was refused by the scheduler
+        """
+        remaining = self.order(candidates)
+        running: Dict[asyncio.Task, str] = {}
+        failures: List[Tuple[str, Dict[str, Any]]] = []
+        refusals: List[SchedulerError] = []
+        hedged = False
+
+        def start(name: str):
+            remaining.remove(name)
+            running[asyncio.ensure_future(attempt(name))] = name
+
+        try:
+            start(remaining[0])
+            while running:
+                timeout = None
+                if hedge_delay is not None and not hedged and remaining:
+                    timeout = hedge_delay
+                done, _ = await asyncio.wait(
+                    running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # The first provider is slow; race it against another
+                    hedged = True
+                    start(self._hedge_target(remaining))
+                    continue
+
+                for task in done:
+                    name = running.pop(task)
+                    try:
+                        result = task.result()
+                    except SchedulerError as e:
+                        refusals.append(e)
+                        failures.append((name, {
+                            "success": False,
+                            "response": "",
+                            "error": str(e),
+                            "execution_time": 0.0
+                        }))
+                        continue
+                    if result["success"]:
+                        return name, result
+                    failures.append((name, result))
+
+                if not running and remaining:
+                    start(remaining[0])
+        finally:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+        if len(refusals) == len(failures):
+            raise refusals[-1]
+        name, result = failures[-1]
+        if len(failures) > 1:
+            result = {
+                **result,
+                "error": "; ".join(f"{n}: {r['error']}" for n, r in failures)
+            }
+        return name, result
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Health snapshot for every provider seen so far."""
+        return {name: health.stats() for name, health in self._health.items()}
+
+    def _hedge_target(self, remaining: List[str]) -> str:
+        """The usable remaining provider with the lowest recent latency."""
+        usable = [name for name in remaining if self.usable(name)]
+        if not usable:
+            return remaining[0]
+        # Providers with no latency history sort last, in the requested order
+        return min(usable, key=lambda name: (
+            self.health(name).avg_latency is None,
+            self.health(name).avg_latency or 0.0
+        ))
+
+
+# Global router instance
+router = Router()
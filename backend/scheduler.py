@@ -0,0 +1,474 @@
+"""Per-provider concurrency scheduling with bounded, prioritized wait queues."""
+
+import asyncio
+import math
+import re
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Any, AsyncIterator, List, Optional, Tuple
+
+from .adaptive import AIMDLimit, is_rate_limited
+from .config import config
+from .metrics import CONCURRENCY_LIMIT, QUEUE_WAIT
+from .shared import SharedState, release_in_background, shared_state
+
+
+# Seconds between attempts to take a slot shared with other workers
+SHARED_SLOT_POLL_INTERVAL = 0.05
+
+# Priority classes, highest first
+INTERACTIVE = "interactive"
+BATCH = "batch"
+PRIORITIES = (INTERACTIVE, BATCH)
+
+# Tenant of requests made without an API key (same as quota.ANONYMOUS)
+DEFAULT_TENANT = "anonymous"
+
+
+def parse_weights(value: str) -> Dict[str, float]:
+    """
+    Parse API_KEY_WEIGHTS.
+
+    Args:
+        value: Comma-separated "name:weight" entries
+
+    Returns:
+        Mapping of client name to weight
+
+    Raises:
+        ValueError: if an entry is malformed or a weight isn't positive
+    """
+    weights = {}
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, weight = entry.rpartition(":")
+        if not name or float(weight) <= 0:
+            raise ValueError(f"Invalid API_KEY_WEIGHTS entry '{entry}'; expected name:weight")
+        weights[name] = float(weight)
+    return weights
+
+
+class SchedulerError(Exception):
+    """Base error for requests the scheduler refuses to run."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueFullError(SchedulerError):
+    """Raised when a provider's wait queue is already at capacity."""
+
+
+class QueueTimeoutError(SchedulerError):
+    """Raised when a request waits in the queue longer than allowed."""
+
+
+class _Waiter:
+    """A request waiting in a ProviderQueue."""
+
+    __slots__ = ("future", "priority", "tenant", "enqueued_at", "tag")
+
+    def __init__(self, future: asyncio.Future, priority: str, tenant: str, tag: float):
+        self.future = future
+        self.priority = priority
+        self.tenant = tenant
+        self.enqueued_at = time.monotonic()
+        self.tag = tag  # Virtual finish time for weighted fair queuing
+
+
+class ProviderQueue:
+    """
+    Concurrency limiter for a single provider.
+
+    Up to limit requests run at once; up to max_queue_size more wait. The
+    limit is max_concurrency, or follows an AIMDLimit fed by
+    record_result() when adaptive concurrency is on. A released slot is handed directly to the next waiter so
+    newcomers cannot jump the queue. The next waiter is chosen by:
+
+    1. Priority class: interactive requests go before batch requests,
+       except that a batch request waiting longer than max_batch_wait
+       goes first, so batch work is delayed but never starved.
+    2. Weighted fair queuing between tenants (API keys) of the same
+       class: each tenant gets slots in proportion to its weight, so one
+       tenant's burst can't hold up the others. A tenant's own requests
+       stay in FIFO order.
+
+    With a SharedState, a request that gets a local slot must also take
+    one of the provider's max_concurrency slots shared by all workers, so
+    the limit holds across the worker group. The wait queue, and so the
+    priority and fair queuing order, stays per worker: requests holding a
+    local slot poll for a shared one, and between workers a freed slot
+    goes to whichever polls first. The adaptive limit also stays per
+    worker and caps only that worker's local slots.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int,
+        max_queue_size: int,
+        queue_timeout: float,
+        name: str = "",
+        shared: Optional[SharedState] = None,
+        max_batch_wait: float = float("inf"),
+        weights: Optional[Dict[str, float]] = None,
+        adaptive: Optional[AIMDLimit] = None,
+        rate_limit_pattern: Optional[str] = None
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max_queue_size
+        self.queue_timeout = queue_timeout
+        self.shared = shared
+        self.max_batch_wait = max_batch_wait
+        self.weights = weights or {}
+        self.adaptive = adaptive
+        self.rate_limit_pattern = re.compile(rate_limit_pattern or config.RATE_LIMIT_ERROR_PATTERN)
+
+        self.in_flight = 0
+        # Waiters per priority class, then per tenant in FIFO order
+        self._waiters: Dict[str, Dict[str, Deque[_Waiter]]] = {priority: {} for priority in PRIORITIES}
+        self._waiter_count = 0
+        # Weighted fair queuing state per class: virtual time and each tenant's last tag
+        self._virtual_time = {priority: 0.0 for priority in PRIORITIES}
+        self._last_tag: Dict[str, Dict[str, float]] = {priority: {} for priority in PRIORITIES}
+        self._shared_slots: List[str] = []
+
+        # Counters for sizing the limits
+        self.total_started = 0
+        self.total_rejected = 0
+        self.total_timed_out = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self._avg_run_time: Optional[float] = None
+        self._priority_stats = {
+            priority: {"total_started": 0, "total_wait_time": 0.0, "max_wait_time": 0.0}
+            for priority in PRIORITIES
+        }
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of requests currently waiting for a slot."""
+        return self._waiter_count
+
+    @property
+    def limit(self) -> int:
+        """Requests allowed to run at once right now."""
+        return self.adaptive.value if self.adaptive is not None else self.max_concurrency
+
+    def retry_after(self) -> int:
+        """Estimate seconds until a slot frees up, for the Retry-After header."""
+        avg = self._avg_run_time or 1.0
+        backlog = (self.queue_depth + 1) / max(self.limit, 1)
+        return max(1, math.ceil(avg * backlog))
+
+    async def acquire(self, priority: str = INTERACTIVE, tenant: str = DEFAULT_TENANT) -> float:
+        """
+        Wait for a slot.
+
+        Args:
+            priority: Priority class, one of PRIORITIES
+            tenant: Client the request is made for, for fair queuing
+
+        Returns:
+            Time spent waiting in seconds
+
+        Raises:
+            QueueFullError: if the wait queue is full
+            QueueTimeoutError: if no slot frees up within queue_timeout
+        """
+        start = time.monotonic()
+        await self._acquire_local(priority, tenant)
+        if self.shared is not None:
+            try:
+                await self._acquire_shared(start)
+            except BaseException:
+                self._release_local()
+                raise
+
+        wait_time = time.monotonic() - start
+        self._record_start(wait_time, priority)
+        return wait_time
+
+    def release(self, run_time: Optional[float] = None):
+        """Free a slot and hand it to the next waiter, if any."""
+        if self._shared_slots:
+            # In a thread, since the write may wait for another worker's
+            release_in_background(self.shared.release_slot, self._shared_slots.pop(), "shared slot")
+        self._release_local(run_time)
+
+    async def _acquire_local(self, priority: str, tenant: str):
+        """Take one of this worker's slots, waiting for _next_waiter() to pick us if needed."""
+        if self.in_flight < self.limit and not self._waiter_count:
+            self.in_flight += 1
+            return
+
+        if self._waiter_count >= self.max_queue_size:
+            self.total_rejected += 1
+            raise QueueFullError(
+                f"Queue is full ({self.max_queue_size} waiting)",
+                self.retry_after()
+            )
+
+        waiter = self._enqueue(priority, tenant)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            raise self._timeout_error()
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    async def _acquire_shared(self, start: float):
+        """Take a slot shared with other workers, polling until queue_timeout."""
+        deadline = start + self.queue_timeout
+        while True:
+            attempt = asyncio.ensure_future(asyncio.to_thread(
+                self.shared.try_acquire_slot, self.name, self.max_concurrency
+            ))
+            try:
+                slot_id = await asyncio.shield(attempt)
+            except asyncio.CancelledError:
+                # The thread may still take a slot; give it back once it has
+                attempt.add_done_callback(self._release_abandoned_slot)
+                raise
+            if slot_id is not None:
+                self._shared_slots.append(slot_id)
+                return
+            if time.monotonic() >= deadline:
+                raise self._timeout_error()
+            await asyncio.sleep(SHARED_SLOT_POLL_INTERVAL)
+
+    def _release_abandoned_slot(self, attempt: "asyncio.Future[Optional[str]]"):
+        if attempt.cancelled() or attempt.exception() is not None or attempt.result() is None:
+            return
+        release_in_background(self.shared.release_slot, attempt.result(), "shared slot")
+
+    def _release_local(self, run_time: Optional[float] = None):
+        if run_time is not None:
+            if self._avg_run_time is None:
+                self._avg_run_time = run_time
+            else:
+                self._avg_run_time = 0.8 * self._avg_run_time + 0.2 * run_time
+
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hand free slots to waiters, in _next_waiter() order."""
+        while self._waiter_count and self.in_flight < self.limit:
+            waiter = self._dequeue()
+            if not waiter.future.done():
+                # The slot is taken for the waiter right away, so newcomers can't jump the queue
+                self.in_flight += 1
+                waiter.future.set_result(None)
+
+    def record_result(self, success: bool, latency: float, error: Optional[str] = None):
+        """
+        Adjust the adaptive limit, if enabled, after a run that still holds its slot.
+
+        Args:
+            success: Whether the run succeeded
+            latency: Seconds the run took
+            error: The run's error message, checked for upstream rate limits
+        """
+        if self.adaptive is None:
+            return
+        saturated = self.in_flight >= self.limit or self._waiter_count > 0
+        rate_limited = not success and is_rate_limited(error, self.rate_limit_pattern)
+        if self.adaptive.record(success, latency, rate_limited, saturated):
+            self._dispatch()
+        CONCURRENCY_LIMIT.set(self.limit, provider=self.name)
+
+    def _enqueue(self, priority: str, tenant: str) -> _Waiter:
+        """Add a waiter, tagged with its virtual finish time."""
+        last_tags = self._last_tag[priority]
+        start = max(self._virtual_time[priority], last_tags.get(tenant, 0.0))
+        tag = start + 1 / self.weights.get(tenant, 1.0)
+        last_tags[tenant] = tag
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), priority, tenant, tag)
+        self._waiters[priority].setdefault(tenant, deque()).append(waiter)
+        self._waiter_count += 1
+        return waiter
+
+    def _dequeue(self) -> _Waiter:
+        """Remove and return the waiter that should get the next slot."""
+        priority, tenant = self._next_waiter()
+        tenants = self._waiters[priority]
+        waiter = tenants[tenant].popleft()
+        if not tenants[tenant]:
+            del tenants[tenant]
+        self._waiter_count -= 1
+        # Virtual time advances to the start tag of the request being served
+        start = waiter.tag - 1 / self.weights.get(tenant, 1.0)
+        self._virtual_time[priority] = max(self._virtual_time[priority], start)
+        return waiter
+
+    def _next_waiter(self) -> Tuple[str, str]:
+        """(priority, tenant) of the waiter to serve next; there must be one."""
+        batch = self._waiters[BATCH]
+        if batch:
+            # Batch requests that have waited too long go first, oldest first
+            tenant = min(batch, key=lambda name: batch[name][0].enqueued_at)
+            if time.monotonic() - batch[tenant][0].enqueued_at >= self.max_batch_wait:
+                return BATCH, tenant
+        for priority in PRIORITIES:
+            tenants = self._waiters[priority]
+            if tenants:
+                return priority, min(tenants, key=lambda name: tenants[name][0].tag)
+        raise LookupError("no waiters")
+
+    def _timeout_error(self) -> QueueTimeoutError:
+        self.total_timed_out += 1
+        return QueueTimeoutError(
+            f"Timed out after waiting {self.queue_timeout:.0f}s for a free slot",
+            self.retry_after()
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of queue state and counters, overall and per priority class."""
+        priorities = {}
+        for priority, counters in self._priority_stats.items():
+            started = counters["total_started"]
+            priorities[priority] = {
+                "queue_depth": sum(len(waiters) for waiters in self._waiters[priority].values()),
+                "total_started": started,
+                "avg_wait_time": counters["total_wait_time"] / started if started else 0.0,
+                "max_wait_time": counters["max_wait_time"],
+            }
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_concurrency": self.max_concurrency,
+            "concurrency_limit": self.limit,
+            "adaptive": self.adaptive.stats() if self.adaptive is not None else None,
+            "max_queue_size": self.max_queue_size,
+            "total_started": self.total_started,
+            "total_rejected": self.total_rejected,
+            "total_timed_out": self.total_timed_out,
+            "avg_wait_time": (
+                self.total_wait_time / self.total_started if self.total_started else 0.0
+            ),
+            "max_wait_time": self.max_wait_time,
+            "global_in_flight": (
+                self.shared.count_slots(self.name) if self.shared is not None else None
+            ),
+            "priorities": priorities,
+        }
+
+    def _abandon(self, waiter: _Waiter):
+        """Remove a waiter that gave up, returning its slot if one was handed over."""
+        if waiter.future.done() and not waiter.future.cancelled():
+            # A slot was handed to us just as we gave up; pass it on
+            self._release_local()
+            return
+        waiter.future.cancel()
+        tenants = self._waiters[waiter.priority]
+        queue = tenants.get(waiter.tenant)
+        if queue is None or waiter not in queue:
+            return
+        queue.remove(waiter)
+        if not queue:
+            del tenants[waiter.tenant]
+        self._waiter_count -= 1
+
+    def _record_start(self, wait_time: float, priority: str):
+        self.total_started += 1
+        self.total_wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+        counters = self._priority_stats[priority]
+        counters["total_started"] += 1
+        counters["total_wait_time"] += wait_time
+        counters["max_wait_time"] = max(counters["max_wait_time"], wait_time)
+        QUEUE_WAIT.observe(wait_time, provider=self.name, priority=priority)
+
+
+class Scheduler:
+    """Routes executions through a ProviderQueue per provider."""
+
+    def __init__(self):
+        """Initialize with no queues; they are created on first use."""
+        self._queues: Dict[str, ProviderQueue] = {}
+        self.weights = parse_weights(config.API_KEY_WEIGHTS)
+
+    def queue(self, provider_name: str) -> ProviderQueue:
+        """Get (or create) the queue for a provider using configured limits."""
+        if provider_name not in self._queues:
+            max_concurrency = config.for_provider(
+                provider_name, "MAX_CONCURRENCY", config.MAX_CONCURRENCY
+            )
+            adaptive = None
+            if config.ADAPTIVE_CONCURRENCY:
+                adaptive = AIMDLimit(
+                    initial=max_concurrency,
+                    minimum=config.for_provider(
+                        provider_name, "ADAPTIVE_MIN_CONCURRENCY", config.ADAPTIVE_MIN_CONCURRENCY
+                    ),
+                    maximum=config.for_provider(
+                        provider_name, "ADAPTIVE_MAX_CONCURRENCY", config.ADAPTIVE_MAX_CONCURRENCY
+                    ),
+                    backoff=config.for_provider(
+                        provider_name, "ADAPTIVE_BACKOFF", config.ADAPTIVE_BACKOFF
+                    ),
+                    latency_tolerance=config.for_provider(
+                        provider_name, "ADAPTIVE_LATENCY_TOLERANCE", config.ADAPTIVE_LATENCY_TOLERANCE
+                    ),
+                )
+            self._queues[provider_name] = ProviderQueue(
+                max_concurrency=max_concurrency,
+                max_queue_size=config.for_provider(
+                    provider_name, "MAX_QUEUE_SIZE", config.MAX_QUEUE_SIZE
+                ),
+                queue_timeout=config.for_provider(
+                    provider_name, "QUEUE_TIMEOUT", config.QUEUE_TIMEOUT
+                ),
+                name=provider_name,
+                shared=shared_state,
+                max_batch_wait=config.for_provider(
+                    provider_name, "PRIORITY_MAX_WAIT", config.PRIORITY_MAX_WAIT
+                ),
+                weights=self.weights,
+                adaptive=adaptive,
+                rate_limit_pattern=config.for_provider(
+                    provider_name, "RATE_LIMIT_ERROR_PATTERN", config.RATE_LIMIT_ERROR_PATTERN
+                ),
+            )
+        return self._queues[provider_name]
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        provider_name: str,
+        priority: str = INTERACTIVE,
+        tenant: str = DEFAULT_TENANT
+    ) -> AsyncIterator[float]:
+        """
+        Hold a concurrency slot for the duration of the block.
+
+        Args:
+            provider_name: Provider whose slot to take
+            priority: Priority class, one of PRIORITIES
+            tenant: Client the request is made for
+
+        Yields:
+            Time spent waiting for the slot in seconds
+        """
+        queue = self.queue(provider_name)
+        wait_time = await queue.acquire(priority, tenant)
+        start = time.monotonic()
+        try:
+            yield wait_time
+        finally:
+            queue.release(time.monotonic() - start)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Stats for every provider queue created so far."""
+        return {name: queue.stats() for name, queue in self._queues.items()}
+
+
+# Global scheduler instance
+scheduler = Scheduler()
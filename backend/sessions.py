@@ -0,0 +1,486 @@
+"""Conversation sessions, continued by the CLI itself or by replaying a transcript."""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from .config import config
+from .providers.base import CLIProvider
+from .shared import pid_alive, release_in_background
+
+
+# Session modes
+NATIVE = "native"  # The CLI keeps the conversation (e.g. claude --resume)
+TRANSCRIPT = "transcript"  # Earlier turns are replayed in the prompt
+
+# Seconds between attempts to take a session's lease from another worker
+LEASE_POLL_INTERVAL = 0.1
+
+
+class SessionConflictError(Exception):
+    """Raised when a turn can't be recorded because the session changed or stayed busy."""
+
+
+class SessionStore:
+    """SQLite-backed storage for sessions and their messages."""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                working_directory TEXT,
+                mode TEXT NOT NULL,
+                turns INTEGER NOT NULL DEFAULT 0,
+                started INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(sessions)")}
+        if "started" not in columns:
+            # Databases created before native sessions were tracked apart from turns
+            self._conn.execute("ALTER TABLE sessions ADD COLUMN started INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS messages (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            )
+            """
+        )
+        # The worker process running a session's turn, one at a time
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS session_leases (
+                session_id TEXT PRIMARY KEY,
+                token TEXT NOT NULL,
+                pid INTEGER NOT NULL,
+                acquired_at REAL NOT NULL
+            )
+            """
+        )
+
+    def create(self, provider: str, working_directory: Optional[str], mode: str) -> Dict[str, Any]:
+        """Insert a new session with no turns and return it."""
+        # A UUID, since `claude --session-id` requires one
+        session_id = str(uuid.uuid4())
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO sessions (id, provider, working_directory, mode, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (session_id, provider, working_directory, mode, now, now)
+            )
+        return self.get(session_id)
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Get a session by id, or None if it doesn't exist."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Get all sessions, most recently used first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM sessions ORDER BY updated_at DESC"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def messages(self, session_id: str) -> List[Dict[str, Any]]:
+        """Get a session's messages in order."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content, created_at FROM messages WHERE session_id = ? ORDER BY seq",
+                (session_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def add_turn(self, session_id: str, prompt: str, response: str):
+        """
+        Append a user message and the reply to it.
+
+        Raises:
+            SessionConflictError: if the session was deleted, or another
+                process kept the database busy
+        """
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError as e:
+                raise SessionConflictError(f"Session '{session_id}' is busy: {e}")
+            try:
+                if self._conn.execute(
+                    "SELECT 1 FROM sessions WHERE id = ?", (session_id,)
+                ).fetchone() is None:
+                    raise SessionConflictError(f"Session '{session_id}' was deleted during the turn")
+                seq = self._conn.execute(
+                    "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE session_id = ?",
+                    (session_id,)
+                ).fetchone()[0]
+                self._conn.executemany(
+                    "INSERT INTO messages (session_id, seq, role, content, created_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (session_id, seq, "user", prompt, now),
+                        (session_id, seq + 1, "assistant", response, now),
+                    ]
+                )
+                self._conn.execute(
+                    "UPDATE sessions SET turns = turns + 1, updated_at = ? WHERE id = ?",
+                    (now, session_id)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def set_started(self, session_id: str, started: bool):
+        """Record whether the CLI holds a native session's conversation, so it is resumed."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sessions SET started = ? WHERE id = ?", (int(started), session_id)
+            )
+
+    def try_lease(self, session_id: str) -> Optional[str]:
+        """
+        Take the lease on running a session's turn, unless another live process holds it.
+
+        A lease held by this process is taken over, since SessionLock
+        already keeps this process's turns apart.
+
+        Returns:
+            Lease token to pass to release_lease(), or None if the lease is taken
+            or the database stayed busy
+        """
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError:
+                return None
+            try:
+                row = self._conn.execute(
+                    "SELECT pid FROM session_leases WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                if row is not None and row[0] != os.getpid() and pid_alive(row[0]):
+                    self._conn.execute("COMMIT")
+                    return None
+                token = uuid.uuid4().hex
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO session_leases (session_id, token, pid, acquired_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (session_id, token, os.getpid(), time.time())
+                )
+                self._conn.execute("COMMIT")
+                return token
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def release_lease(self, token: str):
+        """Give back a lease taken by try_lease(); a lease taken over since is kept."""
+        with self._lock:
+            self._conn.execute("DELETE FROM session_leases WHERE token = ?", (token,))
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Delete a session and its messages.
+
+        Returns:
+            False if the session didn't exist
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM session_leases WHERE session_id = ?", (session_id,))
+            cursor = self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+        return cursor.rowcount == 1
+
+    def purge(self, older_than: float):
+        """Delete sessions unused for more than older_than seconds."""
+        cutoff = time.time() - older_than
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM messages WHERE session_id IN "
+                "(SELECT id FROM sessions WHERE updated_at < ?)",
+                (cutoff,)
+            )
+            self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+            self._conn.execute(
+                "DELETE FROM session_leases WHERE session_id NOT IN (SELECT id FROM sessions)"
+            )
+
+
+class SessionLock:
+    """
+    Lock held while a turn runs, so a session's turns happen one at a time.
+
+    An asyncio.Lock orders this worker's turns, and a lease in the session
+    store keeps other worker processes out; a lease held by a process that
+    died is taken over. Store calls run in a thread, since they may wait
+    for another process's write.
+    """
+
+    def __init__(self, store: SessionStore, session_id: str, on_idle: Callable[[], None]):
+        """
+        Args:
+            store: Store holding the session's lease
+            session_id: Session the lock is for
+            on_idle: Called once no turn holds or waits for the lock
+        """
+        self._store = store
+        self._session_id = session_id
+        self._on_idle = on_idle
+        self._local = asyncio.Lock()
+        self._token: Optional[str] = None
+        self.users = 0  # Turns holding or waiting for the lock
+
+    async def acquire(self):
+        """Wait until no other turn of the session runs, in this worker or another."""
+        self.users += 1
+        try:
+            await self._local.acquire()
+        except BaseException:
+            self._leave()
+            raise
+        try:
+            while True:
+                attempt = asyncio.ensure_future(asyncio.to_thread(self._store.try_lease, self._session_id))
+                try:
+                    token = await asyncio.shield(attempt)
+                except asyncio.CancelledError:
+                    # The thread may still take the lease; give it back once it has
+                    attempt.add_done_callback(self._release_abandoned_lease)
+                    raise
+                if token is not None:
+                    self._token = token
+                    return
+                await asyncio.sleep(LEASE_POLL_INTERVAL)
+        except BaseException:
+            self._local.release()
+            self._leave()
+            raise
+
+    def release(self):
+        """Let the next turn run."""
+        token, self._token = self._token, None
+        release_in_background(self._store.release_lease, token, "session lease")
+        self._local.release()
+        self._leave()
+
+    def _leave(self):
+        self.users -= 1
+        if not self.users:
+            self._on_idle()
+
+    def _release_abandoned_lease(self, attempt: "asyncio.Future[Optional[str]]"):
+        if attempt.cancelled() or attempt.exception() is not None or attempt.result() is None:
+            return
+        release_in_background(self._store.release_lease, attempt.result(), "session lease")
+
+    async def __aenter__(self) -> "SessionLock":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+
+class SessionManager:
+    """
+    Runs turns of a session on its provider.
+
+    Providers with a session_command() continue the conversation in the
+    CLI, so a turn sends only the new message. For the others, earlier
+    turns (up to SESSION_MAX_TRANSCRIPT_CHARS) are replayed in the prompt.
+    Every turn is recorded, so a session's history can be listed either way,
+    and a native session whose provider can no longer continue it (e.g.
+    one now run on remote workers) is replayed as a transcript instead.
+    """
+
+    def __init__(self, store: SessionStore):
+        self.store = store
+        self._locks: Dict[str, SessionLock] = {}
+
+    def create(self, provider: CLIProvider, working_directory: Optional[str]) -> Dict[str, Any]:
+        """Create a session on a provider, using the CLI's own sessions when it has them."""
+        native = provider.session_command(str(uuid.uuid4()), resume=False) is not None
+        return self.store.create(provider.name, working_directory, NATIVE if native else TRANSCRIPT)
+
+    def delete(self, session_id: str) -> bool:
+        """
+        Delete a session.
+
+        A CLI that kept the conversation itself keeps its own copy.
+
+        Returns:
+            False if the session didn't exist
+        """
+        return self.store.delete(session_id)
+
+    def lock(self, session_id: str) -> SessionLock:
+        """Lock held while a turn runs, so a session's turns happen one at a time."""
+        if session_id not in self._locks:
+            self._locks[session_id] = SessionLock(
+                self.store, session_id, lambda: self._drop_lock(session_id)
+            )
+        return self._locks[session_id]
+
+    def _drop_lock(self, session_id: str):
+        """Forget a session's lock once no turn uses it, so idle sessions hold no memory."""
+        lock = self._locks.get(session_id)
+        if lock is not None and not lock.users:
+            del self._locks[session_id]
+
+    def execute(
+        self,
+        provider: CLIProvider,
+        session: Dict[str, Any],
+        prompt: str
+    ) -> Awaitable[Dict[str, Any]]:
+        """Run the next turn; same result as provider.execute()."""
+        if self._native(provider, session):
+            return self._execute_native(provider, session, prompt)
+        return provider.execute(self.transcript_prompt(session, prompt), session["working_directory"])
+
+    def execute_stream(
+        self,
+        provider: CLIProvider,
+        session: Dict[str, Any],
+        prompt: str
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Run the next turn; same events as provider.execute_stream()."""
+        if self._native(provider, session):
+            return self._stream_native(provider, session, prompt)
+        return provider.execute_stream(
+            self.transcript_prompt(session, prompt), session["working_directory"]
+        )
+
+    async def _execute_native(
+        self,
+        provider: CLIProvider,
+        session: Dict[str, Any],
+        prompt: str
+    ) -> Dict[str, Any]:
+        resume = self._resume(session)
+        result = None
+        try:
+            result = await provider.execute_session(
+                prompt, session["working_directory"], session["id"], resume=resume
+            )
+            return result
+        finally:
+            self._track_start(session, resume, result)
+
+    async def _stream_native(
+        self,
+        provider: CLIProvider,
+        session: Dict[str, Any],
+        prompt: str
+    ) -> AsyncIterator[Dict[str, Any]]:
+        resume = self._resume(session)
+        done = None
+        try:
+            async for event in provider.execute_session_stream(
+                prompt, session["working_directory"], session["id"], resume=resume
+            ):
+                if event["type"] == "done":
+                    done = event
+                yield event
+        finally:
+            self._track_start(session, resume, done)
+
+    def _track_start(self, session: Dict[str, Any], resume: bool, result: Optional[Dict[str, Any]]):
+        """
+        Record whether the CLI now holds a native session that hasn't had a successful turn.
+
+        The CLI creates its session as soon as the first turn starts, so a
+        first turn that failed or was cancelled (result None) still makes
+        the next one resume. A resume that fails with an error from the
+        CLI means it may never have created the session; the next turn
+        then starts it afresh.
+        """
+        if session["turns"] > 0:
+            return
+        if result is not None and result.get("caller_error"):
+            return  # The CLI never ran
+        if not resume:
+            self.store.set_started(session["id"], True)
+        elif result is not None and not result["success"] and not result.get("timed_out"):
+            self.store.set_started(session["id"], False)
+
+    @staticmethod
+    def _resume(session: Dict[str, Any]) -> bool:
+        """Whether the CLI already holds the session, so the turn continues it."""
+        return bool(session["started"]) or session["turns"] > 0
+
+    @classmethod
+    def _native(cls, provider: CLIProvider, session: Dict[str, Any]) -> bool:
+        """Whether the CLI continues the session itself, rather than a transcript replay."""
+        return (
+            session["mode"] == NATIVE
+            and provider.session_command(session["id"], resume=cls._resume(session)) is not None
+        )
+
+    def record_turn(self, session_id: str, prompt: str, response: str):
+        """
+        Store a completed turn.
+
+        Raises:
+            SessionConflictError: if the turn can't be recorded
+        """
+        self.store.add_turn(session_id, prompt, response)
+
+    def transcript_prompt(self, session: Dict[str, Any], prompt: str) -> str:
+        """
+        The prompt with as many of the latest earlier turns as fit in SESSION_MAX_TRANSCRIPT_CHARS.
+        """
+        if session["turns"] == 0:
+            return prompt
+
+        budget = config.SESSION_MAX_TRANSCRIPT_CHARS
+        lines: List[str] = []
+        for message in reversed(self.store.messages(session["id"])):
+            speaker = "User" if message["role"] == "user" else "Assistant"
+            line = f"{speaker}: {message['content'].strip()}"
+            if len(line) > budget:
+                break
+            budget -= len(line)
+            lines.append(line)
+        if not lines:
+            return prompt
+
+        return (
+            "Continue the conversation below by replying to the last user message.\n\n"
+            + "\n\n".join(reversed(lines))
+            + f"\n\nUser: {prompt}"
+        )
+
+
+def create_session_manager() -> SessionManager:
+    """Build the session manager from configuration."""
+    return SessionManager(SessionStore(config.SESSIONS_DB_PATH))
+
+
+# Global session manager instance
+session_manager = create_session_manager()
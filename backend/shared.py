@@ -0,0 +1,214 @@
+"""State shared between server worker processes, kept in SQLite."""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional
+
+from .config import config
+
+
+# Seconds a write waits for another worker's transaction before giving up.
+# Short, so a busy database delays a slot poll rather than a whole worker.
+BUSY_TIMEOUT = 1.0
+
+# Attempts at giving back a slot while the database stays busy
+RELEASE_ATTEMPTS = 10
+
+# Seconds before trying again to give back a slot or lease whose release failed
+RELEASE_RETRY_INTERVAL = 5.0
+
+logger = logging.getLogger(__name__)
+
+
+def pid_alive(pid: int) -> bool:
+    """Whether a process with this pid is still running (always True on Windows)."""
+    if os.name == "nt":
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def release_in_background(release: Callable[[str], None], key: str, what: str):
+    """
+    Call release(key) in a thread, without waiting for it.
+
+    For giving back a slot or lease from code that can't wait. A release
+    that fails is logged and tried again every RELEASE_RETRY_INTERVAL
+    seconds, since until it succeeds the slot or lease stays taken for
+    every worker.
+
+    Args:
+        release: Blocking function giving the slot or lease back
+        key: Its id
+        what: What is released, for the log message
+    """
+    loop = asyncio.get_running_loop()
+
+    def check(future: "asyncio.Future[None]"):
+        if future.cancelled() or future.exception() is None:
+            return
+        logger.warning(
+            "Releasing %s %s failed, retrying in %gs: %s",
+            what, key, RELEASE_RETRY_INTERVAL, future.exception()
+        )
+        loop.call_later(RELEASE_RETRY_INTERVAL, release_in_background, release, key, what)
+
+    loop.run_in_executor(None, release, key).add_done_callback(check)
+
+
+class SharedState:
+    """
+    Concurrency slots and provider availability shared by every worker.
+
+    Each worker process holds its own connection to the same SQLite file,
+    so MAX_CONCURRENCY holds across the whole worker group and one
+    worker's availability check serves the others. Slots held by a
+    worker that died are reclaimed the next time a slot is requested.
+
+    Writes may wait up to BUSY_TIMEOUT for another worker, so async code
+    makes them in a thread. Reads go through their own connection, which
+    WAL mode never makes wait for a writer, and can be made on the event loop.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False, timeout=BUSY_TIMEOUT
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS slots (
+                id TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                pid INTEGER NOT NULL,
+                acquired_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_slots_provider ON slots (provider)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS provider_status (
+                name TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                checked_at REAL NOT NULL
+            )
+            """
+        )
+        self._read_lock = threading.Lock()
+        self._read_conn = sqlite3.connect(
+            path, isolation_level=None, check_same_thread=False, timeout=BUSY_TIMEOUT
+        )
+
+    def try_acquire_slot(self, provider: str, limit: int) -> Optional[str]:
+        """
+        Take one of a provider's limit slots if any is free.
+
+        Returns:
+            Slot id to pass to release_slot(), or None if all are taken
+            or another worker kept the database busy
+        """
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError:
+                return None
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, pid FROM slots WHERE provider = ?", (provider,)
+                ).fetchall()
+                held = 0
+                for slot_id, pid in rows:
+                    if pid_alive(pid):
+                        held += 1
+                    else:
+                        self._conn.execute("DELETE FROM slots WHERE id = ?", (slot_id,))
+                if held >= limit:
+                    self._conn.execute("COMMIT")
+                    return None
+                slot_id = uuid.uuid4().hex
+                self._conn.execute(
+                    "INSERT INTO slots (id, provider, pid, acquired_at) VALUES (?, ?, ?, ?)",
+                    (slot_id, provider, os.getpid(), time.time())
+                )
+                self._conn.execute("COMMIT")
+                return slot_id
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def release_slot(self, slot_id: str):
+        """
+        Give back a slot taken by try_acquire_slot().
+
+        Retried while the database is busy, since a slot that isn't given
+        back stays taken until this worker exits.
+        """
+        for attempt in range(RELEASE_ATTEMPTS):
+            try:
+                with self._lock:
+                    self._conn.execute("DELETE FROM slots WHERE id = ?", (slot_id,))
+                return
+            except sqlite3.OperationalError:
+                if attempt == RELEASE_ATTEMPTS - 1:
+                    raise
+
+    def count_slots(self, provider: str) -> int:
+        """Number of a provider's slots held across all workers."""
+        with self._read_lock:
+            row = self._read_conn.execute(
+                "SELECT COUNT(*) FROM slots WHERE provider = ?", (provider,)
+            ).fetchone()
+        return row[0]
+
+    def get_status(self, name: str) -> Optional[Dict[str, Any]]:
+        """Latest availability result stored by any worker, or None."""
+        with self._read_lock:
+            row = self._read_conn.execute(
+                "SELECT status, checked_at FROM provider_status WHERE name = ?", (name,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {**json.loads(row[0]), "checked_at": row[1]}
+
+    def set_status(self, name: str, status: Dict[str, Any]):
+        """
+        Store an availability result for the other workers.
+
+        Skipped if the database stays busy; the other workers then run their own check.
+        """
+        fields = {key: value for key, value in status.items() if key != "checked_at"}
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO provider_status (name, status, checked_at) VALUES (?, ?, ?)",
+                    (name, json.dumps(fields), status["checked_at"])
+                )
+            except sqlite3.OperationalError:
+                pass
+
+
+def create_shared_state() -> Optional[SharedState]:
+    """Build the shared state store when running more than one worker."""
+    if config.WORKERS <= 1:
+        return None
+    return SharedState(config.SHARED_STATE_PATH)
+
+
+# Global shared state instance (None with a single worker)
+shared_state = create_shared_state()
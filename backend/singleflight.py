@@ -0,0 +1,62 @@
+"""Coalescing of identical in-flight executions."""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class _Call:
+    """A shared execution and the number of callers waiting on it."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Runs at most one execution per key at a time.
+
+    Callers arriving while an execution for the same key is running await
+    that execution instead of starting their own. A caller that is
+    cancelled stops waiting without affecting the others; the execution is
+    only cancelled once nobody is waiting for it.
+    """
+
+    def __init__(self):
+        """Initialize with no executions in flight."""
+        self._calls: Dict[str, _Call] = {}
+
+    @property
+    def in_flight(self) -> int:
+        """Number of distinct executions currently running."""
+        return len(self._calls)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run fn, or join an execution already running for key.
+
+        Args:
+            key: Identity of the execution
+            fn: Zero-argument coroutine function started when no execution is running
+
+        Returns:
+            (result of the shared execution, whether this caller started it)
+        """
+        call = self._calls.get(key)
+        leader = call is None
+        if leader:
+            call = _Call(asyncio.ensure_future(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _: self._forget(key, call))
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task), leader
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                call.task.cancel()
+
+    def _forget(self, key: str, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
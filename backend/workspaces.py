@@ -0,0 +1,404 @@
+"""Pools of private copies of registered source directories, leased to executions."""
+
+import asyncio
+import difflib
+import os
+import shutil
+import stat
+import subprocess
+import sys
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+
+from .config import config
+from .shared import pid_alive
+
+
+# Files larger than this are reported as changed without a line diff
+MAX_DIFF_FILE_BYTES = 1024 * 1024
+
+# (kind, size, mtime_ns, mode) of one entry; kind is "d", "f" or "l" (symlink)
+Entry = Tuple[str, int, int, int]
+
+
+def parse_workspaces(value: str) -> Dict[str, str]:
+    """
+    Parse WORKSPACES.
+
+    Args:
+        value: Comma-separated "name:/path/to/source" entries
+
+    Returns:
+        Mapping of workspace name to absolute source directory
+
+    Raises:
+        ValueError: if an entry is malformed or its source is not a directory
+    """
+    workspaces = {}
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, path = entry.partition(":")
+        if not name or not path:
+            raise ValueError(f"Invalid WORKSPACES entry '{entry}'; expected name:/path/to/source")
+        path = os.path.realpath(os.path.expanduser(path))
+        if not os.path.isdir(path):
+            raise ValueError(f"Workspace '{name}' source is not a directory: {path}")
+        workspaces[name] = path
+    return workspaces
+
+
+def scan_tree(root: str) -> Dict[str, Entry]:
+    """Map every path below root (relative, "/"-separated) to its kind, size, mtime and mode."""
+    entries: Dict[str, Entry] = {}
+    pending = [""]
+    while pending:
+        relative = pending.pop()
+        with os.scandir(os.path.join(root, relative)) as it:
+            for item in it:
+                path = f"{relative}/{item.name}" if relative else item.name
+                st = item.stat(follow_symlinks=False)
+                if stat.S_ISLNK(st.st_mode):
+                    entries[path] = ("l", 0, 0, 0)
+                elif stat.S_ISDIR(st.st_mode):
+                    entries[path] = ("d", 0, 0, 0)
+                    pending.append(path)
+                else:
+                    entries[path] = ("f", st.st_size, st.st_mtime_ns, st.st_mode)
+    return entries
+
+
+def compare_trees(source: str, copy: str) -> Tuple[List[str], List[str], List[str]]:
+    """
+    Find what differs between a source directory and a copy of it.
+
+    Files are compared by size, modification time and mode, which copies
+    keep from the source, so unchanged files are never read.
+
+    Returns:
+        (added, removed, modified) relative paths: only in the copy, only
+        in the source, and in both but different (including changed kind)
+    """
+    source_entries = scan_tree(source)
+    copy_entries = scan_tree(copy)
+    added = sorted(set(copy_entries) - set(source_entries))
+    removed = sorted(set(source_entries) - set(copy_entries))
+    modified = []
+    for path in sorted(set(source_entries) & set(copy_entries)):
+        want, have = source_entries[path], copy_entries[path]
+        if want[0] != have[0]:
+            modified.append(path)
+        elif want[0] == "l":
+            if os.readlink(os.path.join(source, path)) != os.readlink(os.path.join(copy, path)):
+                modified.append(path)
+        elif want[0] == "f" and want != have:
+            modified.append(path)
+    return added, removed, modified
+
+
+def copy_tree(source: str, destination: str):
+    """
+    Make destination a full copy of source, preserving modification times.
+
+    On Linux, `cp --reflink=auto` shares data blocks with the source on
+    filesystems that support it (Btrfs, XFS, ...), and on macOS `cp -c`
+    clones files on APFS, so a copy costs only metadata. Elsewhere, or if
+    cp fails, files are copied.
+    """
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    if sys.platform.startswith("linux"):
+        command = ["cp", "-a", "--reflink=auto", source, destination]
+    elif sys.platform == "darwin":
+        command = ["cp", "-c", "-pR", source, destination]
+    else:
+        command = None
+    if command and shutil.which("cp"):
+        if subprocess.run(command, capture_output=True).returncode == 0:
+            return
+        shutil.rmtree(destination, ignore_errors=True)
+    shutil.copytree(source, destination, symlinks=True)
+
+
+def _is_dir(path: str) -> bool:
+    return os.path.isdir(path) and not os.path.islink(path)
+
+
+def _remove(path: str):
+    if _is_dir(path):
+        shutil.rmtree(path)
+    else:
+        os.unlink(path)
+
+
+def _restore(source: str, copy: str, path: str):
+    """Copy one entry (not recursively) from source to copy."""
+    src, dst = os.path.join(source, path), os.path.join(copy, path)
+    if os.path.islink(src):
+        os.symlink(os.readlink(src), dst)
+    elif os.path.isdir(src):
+        os.makedirs(dst, exist_ok=True)
+        shutil.copystat(src, dst)
+    else:
+        shutil.copy2(src, dst)
+
+
+def reset_tree(source: str, copy: str):
+    """
+    Bring a copy back in line with its source.
+
+    Only entries that differ are removed or copied again, so resetting
+    after a run costs a directory scan plus the files the run touched.
+    """
+    added, removed, modified = compare_trees(source, copy)
+    # Parents sort before their children, so deleting a directory first
+    # leaves its children already gone
+    for path in added + modified:
+        target = os.path.join(copy, path)
+        if os.path.lexists(target):
+            _remove(target)
+    for path in sorted(removed + modified):
+        _restore(source, copy, path)
+
+
+def _read_lines(path: str) -> Optional[List[str]]:
+    """Lines of a text file, or None if it is binary or too large to diff."""
+    if os.path.islink(path):
+        # Like git, a symlink's content is its target without a newline
+        return [os.readlink(path)]
+    if os.path.getsize(path) > MAX_DIFF_FILE_BYTES:
+        return None
+    with open(path, "rb") as f:
+        data = f.read()
+    if b"\0" in data[:8192]:
+        return None
+    try:
+        return data.decode("utf-8").splitlines(keepends=True)
+    except UnicodeDecodeError:
+        return None
+
+
+def _mode(path: str) -> str:
+    return f"{os.lstat(path).st_mode:o}"
+
+
+def diff_tree(source: str, copy: str) -> str:
+    """
+    Diff of every file that differs between source and copy.
+
+    Returns:
+        A diff in `git diff` format; binary or very large files are
+        listed without their content
+    """
+    added, removed, modified = compare_trees(source, copy)
+    parts = []
+    for path in sorted(added + removed + modified):
+        old = os.path.join(source, path)
+        new = os.path.join(copy, path)
+        if _is_dir(old) or _is_dir(new):
+            continue
+        old_exists, new_exists = os.path.lexists(old), os.path.lexists(new)
+        parts.append(f"diff --git a/{path} b/{path}\n")
+        if not old_exists:
+            parts.append(f"new file mode {_mode(new)}\n")
+        elif not new_exists:
+            parts.append(f"deleted file mode {_mode(old)}\n")
+        elif _mode(old) != _mode(new):
+            parts.append(f"old mode {_mode(old)}\nnew mode {_mode(new)}\n")
+        old_lines = _read_lines(old) if old_exists else []
+        new_lines = _read_lines(new) if new_exists else []
+        if old_lines is None or new_lines is None:
+            parts.append(f"Binary files a/{path} and b/{path} differ\n")
+            continue
+        for line in difflib.unified_diff(
+            old_lines,
+            new_lines,
+            fromfile=f"a/{path}" if old_exists else "/dev/null",
+            tofile=f"b/{path}" if new_exists else "/dev/null"
+        ):
+            parts.append(line if line.endswith("\n") else line + "\n\\ No newline at end of file\n")
+    return "".join(parts)
+
+
+class WorkspacePool:
+    """
+    Copies of one source directory, each leased to one execution at a time.
+
+    Up to pool_size copies are prepared ahead of time and at most
+    max_copies exist; leases beyond that wait for a copy to be returned.
+    Copies live in root/<pid>-<n>, so workers never share one. Copies
+    left by a worker that has exited are adopted instead of copied again.
+    """
+
+    def __init__(self, name: str, source: str, root: str, pool_size: int, max_copies: int):
+        self.name = name
+        self.source = source
+        self.root = root
+        self.pool_size = pool_size
+        self.max_copies = max(max_copies, 1)
+        self._idle: List[str] = []
+        self._copies: Set[str] = set()
+        self._next = 0
+        self._condition = asyncio.Condition()
+        self._recycling: Set[asyncio.Task] = set()
+
+    async def prepare(self):
+        """Adopt copies left by exited workers and create copies up to pool_size."""
+        os.makedirs(self.root, exist_ok=True)
+        for path in await asyncio.to_thread(self._adopt_orphans):
+            async with self._condition:
+                self._copies.add(path)
+            self._recycle(path)
+        while len(self._copies) < min(self.pool_size, self.max_copies):
+            async with self._condition:
+                path = self._new_path()
+            try:
+                await asyncio.to_thread(copy_tree, self.source, path)
+            except Exception:
+                async with self._condition:
+                    self._copies.discard(path)
+                raise
+            async with self._condition:
+                self._idle.append(path)
+                self._condition.notify()
+
+    @asynccontextmanager
+    async def lease(self) -> AsyncIterator[str]:
+        """
+        Lease a copy matching the source as it is now.
+
+        The copy is reset in the background once the lease ends.
+
+        Yields:
+            Path of the copy
+        """
+        async with self._condition:
+            while not self._idle and len(self._copies) >= self.max_copies:
+                await self._condition.wait()
+            path = self._idle.pop() if self._idle else None
+            if path is None:
+                path = self._new_path()
+
+        try:
+            if os.path.isdir(path):
+                # Picks up changes made to the source since the copy was reset
+                await asyncio.to_thread(reset_tree, self.source, path)
+            else:
+                await asyncio.to_thread(copy_tree, self.source, path)
+        except BaseException:
+            self._recycle(path)
+            raise
+
+        try:
+            yield path
+        finally:
+            self._recycle(path)
+
+    async def close(self):
+        """Wait for copies being reset."""
+        await asyncio.gather(*self._recycling, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot for the API."""
+        return {
+            "source": self.source,
+            "copies": len(self._copies),
+            "idle": len(self._idle),
+            "leased": len(self._copies) - len(self._idle) - len(self._recycling),
+            "max_copies": self.max_copies,
+        }
+
+    def _new_path(self) -> str:
+        """Reserve the path of a new copy; call with the condition held."""
+        path = os.path.join(self.root, f"{os.getpid()}-{self._next}")
+        self._next += 1
+        self._copies.add(path)
+        return path
+
+    def _adopt_orphans(self) -> List[str]:
+        """Rename copies whose worker has exited to paths owned by this process."""
+        adopted = []
+        for name in sorted(os.listdir(self.root)):
+            pid, _, _ = name.partition("-")
+            if not pid.isdigit() or (int(pid) != os.getpid() and pid_alive(int(pid))):
+                continue
+            path = os.path.join(self.root, f"{os.getpid()}-{self._next}")
+            try:
+                # Another worker may adopt the same copy; only one rename wins
+                os.rename(os.path.join(self.root, name), path)
+            except OSError:
+                continue
+            self._next += 1
+            if len(adopted) < self.max_copies:
+                adopted.append(path)
+            else:
+                shutil.rmtree(path, ignore_errors=True)
+        return adopted
+
+    def _recycle(self, path: str):
+        """Reset a copy in the background, then make it available again."""
+        task = asyncio.ensure_future(self._reset(path))
+        self._recycling.add(task)
+        task.add_done_callback(self._recycling.discard)
+
+    async def _reset(self, path: str):
+        try:
+            if not os.path.isdir(path):
+                raise FileNotFoundError(path)
+            await asyncio.to_thread(reset_tree, self.source, path)
+        except Exception:
+            # A copy that can't be reset is dropped; a new one is made when needed
+            await asyncio.to_thread(shutil.rmtree, path, True)
+            async with self._condition:
+                self._copies.discard(path)
+                self._condition.notify()
+            return
+        async with self._condition:
+            self._idle.append(path)
+            self._condition.notify()
+
+
+class WorkspaceManager:
+    """The workspace pools configured in WORKSPACES."""
+
+    def __init__(self, workspaces: Dict[str, str], root: str, pool_size: int, max_copies: int):
+        self.pools = {
+            name: WorkspacePool(name, source, os.path.join(root, name), pool_size, max_copies)
+            for name, source in workspaces.items()
+        }
+        self._prepare: Optional[asyncio.Future] = None
+
+    def get(self, name: str) -> Optional[WorkspacePool]:
+        """Get a workspace pool by name."""
+        return self.pools.get(name)
+
+    def start(self):
+        """Prepare every pool in the background."""
+        self._prepare = asyncio.ensure_future(
+            asyncio.gather(*(pool.prepare() for pool in self.pools.values()), return_exceptions=True)
+        )
+
+    async def close(self):
+        """Stop preparing copies and wait for copies being reset."""
+        if self._prepare is not None:
+            self._prepare.cancel()
+            await asyncio.gather(self._prepare, return_exceptions=True)
+        await asyncio.gather(*(pool.close() for pool in self.pools.values()))
+
+    async def diff(self, name: str, path: str) -> str:
+        """Unified diff of the changes made in a leased copy, relative to its source."""
+        return await asyncio.to_thread(diff_tree, self.pools[name].source, path)
+
+
+def create_workspace_manager() -> WorkspaceManager:
+    """Build the workspace manager from configuration."""
+    return WorkspaceManager(
+        parse_workspaces(config.WORKSPACES),
+        config.WORKSPACE_ROOT,
+        config.WORKSPACE_POOL_SIZE,
+        config.WORKSPACE_MAX_COPIES
+    )
+
+
+# Global workspace manager instance
+workspace_manager = create_workspace_manager()
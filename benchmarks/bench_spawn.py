@@ -0,0 +1,128 @@
+"""
+Micro-benchmark: shell + temp file vs direct exec with stdin piping.
+
+Compares the two ways the providers have launched a CLI:
+
+    shell:  write prompt to a temp file, then `cat FILE | CLI` via /bin/sh
+    exec:   start CLI directly and write the prompt to its stdin
+
+`cat` stands in for the CLI so only the launch overhead is measured.
+Requests are fired at a fixed concurrency to mimic a busy server.
+
+Usage:
+    python benchmarks/bench_spawn.py
+    python benchmarks/bench_spawn.py --requests 1000 --concurrency 32
+    python benchmarks/bench_spawn.py --prompt-bytes 200000 --json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.providers.base import run_cli  # noqa: E402
+
+
+async def run_shell(prompt: str) -> float:
+    """The former Claude provider path: temp file, shell, cat, pipe."""
+    start = time.perf_counter()
+    with tempfile.NamedTemporaryFile(mode="w", suffix=".txt", delete=False, encoding="utf-8") as f:
+        f.write(prompt)
+        temp_file = f.name
+    try:
+        process = await asyncio.create_subprocess_shell(
+            f'cat "{temp_file}" | cat',
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        await process.communicate()
+    finally:
+        os.remove(temp_file)
+    return time.perf_counter() - start
+
+
+async def run_exec(prompt: str) -> float:
+    """The shared runner: direct exec, prompt on stdin."""
+    start = time.perf_counter()
+    await run_cli(["cat"], prompt)
+    return time.perf_counter() - start
+
+
+async def drive(runner, prompt: str, requests: int, concurrency: int) -> dict:
+    """Run `requests` launches, at most `concurrency` at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one():
+        async with semaphore:
+            latencies.append(await runner(prompt))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    return {
+        "throughput_rps": requests / elapsed,
+        "mean_ms": statistics.mean(ordered) * 1000,
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p99_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+    }
+
+
+async def benchmark(args) -> dict:
+    prompt = "x" * args.prompt_bytes
+    # Warm up the OS caches for both paths
+    await drive(run_shell, prompt, 10, 1)
+    await drive(run_exec, prompt, 10, 1)
+    return {
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "prompt_bytes": args.prompt_bytes,
+        "shell": await drive(run_shell, prompt, args.requests, args.concurrency),
+        "exec": await drive(run_exec, prompt, args.requests, args.concurrency),
+    }
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Shell + temp file vs direct exec launch overhead")
+    parser.add_argument("--requests", type=int, default=500,
+                        help="Launches per mode (default: 500)")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="Launches in flight at once (default: 16)")
+    parser.add_argument("--prompt-bytes", type=int, default=2000,
+                        help="Prompt size in bytes (default: 2000)")
+    parser.add_argument("--json", action="store_true",
+                        help="Print machine-readable JSON")
+    args = parser.parse_args()
+
+    if os.name == "nt":
+        print("This benchmark uses /bin/sh and cat; run it on Linux or macOS.", file=sys.stderr)
+        sys.exit(1)
+
+    result = asyncio.run(benchmark(args))
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"{args.requests} launches per mode, concurrency {args.concurrency}, "
+          f"{args.prompt_bytes}-byte prompt")
+    print(f"{'mode':<6} {'req/s':>8} {'mean':>10} {'p50':>10} {'p99':>10}")
+    for mode in ("shell", "exec"):
+        s = result[mode]
+        print(f"{mode:<6} {s['throughput_rps']:>8.0f} {s['mean_ms']:>8.2f}ms "
+              f"{s['p50_ms']:>8.2f}ms {s['p99_ms']:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Benchmark: cold-spawned vs pre-spawned (pooled) CLI processes.
+
+Measures the latency from "request arrives" to "CLI has answered" for a
+CLI that reads its prompt from stdin. By default a stub CLI is used that
+sleeps for --startup seconds before reading stdin, standing in for a
+Node.js CLI's cold start, so the benchmark runs offline.
+
+Usage:
+    python benchmarks/bench_worker_pool.py
+    python benchmarks/bench_worker_pool.py --startup 0.5 --requests 50
+    python benchmarks/bench_worker_pool.py --command claude --print  # real CLI
+    python benchmarks/bench_worker_pool.py --json
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.providers.pool import WorkerPool  # noqa: E402
+
+
+def stub_command(startup: float) -> List[str]:
+    """A CLI that takes `startup` seconds to boot, then echoes stdin."""
+    script = (
+        f"import sys, time; time.sleep({startup}); "
+        "sys.stdout.write(sys.stdin.read())"
+    )
+    return [sys.executable, "-c", script]
+
+
+async def run_cold(command: List[str], prompt: bytes) -> float:
+    """Spawn a fresh process for the request."""
+    start = time.perf_counter()
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    await process.communicate(prompt)
+    return time.perf_counter() - start
+
+
+async def run_pooled(pool: WorkerPool, command: List[str], prompt: bytes) -> float:
+    """Use a pre-spawned worker, falling back to a cold spawn like the providers do."""
+    start = time.perf_counter()
+    process = pool.acquire()
+    if process is None:
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+    await process.communicate(prompt)
+    return time.perf_counter() - start
+
+
+def summarize(samples: List[float]) -> dict:
+    """Latency summary in milliseconds."""
+    ordered = sorted(samples)
+    return {
+        "mean_ms": statistics.mean(ordered) * 1000,
+        "p50_ms": ordered[len(ordered) // 2] * 1000,
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+async def benchmark(args) -> dict:
+    command = args.command or stub_command(args.startup)
+    prompt = b"Say hello."
+
+    cold = []
+    for _ in range(args.requests):
+        cold.append(await run_cold(command, prompt))
+        await asyncio.sleep(args.interval)
+
+    pool = WorkerPool(command, args.pool_size, max_idle=3600)
+    pool.start()
+    # Let the pool fill before the first request
+    await asyncio.sleep(max(args.startup, 0.1) + 0.5)
+
+    pooled = []
+    for _ in range(args.requests):
+        pooled.append(await run_pooled(pool, command, prompt))
+        await asyncio.sleep(args.interval)
+    await pool.close()
+
+    return {
+        "command": command,
+        "requests": args.requests,
+        "interval_s": args.interval,
+        "pool_size": args.pool_size,
+        "cold": summarize(cold),
+        "pooled": summarize(pooled),
+        "pool_hits": pool.hits,
+        "pool_misses": pool.misses,
+    }
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Cold spawn vs worker pool latency")
+    parser.add_argument("--command", nargs=argparse.REMAINDER,
+                        help="CLI argv reading the prompt from stdin (default: stub CLI)")
+    parser.add_argument("--startup", type=float, default=0.3,
+                        help="Stub CLI startup time in seconds (default: 0.3)")
+    parser.add_argument("--requests", type=int, default=20,
+                        help="Requests per mode (default: 20)")
+    parser.add_argument("--interval", type=float, default=0.5,
+                        help="Seconds between requests, giving the pool time to refill (default: 0.5)")
+    parser.add_argument("--pool-size", type=int, default=2,
+                        help="Idle workers to keep (default: 2)")
+    parser.add_argument("--json", action="store_true",
+                        help="Print machine-readable JSON")
+    args = parser.parse_args()
+
+    result = asyncio.run(benchmark(args))
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"{args.requests} requests per mode, {args.interval}s apart, pool size {args.pool_size}")
+    print(f"{'mode':<8} {'mean':>10} {'p50':>10} {'p95':>10} {'max':>10}")
+    for mode in ("cold", "pooled"):
+        s = result[mode]
+        print(f"{mode:<8} {s['mean_ms']:>8.1f}ms {s['p50_ms']:>8.1f}ms "
+              f"{s['p95_ms']:>8.1f}ms {s['max_ms']:>8.1f}ms")
+    print(f"pool hits: {result['pool_hits']}, misses: {result['pool_misses']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+"""
+Load test: drive the wrapper's HTTP API at fixed concurrency levels.
+
+By default this starts a server (python main.py) on a free port with the
+fake provider enabled, so the whole dispatch path (HTTP, scheduling,
+spawning, pipe reading) is measured without a real LLM CLI or network
+access. For each endpoint and concurrency level it reports throughput,
+p50/p95/p99 latency and error count, followed by the server's peak
+memory.
+
+Usage:
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --concurrency 1 8 64 --requests 500
+    python benchmarks/load_test.py --mode inline --latency 0   # no subprocesses
+    python benchmarks/load_test.py --workers 4
+    python benchmarks/load_test.py --url http://localhost:5000 --provider fake
+    python benchmarks/load_test.py --json
+"""
+
+import argparse
+import http.client
+import itertools
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+from backend.metrics import peak_rss_bytes  # noqa: E402
+
+
+def free_port() -> int:
+    """Pick an unused local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, port: int, data_dir: str) -> subprocess.Popen:
+    """Start the wrapper with the fake provider and limits high enough not to queue."""
+    max_concurrency = max(args.concurrency)
+    env = {
+        **os.environ,
+        "PORT": str(port),
+        "HOST": "127.0.0.1",
+        "WORKERS": str(args.workers),
+        "FAKE_PROVIDER_ENABLED": "true",
+        "FAKE_MODE": args.mode,
+        "FAKE_LATENCY": str(args.latency),
+        "FAKE_OUTPUT_BYTES": str(args.output_bytes),
+        "FAKE_CHUNKS": str(args.chunks),
+        "FAKE_MAX_CONCURRENCY": str(max_concurrency),
+        "FAKE_MAX_QUEUE_SIZE": str(max_concurrency * 4),
+        "FAKE_WORKER_POOL_SIZE": str(args.pool_size),
+        "JOBS_DB_PATH": os.path.join(data_dir, "jobs.db"),
+        "SHARED_STATE_PATH": os.path.join(data_dir, "shared.db"),
+        "CACHE_ENABLED": "false",
+    }
+    return subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=REPO_ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+
+def wait_ready(url: str, timeout: float = 30):
+    """Poll /health until the server answers."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            status, _ = Client(url).request("GET", "/health")
+            if status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become ready within {timeout}s")
+
+
+class Client:
+    """A keep-alive HTTP connection, reopened after errors."""
+
+    def __init__(self, url: str):
+        parsed = urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+        self._conn: Optional[http.client.HTTPConnection] = None
+
+    def request(self, method: str, path: str, body: Optional[dict] = None) -> Tuple[int, bytes]:
+        if self._conn is None:
+            self._conn = http.client.HTTPConnection(self.host, self.port, timeout=600)
+        payload = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if payload is not None else {}
+        try:
+            self._conn.request(method, path, payload, headers)
+            response = self._conn.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            self._conn.close()
+            self._conn = None
+            raise
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_level(url: str, endpoint: str, provider: str, concurrency: int, requests: int) -> dict:
+    """Send `requests` requests from `concurrency` threads, each with its own connection."""
+    counter = itertools.count()
+    lock = threading.Lock()
+    latencies: List[float] = []
+    errors = 0
+
+    def worker():
+        nonlocal errors
+        client = Client(url)
+        while True:
+            i = next(counter)
+            if i >= requests:
+                return
+            start = time.perf_counter()
+            try:
+                if endpoint == "ask":
+                    # Unique prompts, so coalescing and caching don't skip executions
+                    status, body = client.request(
+                        "POST", "/api/ask", {"provider": provider, "prompt": f"load test {i}"}
+                    )
+                    ok = status == 200 and json.loads(body)["success"]
+                else:
+                    status, _ = client.request("GET", "/api/providers")
+                    ok = status == 200
+            except (OSError, http.client.HTTPException, ValueError):
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if not ok:
+                    errors += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    return {
+        "endpoint": "/api/ask" if endpoint == "ask" else "/api/providers",
+        "concurrency": concurrency,
+        "requests": len(ordered),
+        "errors": errors,
+        "duration_s": duration,
+        "throughput_rps": len(ordered) / duration if duration else 0.0,
+        "latency_ms": {
+            "mean": statistics.mean(ordered) * 1000,
+            "p50": percentile(ordered, 50) * 1000,
+            "p95": percentile(ordered, 95) * 1000,
+            "p99": percentile(ordered, 99) * 1000,
+            "max": ordered[-1] * 1000,
+        },
+    }
+
+
+def child_pids(pid: int) -> List[int]:
+    """Direct children of a process, found by scanning /proc (Linux only)."""
+    children = []
+    for entry in Path("/proc").glob("[0-9]*"):
+        try:
+            with open(entry / "stat") as stat:
+                # The command name may contain spaces; the parent pid follows its closing paren
+                fields = stat.read().rsplit(")", 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        if int(fields[1]) == pid:
+            children.append(int(entry.name))
+    return children
+
+
+def memory_report(
+    url: str,
+    provider: str,
+    server: Optional[subprocess.Popen]
+) -> Dict[str, Optional[int]]:
+    """Peak RSS of the server processes we started, and of the CLI processes they ran."""
+    server_peak = None
+    if server is not None:
+        # Worker processes (WORKERS > 1) are the server's children
+        peaks = [peak_rss_bytes(pid) for pid in [server.pid, *child_pids(server.pid)]]
+        peaks = [peak for peak in peaks if peak is not None]
+        server_peak = sum(peaks) if peaks else None
+
+    # Reported by whichever worker answers, when there are several
+    child_peak = None
+    sample = f'cli_wrapper_child_peak_rss_bytes{{provider="{provider}"}} '
+    try:
+        status, body = Client(url).request("GET", "/metrics")
+        if status == 200:
+            for line in body.decode().splitlines():
+                if line.startswith(sample):
+                    child_peak = int(float(line.split()[1]))
+    except (OSError, http.client.HTTPException):
+        pass
+
+    return {"server_peak_rss_bytes": server_peak, "child_peak_rss_bytes": child_peak}
+
+
+def benchmark(args) -> dict:
+    server = None
+    url = args.url
+    with tempfile.TemporaryDirectory() as data_dir:
+        if url is None:
+            port = free_port()
+            url = f"http://127.0.0.1:{port}"
+            server = start_server(args, port, data_dir)
+        try:
+            wait_ready(url)
+            # Warm up imports, availability checks and connections
+            run_level(url, "ask", args.provider, 1, args.warmup)
+
+            results = []
+            for endpoint in args.endpoints:
+                for concurrency in args.concurrency:
+                    results.append(
+                        run_level(url, endpoint, args.provider, concurrency, args.requests)
+                    )
+            memory = memory_report(url, args.provider, server)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=30)
+
+    return {
+        "url": url,
+        "provider": args.provider,
+        "server": None if args.url else {
+            "workers": args.workers,
+            "mode": args.mode,
+            "latency_s": args.latency,
+            "output_bytes": args.output_bytes,
+            "chunks": args.chunks,
+            "pool_size": args.pool_size,
+        },
+        "results": results,
+        "memory": memory,
+    }
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Load test the wrapper's HTTP API")
+    parser.add_argument("--url",
+                        help="Test an already running server instead of starting one")
+    parser.add_argument("--provider", default="fake",
+                        help="Provider to send prompts to (default: fake)")
+    parser.add_argument("--endpoints", nargs="+", choices=["ask", "providers"],
+                        default=["ask", "providers"],
+                        help="Endpoints to drive (default: ask providers)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32],
+                        help="Concurrency levels (default: 1 8 32)")
+    parser.add_argument("--requests", type=int, default=200,
+                        help="Requests per endpoint and concurrency level (default: 200)")
+    parser.add_argument("--warmup", type=int, default=5,
+                        help="Requests sent before measuring (default: 5)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Server worker processes (default: 1)")
+    parser.add_argument("--mode", choices=["process", "inline"], default="process",
+                        help="Fake provider mode: stub CLI subprocess or none (default: process)")
+    parser.add_argument("--latency", type=float, default=0.1,
+                        help="Fake response latency in seconds (default: 0.1)")
+    parser.add_argument("--output-bytes", type=int, default=1024,
+                        help="Fake response size (default: 1024)")
+    parser.add_argument("--chunks", type=int, default=1,
+                        help="Pieces the fake response is written in (default: 1)")
+    parser.add_argument("--pool-size", type=int, default=0,
+                        help="Pre-spawned fake CLI workers (default: 0)")
+    parser.add_argument("--json", action="store_true",
+                        help="Print machine-readable JSON")
+    args = parser.parse_args()
+
+    result = benchmark(args)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print(f"{args.requests} requests per level against {result['url']} (provider {args.provider})")
+    print(f"{'endpoint':<16} {'conc':>5} {'req/s':>9} {'p50':>10} {'p95':>10} "
+          f"{'p99':>10} {'errors':>7}")
+    for r in result["results"]:
+        lat = r["latency_ms"]
+        print(f"{r['endpoint']:<16} {r['concurrency']:>5} {r['throughput_rps']:>9.1f} "
+              f"{lat['p50']:>8.1f}ms {lat['p95']:>8.1f}ms {lat['p99']:>8.1f}ms {r['errors']:>7}")
+    for key, value in result["memory"].items():
+        shown = f"{value / 1024 / 1024:.1f} MiB" if value is not None else "n/a"
+        print(f"{key}: {shown}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""
+Remote workers on localhost: a coordinator dispatching to several agents.
+
+Starts `--agents` worker agents (python -m backend.agent) with the fake
+provider, each allowed `--capacity` concurrent runs, and a server
+(python main.py) with REMOTE_WORKERS pointing at them. Then, at
+`--concurrency` parallel /api/ask requests:
+
+1. balanced: every agent is up; runs should spread evenly
+2. drained: the first agent is drained through the API and must take no runs
+3. agent shutdown: another agent gets SIGTERM mid-load; it finishes what it
+   has, refuses the rest, and those runs go to the remaining agents
+
+With --check, the exit status is 1 if any request failed, the drained
+agent took runs, or the balanced phase was lopsided.
+
+Usage:
+    python benchmarks/remote_cluster.py
+    python benchmarks/remote_cluster.py --agents 4 --capacity 2 --requests 400
+    python benchmarks/remote_cluster.py --check --json
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from load_test import REPO_ROOT, Client, free_port, run_level, wait_ready  # noqa: E402
+
+
+def fake_env(args) -> Dict[str, str]:
+    """Settings for the fake provider shared by the agents and the server."""
+    return {
+        **os.environ,
+        "FAKE_PROVIDER_ENABLED": "true",
+        "FAKE_MODE": args.mode,
+        "FAKE_LATENCY": str(args.latency),
+        "FAKE_OUTPUT_BYTES": "256",
+        "REMOTE_TOKEN": "remote-cluster-benchmark",
+    }
+
+
+def start_agent(args, port: int, index: int) -> subprocess.Popen:
+    """Start a worker agent allowing --capacity concurrent fake runs."""
+    env = {
+        **fake_env(args),
+        "FAKE_MAX_CONCURRENCY": str(args.capacity),
+        "FAKE_MAX_QUEUE_SIZE": str(args.concurrency * 4),
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "backend.agent", "--port", str(port), "--name", f"agent{index}"],
+        cwd=REPO_ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+
+def start_server(args, port: int, agent_ports: List[int], data_dir: str) -> subprocess.Popen:
+    """Start the coordinator, sending every fake run to the agents."""
+    env = {
+        **fake_env(args),
+        "PORT": str(port),
+        "HOST": "127.0.0.1",
+        "REMOTE_WORKERS": ",".join(f"127.0.0.1:{p}" for p in agent_ports),
+        "REMOTE_PROVIDERS": "fake",
+        "REMOTE_HEALTH_INTERVAL": "0.5",
+        "FAKE_MAX_CONCURRENCY": str(args.concurrency),
+        "FAKE_MAX_QUEUE_SIZE": str(args.concurrency * 4),
+        "CIRCUIT_BREAKER": "false",
+        "COALESCE_REQUESTS": "false",
+        "JOBS_DB_PATH": os.path.join(data_dir, "jobs.db"),
+        "SESSIONS_DB_PATH": os.path.join(data_dir, "sessions.db"),
+        "USAGE_DB_PATH": os.path.join(data_dir, "usage.db"),
+        "SHARED_STATE_PATH": os.path.join(data_dir, "shared.db"),
+    }
+    return subprocess.Popen(
+        [sys.executable, "main.py"],
+        cwd=REPO_ROOT,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+
+def worker_runs(url: str) -> Dict[str, int]:
+    """Runs each agent has taken so far, by address."""
+    _, body = Client(url).request("GET", "/api/remote/workers")
+    return {worker["address"]: worker["runs"] for worker in json.loads(body)["workers"]}
+
+
+def wait_connected(url: str, count: int, timeout: float = 30):
+    """Wait until the server is connected to every agent."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        _, body = Client(url).request("GET", "/api/remote/workers")
+        workers = json.loads(body)["workers"]
+        if sum(worker["connected"] for worker in workers) == count:
+            return
+        time.sleep(0.2)
+    raise RuntimeError("Server did not connect to every agent")
+
+
+def run_phase(url: str, args, name: str) -> dict:
+    """Drive one phase of load and count the runs each agent took."""
+    before = worker_runs(url)
+    level = run_level(url, "ask", "fake", args.concurrency, args.requests)
+    after = worker_runs(url)
+    return {
+        "phase": name,
+        "requests": level["requests"],
+        "errors": level["errors"],
+        "throughput_rps": level["throughput_rps"],
+        "p95_ms": level["latency_ms"]["p95"],
+        "runs": {address: after[address] - before.get(address, 0) for address in after},
+    }
+
+
+def benchmark(args) -> dict:
+    """Start the agents and the server, then run the three phases."""
+    agent_ports = [free_port() for _ in range(args.agents)]
+    addresses = [f"127.0.0.1:{port}" for port in agent_ports]
+    agents = [start_agent(args, port, i) for i, port in enumerate(agent_ports)]
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    with tempfile.TemporaryDirectory() as data_dir:
+        # Agents must be listening before the server's first connection attempt
+        time.sleep(1.5)
+        server = start_server(args, port, agent_ports, data_dir)
+        try:
+            wait_ready(url)
+            wait_connected(url, args.agents)
+            phases = [run_phase(url, args, "balanced")]
+
+            Client(url).request("POST", f"/api/remote/workers/{addresses[0]}/drain")
+            phases.append(run_phase(url, args, "drained"))
+
+            if args.agents > 2:
+                # Stop an agent a moment into the phase, while it is busy
+                timer = threading.Timer(args.latency * 3, agents[1].send_signal, [signal.SIGTERM])
+                timer.start()
+                phases.append(run_phase(url, args, "agent shutdown"))
+                timer.join()
+                agents[1].wait(timeout=30)
+        finally:
+            server.terminate()
+            server.wait()
+            for agent in agents:
+                if agent.poll() is None:
+                    agent.terminate()
+                    agent.wait()
+    return {"agents": addresses, "phases": phases}
+
+
+def check(result: dict, args) -> List[str]:
+    """Problems that make --check fail."""
+    problems = []
+    addresses = result["agents"]
+    for phase in result["phases"]:
+        if phase["errors"]:
+            problems.append(f"{phase['phase']}: {phase['errors']} of {phase['requests']} requests failed")
+    balanced = result["phases"][0]["runs"]
+    fair = args.requests / len(addresses)
+    for address in addresses:
+        if not fair * 0.5 <= balanced[address] <= fair * 1.5:
+            problems.append(f"balanced: {address} took {balanced[address]} runs, expected about {fair:.0f}")
+    for phase in result["phases"][1:]:
+        if phase["runs"][addresses[0]]:
+            problems.append(f"{phase['phase']}: drained {addresses[0]} took {phase['runs'][addresses[0]]} runs")
+    return problems
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Dispatch to several worker agents on localhost")
+    parser.add_argument("--agents", type=int, default=3,
+                        help="Worker agents to start (default: 3)")
+    parser.add_argument("--capacity", type=int, default=4,
+                        help="Concurrent runs each agent allows (default: 4)")
+    parser.add_argument("--concurrency", type=int, default=12,
+                        help="Parallel requests to the server (default: 12)")
+    parser.add_argument("--requests", type=int, default=300,
+                        help="Requests per phase (default: 300)")
+    parser.add_argument("--mode", choices=["process", "inline"], default="process",
+                        help="Fake provider mode on the agents (default: process)")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="Seconds per fake run (default: 0.05)")
+    parser.add_argument("--check", action="store_true",
+                        help="Exit with status 1 on failed requests, runs on a drained agent or uneven spread")
+    parser.add_argument("--json", action="store_true",
+                        help="Print machine-readable JSON")
+    args = parser.parse_args()
+
+    result = benchmark(args)
+    problems = check(result, args) if args.check else []
+
+    if args.json:
+        print(json.dumps({**result, "problems": problems}, indent=2))
+    else:
+        print(f"{args.agents} agents x {args.capacity} slots, {args.concurrency} parallel requests, "
+              f"{args.latency * 1000:.0f}ms fake runs")
+        for phase in result["phases"]:
+            runs = ", ".join(f"{address.rsplit(':', 1)[1]}: {n}" for address, n in phase["runs"].items())
+            print(f"{phase['phase']:>15}: {phase['throughput_rps']:7.1f} req/s, p95 {phase['p95_ms']:6.1f}ms, "
+                  f"{phase['errors']} errors, runs per agent port [{runs}]")
+        for problem in problems:
+            print(f"FAIL: {problem}")
+
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Simulation: adaptive (AIMD) concurrency against an upstream whose capacity changes.
+
+A fake provider stands in for a CLI whose upstream serves only
+`capacity` prompts at once. Past that, the extra runs fail the way
+rate-limited CLIs do ("429 Too Many Requests" on stderr) and the
+successful ones slow down as the upstream queues them. The capacity
+changes between phases, like upstream capacity over a day.
+
+Closed-loop clients keep the provider's ProviderQueue full. Its limit
+comes from an AIMDLimit, fed by record_result() as in the server, or is
+fixed with --fixed for comparison. Each interval reports capacity,
+limit, throughput and rate-limited runs. With --check, the exit status
+is 1 unless the limit tracked every phase's capacity and few runs hit
+the rate limit.
+
+Usage:
+    python benchmarks/simulate_adaptive.py
+    python benchmarks/simulate_adaptive.py --phases 8:3 2:3 12:3 --clients 48
+    python benchmarks/simulate_adaptive.py --fixed 16     # what a static limit does
+    python benchmarks/simulate_adaptive.py --check --json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from backend.adaptive import AIMDLimit  # noqa: E402
+from backend.providers.fake import FakeProvider  # noqa: E402
+from backend.scheduler import ProviderQueue, SchedulerError  # noqa: E402
+
+
+class CapacityLimitedProvider(FakeProvider):
+    """Inline fake provider backed by an upstream with limited, changing capacity."""
+
+    def __init__(self, latency: float):
+        super().__init__(latency=latency, output_bytes=64, chunks=1, error_rate=0, mode="inline")
+        self.capacity = 1
+        self.active = 0
+
+    async def execute(self, prompt: str, working_directory: Optional[str] = None) -> Dict[str, Any]:
+        """Answer like FakeProvider, unless the upstream is over capacity."""
+        start_time = time.time()
+        self.active += 1
+        try:
+            overload = self.active / self.capacity
+            if overload > 1 and random.random() < 1 - 1 / overload:
+                # Rejected quickly, as a rate-limited API does
+                await asyncio.sleep(self.latency * 0.1)
+                return {
+                    "success": False,
+                    "response": "",
+                    "error": "Error: 429 Too Many Requests - rate limit exceeded, retry later",
+                    "execution_time": time.time() - start_time
+                }
+            # Admitted runs queue upstream behind the excess
+            await asyncio.sleep(self.latency * max(1.0, overload))
+            return {
+                "success": True,
+                "response": prompt,
+                "error": None,
+                "execution_time": time.time() - start_time
+            }
+        finally:
+            self.active -= 1
+
+
+def parse_phase(value: str) -> tuple:
+    """Parse a CAPACITY:SECONDS phase."""
+    capacity, _, seconds = value.partition(":")
+    return int(capacity), float(seconds)
+
+
+async def simulate(args) -> Dict[str, Any]:
+    """Run the phases and collect per-interval samples."""
+    provider = CapacityLimitedProvider(args.latency)
+    adaptive = None
+    if args.fixed is None:
+        adaptive = AIMDLimit(
+            initial=args.initial,
+            minimum=1,
+            maximum=args.max_limit,
+            backoff=args.backoff,
+            latency_tolerance=args.latency_tolerance
+        )
+    queue = ProviderQueue(
+        max_concurrency=args.fixed or args.initial,
+        max_queue_size=args.clients,
+        queue_timeout=3600,
+        name="fake",
+        adaptive=adaptive
+    )
+
+    counts = {"ok": 0, "rate_limited": 0}
+    stop = False
+
+    async def client(index: int):
+        n = 0
+        while not stop:
+            try:
+                await queue.acquire()
+            except SchedulerError:
+                continue
+            start = time.monotonic()
+            try:
+                result = await provider.execute(f"client {index} prompt {n}")
+                queue.record_result(result["success"], result["execution_time"], result["error"])
+            finally:
+                queue.release(time.monotonic() - start)
+            counts["ok" if result["success"] else "rate_limited"] += 1
+            n += 1
+
+    tasks = [asyncio.ensure_future(client(i)) for i in range(args.clients)]
+    samples: List[Dict[str, Any]] = []
+    elapsed = 0.0
+    for phase_index, (capacity, seconds) in enumerate(args.phases):
+        provider.capacity = capacity
+        phase_end = elapsed + seconds
+        while elapsed < phase_end - 1e-9:
+            before = dict(counts)
+            await asyncio.sleep(args.interval)
+            elapsed += args.interval
+            samples.append({
+                "t": round(elapsed, 3),
+                "phase": phase_index,
+                "capacity": capacity,
+                "limit": queue.limit,
+                "in_flight": queue.in_flight,
+                "throughput": (counts["ok"] - before["ok"]) / args.interval,
+                "rate_limited": counts["rate_limited"] - before["rate_limited"],
+            })
+
+    stop = True
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    phases = []
+    for phase_index, (capacity, seconds) in enumerate(args.phases):
+        # Judge each phase by its second half, once the limit has had time to adjust
+        phase_samples = [s for s in samples if s["phase"] == phase_index]
+        settled = phase_samples[len(phase_samples) // 2:] or phase_samples
+        phases.append({
+            "capacity": capacity,
+            "seconds": seconds,
+            "mean_limit": statistics.mean(s["limit"] for s in settled),
+            "throughput": statistics.mean(s["throughput"] for s in settled),
+            "ideal_throughput": capacity / args.latency,
+            "rate_limited": sum(s["rate_limited"] for s in phase_samples),
+        })
+    total = counts["ok"] + counts["rate_limited"]
+    return {
+        "mode": "fixed" if args.fixed is not None else "adaptive",
+        "succeeded": counts["ok"],
+        "rate_limited": counts["rate_limited"],
+        "rate_limited_fraction": counts["rate_limited"] / total if total else 0.0,
+        "phases": phases,
+        "samples": samples,
+        "adaptive": adaptive.stats() if adaptive is not None else None,
+    }
+
+
+def check(result: Dict[str, Any], args) -> List[str]:
+    """Problems that make --check fail."""
+    problems = []
+    for index, phase in enumerate(result["phases"]):
+        low, high = phase["capacity"] * 0.4, phase["capacity"] * 1.6 + 1
+        if not low <= phase["mean_limit"] <= high:
+            problems.append(
+                f"phase {index}: mean limit {phase['mean_limit']:.1f} not within "
+                f"{low:.1f}-{high:.1f} of capacity {phase['capacity']}"
+            )
+    if result["rate_limited_fraction"] > args.max_rate_limited:
+        problems.append(
+            f"{result['rate_limited_fraction']:.1%} of runs were rate limited "
+            f"(allowed {args.max_rate_limited:.0%})"
+        )
+    return problems
+
+
+def main():
+    """Main entry point."""
+    parser = argparse.ArgumentParser(description="Simulate adaptive concurrency against a changing upstream")
+    parser.add_argument("--phases", type=parse_phase, nargs="+",
+                        default=[parse_phase(p) for p in ("8:4", "3:4", "12:4")],
+                        help="Upstream capacity and duration of each phase, as CAPACITY:SECONDS "
+                             "(default: 8:4 3:4 12:4)")
+    parser.add_argument("--clients", type=int, default=32,
+                        help="Closed-loop clients sending prompts (default: 32)")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="Seconds a prompt takes within capacity (default: 0.05)")
+    parser.add_argument("--interval", type=float, default=0.25,
+                        help="Seconds between samples (default: 0.25)")
+    parser.add_argument("--initial", type=int, default=4,
+                        help="Starting limit, as MAX_CONCURRENCY (default: 4)")
+    parser.add_argument("--max-limit", type=int, default=32,
+                        help="ADAPTIVE_MAX_CONCURRENCY (default: 32)")
+    parser.add_argument("--backoff", type=float, default=0.5,
+                        help="ADAPTIVE_BACKOFF (default: 0.5)")
+    parser.add_argument("--latency-tolerance", type=float, default=2.0,
+                        help="ADAPTIVE_LATENCY_TOLERANCE (default: 2)")
+    parser.add_argument("--fixed", type=int,
+                        help="Use this fixed limit instead of the adaptive one")
+    parser.add_argument("--max-rate-limited", type=float, default=0.15,
+                        help="With --check, the largest allowed fraction of rate-limited runs (default: 0.15)")
+    parser.add_argument("--check", action="store_true",
+                        help="Exit with status 1 if the limit didn't track the capacity")
+    parser.add_argument("--json", action="store_true",
+                        help="Print machine-readable JSON")
+    args = parser.parse_args()
+
+    result = asyncio.run(simulate(args))
+    problems = check(result, args) if args.check else []
+
+    if args.json:
+        print(json.dumps({**result, "problems": problems}, indent=2))
+    else:
+        print(f"{result['mode']} limit, {args.clients} clients, {args.latency * 1000:.0f}ms per prompt")
+        print(f"{'t':>6} {'capacity':>9} {'limit':>6} {'ok/s':>8} {'429s':>6}")
+        for s in result["samples"]:
+            print(f"{s['t']:>6.2f} {s['capacity']:>9} {s['limit']:>6} "
+                  f"{s['throughput']:>8.1f} {s['rate_limited']:>6}")
+        print()
+        for index, phase in enumerate(result["phases"]):
+            print(f"phase {index}: capacity {phase['capacity']}, mean limit {phase['mean_limit']:.1f}, "
+                  f"{phase['throughput']:.0f}/{phase['ideal_throughput']:.0f} ok/s, "
+                  f"{phase['rate_limited']} rate limited")
+        print(f"rate limited: {result['rate_limited']} of "
+              f"{result['succeeded'] + result['rate_limited']} runs "
+              f"({result['rate_limited_fraction']:.1%})")
+        for problem in problems:
+            print(f"FAIL: {problem}")
+
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
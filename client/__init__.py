@@ -0,0 +1,20 @@
+"""
+Python client for the API wrapper, blocking (Client) and asyncio (AsyncClient).
+
+Both keep a pool of keep-alive connections to the server, retry requests
+the server refused (429, 503) with jittered backoff that follows
+Retry-After, and offer map() to send many prompts with bounded
+concurrency.
+
+    from client import Client
+
+    with Client("http://localhost:5000", api_key="...") as api:
+        for result in api.map(["What is Python?", "What is Rust?"], provider="claude", concurrency=2):
+            print(result["response"])
+"""
+
+from .aio import AsyncClient
+from .base import APIError, RetryPolicy
+from .sync import Client
+
+__all__ = ["APIError", "AsyncClient", "Client", "RetryPolicy"]
@@ -0,0 +1,194 @@
+"""Asyncio client for the API wrapper."""
+
+import asyncio
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional
+
+import httpx
+
+from .base import (
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_MAX_CONNECTIONS,
+    DEFAULT_TIMEOUT,
+    DEFAULT_URL,
+    RETRYABLE_ERRORS,
+    Prompt,
+    RetryPolicy,
+    SSEParser,
+    api_error,
+    default_headers,
+    prompt_body,
+)
+
+
+class AsyncClient:
+    """
+    Asyncio client sharing one pool of keep-alive connections between calls and tasks.
+
+    Use it as an async context manager, or await close(), to close the connections.
+
+        async with AsyncClient("http://localhost:5000", api_key="...") as client:
+            async for event in client.stream("What is Python?"):
+                if event["type"] == "chunk":
+                    print(event["data"], end="")
+    """
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_URL,
+        api_key: Optional[str] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        retry: Optional[RetryPolicy] = None
+    ):
+        """
+        Args:
+            base_url: Server URL
+            api_key: Key sent as "Authorization: Bearer", when the server has API_KEYS
+            timeout: Seconds to wait for a response, or between chunks of a stream
+            connect_timeout: Seconds to wait for a connection
+            max_connections: Connections kept open to the server
+            retry: When to retry refused requests (default: RetryPolicy())
+        """
+        self.retry = retry or RetryPolicy()
+        self.max_connections = max_connections
+        self._http = httpx.AsyncClient(
+            base_url=base_url,
+            headers=default_headers(api_key),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+
+    async def __aenter__(self) -> "AsyncClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Close the pooled connections."""
+        await self._http.aclose()
+
+    async def _send(self, method: str, path: str, stream: bool = False, **kwargs) -> httpx.Response:
+        """
+        Send a request, retrying refusals and failed connections per the retry policy.
+
+        Raises:
+            APIError: for an error status that isn't retried, or once retries run out
+            httpx.HTTPError: for a connection that failed on the last attempt
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                request = self._http.build_request(method, path, **kwargs)
+                response = await self._http.send(request, stream=stream)
+            except RETRYABLE_ERRORS:
+                delay = self.retry.delay(attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            if response.status_code < 400:
+                return response
+
+            await response.aread()
+            await response.aclose()
+            error = api_error(response)
+            delay = self.retry.delay(attempt, error.retry_after) if error.status in self.retry.statuses else None
+            if delay is None:
+                raise error
+            await asyncio.sleep(delay)
+
+    async def ask(self, prompt: Prompt, provider: Optional[str] = None, **options) -> Dict[str, Any]:
+        """
+        Run a prompt with /api/ask.
+
+        Args:
+            prompt: Prompt text, or a dict of request fields
+            provider: Provider name; None uses the server's DEFAULT_PROVIDER
+            **options: Other request fields, e.g. session_id, fallback, output_format
+
+        Returns:
+            The response body; check "success", since a failed CLI run is not an error status
+
+        Raises:
+            APIError: if the request is refused or invalid
+        """
+        response = await self._send("POST", "/api/ask", json=prompt_body(prompt, provider, options))
+        return response.json()
+
+    async def stream(self, prompt: Prompt, provider: Optional[str] = None, **options) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run a prompt with /api/ask/stream, yielding its events as they arrive.
+
+        Refusals are retried before the stream starts; once output has been
+        sent nothing is retried. Leaving the loop early closes the
+        connection, which makes the server kill the CLI.
+
+        Yields:
+            Event dicts with a "type": "chunk" ({"data"}), "tool", and a final "done"
+
+        Raises:
+            APIError: if the request is refused or invalid
+        """
+        response = await self._send("POST", "/api/ask/stream", stream=True, json=prompt_body(prompt, provider, options))
+        try:
+            parser = SSEParser()
+            async for line in response.aiter_lines():
+                event = parser.feed(line)
+                if event is not None:
+                    yield event
+        finally:
+            await response.aclose()
+
+    async def providers(self, refresh: bool = False) -> List[Dict[str, Any]]:
+        """
+        List providers with /api/providers.
+
+        Args:
+            refresh: Check every provider now instead of using the cached status
+
+        Returns:
+            Provider entries with name, available, version, error, ...
+        """
+        response = await self._send("GET", "/api/providers", params={"refresh": "true"} if refresh else None)
+        return response.json()["providers"]
+
+    async def map(
+        self,
+        prompts: Iterable[Prompt],
+        provider: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        return_exceptions: bool = False,
+        **options
+    ) -> List[Any]:
+        """
+        Run many prompts with ask(), at most concurrency at a time.
+
+        Args:
+            prompts: Prompt texts or dicts of request fields
+            provider: Provider for every prompt that doesn't name its own
+            concurrency: Requests in flight at once (default: max_connections)
+            return_exceptions: Put an exception in the result list instead of raising it
+            **options: Request fields for every prompt that doesn't set them itself
+
+        Returns:
+            Responses in the order of prompts
+
+        Raises:
+            APIError: the first error, unless return_exceptions
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.max_connections)
+
+        async def run(prompt: Prompt):
+            async with semaphore:
+                return await self.ask(prompt, provider, **options)
+
+        tasks = [asyncio.ensure_future(run(prompt)) for prompt in prompts]
+        try:
+            return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+        finally:
+            # After an error, the other prompts are cancelled rather than left running
+            for task in tasks:
+                task.cancel()
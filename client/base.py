@@ -0,0 +1,175 @@
+"""Pieces shared by the sync and asyncio clients: errors, retries, request bodies and SSE parsing."""
+
+import json
+import random
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, Optional, Union
+
+import httpx
+
+
+DEFAULT_URL = "http://localhost:5000"
+
+# Seconds to wait for a response: the server's default EXECUTION_TIMEOUT plus
+# QUEUE_TIMEOUT, so a slow run times out on the server before it does here
+DEFAULT_TIMEOUT = 660.0
+DEFAULT_CONNECT_TIMEOUT = 10.0
+
+# Connections kept open per client; map() runs at most this many requests at once
+DEFAULT_MAX_CONNECTIONS = 16
+
+# A prompt for ask() and map(): the prompt text, or the fields of a request body
+Prompt = Union[str, Dict[str, Any]]
+
+
+class APIError(Exception):
+    """Raised when the server answers with an error status."""
+
+    def __init__(self, status: int, detail: str, retry_after: Optional[float] = None):
+        """
+        Args:
+            status: HTTP status code
+            detail: The server's error message
+            retry_after: Seconds from the Retry-After header, if any
+        """
+        super().__init__(f"{status}: {detail}")
+        self.status = status
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+@dataclass
+class RetryPolicy:
+    """
+    When and how long to wait before sending a refused request again.
+
+    The server refuses with 429 (queue full, rate limit) or 503 (queue
+    timeout, circuit breaker open) before running anything, so those are
+    safe to retry, as are connections that couldn't be made. Waits follow
+    the Retry-After header when there is one, otherwise exponential
+    backoff, and are jittered so many clients don't retry in step.
+
+    Attributes:
+        retries: Retries after the first attempt; 0 disables retrying
+        backoff: Base wait in seconds, doubled on every retry
+        max_backoff: Longest wait in seconds; a longer Retry-After is not waited for
+        statuses: HTTP statuses that are retried
+    """
+
+    retries: int = 3
+    backoff: float = 0.5
+    max_backoff: float = 60.0
+    statuses: tuple = (429, 503)
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> Optional[float]:
+        """
+        Seconds to wait before the next attempt.
+
+        Args:
+            attempt: Number of attempts made so far (1 after the first)
+            retry_after: Seconds the server asked to wait, if it did
+
+        Returns:
+            The wait, or None if the request shouldn't be retried
+        """
+        if attempt > self.retries:
+            return None
+        if retry_after is not None:
+            if retry_after > self.max_backoff:
+                return None
+            # Spread out clients that were all told the same time
+            return retry_after + random.uniform(0, self.backoff)
+        # Full jitter: anywhere up to the exponential backoff
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+
+# Connection failures where the request never reached the server
+RETRYABLE_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def retry_after(response: httpx.Response) -> Optional[float]:
+    """Seconds from a response's Retry-After header, if it has one in seconds."""
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None  # An HTTP date; the server only sends seconds
+
+
+def api_error(response: httpx.Response) -> APIError:
+    """APIError for an error response, read after the body has been loaded."""
+    try:
+        body = response.json()
+        detail = body.get("detail", response.text) if isinstance(body, dict) else body
+    except ValueError:
+        detail = response.text
+    return APIError(response.status_code, str(detail), retry_after(response))
+
+
+def default_headers(api_key: Optional[str]) -> Dict[str, str]:
+    """Headers sent with every request."""
+    return {"Authorization": f"Bearer {api_key}"} if api_key else {}
+
+
+def prompt_body(prompt: Prompt, provider: Optional[str], options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Request body for /api/ask or /api/ask/stream.
+
+    Args:
+        prompt: Prompt text, or a dict of request fields
+        provider: Provider for a prompt that doesn't name its own; None
+            leaves it to the server's default
+        options: Other request fields (session_id, fallback, output_format, ...)
+            for a prompt that doesn't set them itself
+    """
+    body = dict(prompt) if isinstance(prompt, dict) else {"prompt": prompt}
+    if provider is not None:
+        body.setdefault("provider", provider)
+    for key, value in options.items():
+        body.setdefault(key, value)
+    return body
+
+
+class SSEParser:
+    """Incremental parser for the server's Server-Sent Events, one line at a time."""
+
+    def __init__(self):
+        self._event = "message"
+        self._data = []
+
+    def feed(self, line: str) -> Optional[Dict[str, Any]]:
+        """
+        Take one line of the stream.
+
+        Returns:
+            The event the line completes, if it is the blank line ending one
+        """
+        line = line.rstrip("\r\n")
+        if line:
+            field, _, value = line.partition(":")
+            if value.startswith(" "):
+                value = value[1:]
+            if field == "event":
+                self._event = value
+            elif field == "data":
+                self._data.append(value)
+            return None
+        if not self._data:
+            return None
+        event = {"type": self._event, **json.loads("\n".join(self._data))}
+        self._event, self._data = "message", []
+        return event
+
+
+def parse_sse(lines: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Events of a text/event-stream response.
+
+    Yields:
+        The JSON data of each event, with the event name added as "type"
+    """
+    parser = SSEParser()
+    for line in lines:
+        event = parser.feed(line)
+        if event is not None:
+            yield event
@@ -0,0 +1,189 @@
+"""Blocking client for the API wrapper."""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import httpx
+
+from .base import (
+    DEFAULT_CONNECT_TIMEOUT,
+    DEFAULT_MAX_CONNECTIONS,
+    DEFAULT_TIMEOUT,
+    DEFAULT_URL,
+    RETRYABLE_ERRORS,
+    Prompt,
+    RetryPolicy,
+    api_error,
+    default_headers,
+    parse_sse,
+    prompt_body,
+)
+
+
+class Client:
+    """
+    Blocking client sharing one pool of keep-alive connections between calls and threads.
+
+    Use it as a context manager, or call close(), to close the connections.
+
+        with Client("http://localhost:5000", api_key="...") as client:
+            print(client.ask("What is Python?", provider="claude")["response"])
+    """
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_URL,
+        api_key: Optional[str] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        retry: Optional[RetryPolicy] = None
+    ):
+        """
+        Args:
+            base_url: Server URL
+            api_key: Key sent as "Authorization: Bearer", when the server has API_KEYS
+            timeout: Seconds to wait for a response, or between chunks of a stream
+            connect_timeout: Seconds to wait for a connection
+            max_connections: Connections kept open to the server
+            retry: When to retry refused requests (default: RetryPolicy())
+        """
+        self.retry = retry or RetryPolicy()
+        self.max_connections = max_connections
+        self._http = httpx.Client(
+            base_url=base_url,
+            headers=default_headers(api_key),
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+
+    def __enter__(self) -> "Client":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the pooled connections."""
+        self._http.close()
+
+    def _send(self, method: str, path: str, stream: bool = False, **kwargs) -> httpx.Response:
+        """
+        Send a request, retrying refusals and failed connections per the retry policy.
+
+        Raises:
+            APIError: for an error status that isn't retried, or once retries run out
+            httpx.HTTPError: for a connection that failed on the last attempt
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                request = self._http.build_request(method, path, **kwargs)
+                response = self._http.send(request, stream=stream)
+            except RETRYABLE_ERRORS:
+                delay = self.retry.delay(attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            if response.status_code < 400:
+                return response
+
+            response.read()
+            response.close()
+            error = api_error(response)
+            delay = self.retry.delay(attempt, error.retry_after) if error.status in self.retry.statuses else None
+            if delay is None:
+                raise error
+            time.sleep(delay)
+
+    def ask(self, prompt: Prompt, provider: Optional[str] = None, **options) -> Dict[str, Any]:
+        """
+        Run a prompt with /api/ask.
+
+        Args:
+            prompt: Prompt text, or a dict of request fields
+            provider: Provider name; None uses the server's DEFAULT_PROVIDER
+            **options: Other request fields, e.g. session_id, fallback, output_format
+
+        Returns:
+            The response body; check "success", since a failed CLI run is not an error status
+
+        Raises:
+            APIError: if the request is refused or invalid
+        """
+        return self._send("POST", "/api/ask", json=prompt_body(prompt, provider, options)).json()
+
+    def stream(self, prompt: Prompt, provider: Optional[str] = None, **options) -> Iterator[Dict[str, Any]]:
+        """
+        Run a prompt with /api/ask/stream, yielding its events as they arrive.
+
+        Refusals are retried before the stream starts; once output has been
+        sent nothing is retried.
+
+        Yields:
+            Event dicts with a "type": "chunk" ({"data"}), "tool", and a final "done"
+
+        Raises:
+            APIError: if the request is refused or invalid
+        """
+        response = self._send("POST", "/api/ask/stream", stream=True, json=prompt_body(prompt, provider, options))
+        try:
+            yield from parse_sse(response.iter_lines())
+        finally:
+            response.close()
+
+    def providers(self, refresh: bool = False) -> List[Dict[str, Any]]:
+        """
+        List providers with /api/providers.
+
+        Args:
+            refresh: Check every provider now instead of using the cached status
+
+        Returns:
+            Provider entries with name, available, version, error, ...
+        """
+        response = self._send("GET", "/api/providers", params={"refresh": "true"} if refresh else None)
+        return response.json()["providers"]
+
+    def map(
+        self,
+        prompts: Iterable[Prompt],
+        provider: Optional[str] = None,
+        concurrency: Optional[int] = None,
+        return_exceptions: bool = False,
+        **options
+    ) -> List[Any]:
+        """
+        Run many prompts with ask(), at most concurrency at a time.
+
+        Args:
+            prompts: Prompt texts or dicts of request fields
+            provider: Provider for every prompt that doesn't name its own
+            concurrency: Requests in flight at once (default: max_connections)
+            return_exceptions: Put an exception in the result list instead of raising it
+            **options: Request fields for every prompt that doesn't set them itself
+
+        Returns:
+            Responses in the order of prompts
+
+        Raises:
+            APIError: the first error, unless return_exceptions
+        """
+        def run(prompt: Prompt):
+            try:
+                return self.ask(prompt, provider, **options)
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                return e
+
+        executor = ThreadPoolExecutor(max_workers=concurrency or self.max_connections)
+        try:
+            futures = [executor.submit(run, prompt) for prompt in prompts]
+            return [future.result() for future in futures]
+        finally:
+            # After an error, prompts that haven't started yet aren't sent
+            executor.shutdown(cancel_futures=True)
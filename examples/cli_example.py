@@ -10,28 +10,32 @@ Usage:
 """
 
 import argparse
-import requests
 import sys
-import json
 import os
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from client import APIError, Client  # noqa: E402
 
 API_URL = os.getenv("API_URL", "http://localhost:5000")
+API_KEY = os.getenv("API_KEY")
+
+# One client for the whole run, so prompts reuse its connection
+api = Client(API_URL, api_key=API_KEY)
 
 
 def list_providers() -> bool:
     """List all available providers."""
     try:
-        response = requests.get(f"{API_URL}/api/providers")
-
-        if response.status_code != 200:
-            print(f"Error: {response.text}", file=sys.stderr)
-            return False
+        providers = api.providers()
 
-        data = response.json()
         print("\nAvailable Providers:")
         print("-" * 60)
 
-        for provider in data["providers"]:
+        for provider in providers:
             status = "[OK] Available" if provider["available"] else "[NG] Not Available"
             version = f" (v{provider['version']})" if provider["version"] else ""
             print(f"  - {provider['display_name']:<20} [{provider['name']}] {status}{version}")
@@ -42,7 +46,10 @@ def list_providers() -> bool:
         print("-" * 60)
         return True
 
-    except requests.exceptions.ConnectionError:
+    except APIError as e:
+        print(f"Error: {e.detail}", file=sys.stderr)
+        return False
+    except httpx.ConnectError:
         print(f"Error: Cannot connect to API at {API_URL}", file=sys.stderr)
         return False
     except Exception as e:
@@ -50,32 +57,25 @@ def list_providers() -> bool:
         return False
 
 
-def ask_provider(prompt: str, provider: str = None) -> str:
-    """Ask a provider and return the response."""
+def ask_provider(prompt: str, provider: str = None):
+    """Ask a provider and print the response as it arrives."""
     try:
-        payload = {"prompt": prompt}
-        if provider:
-            payload["provider"] = provider
-
-        response = requests.post(
-            f"{API_URL}/api/ask",
-            json=payload
-        )
-
-        if response.status_code != 200:
-            return f"Error: {response.text}"
-
-        data = response.json()
-
-        if data["success"]:
-            return data["response"]
-        else:
-            return f"Error: {data.get('error', 'Unknown error')}"
-
-    except requests.exceptions.ConnectionError:
-        return f"Error: Cannot connect to API at {API_URL}"
+        output = ""
+        for event in api.stream(prompt, provider):
+            if event["type"] == "chunk":
+                output = event["data"]
+                print(output, end="", flush=True)
+            elif event["type"] == "done" and not event["success"]:
+                print(f"Error: {event.get('error') or 'Unknown error'}")
+        if output and not output.endswith("\n"):
+            print()
+
+    except APIError as e:
+        print(f"Error: {e.detail}")
+    except httpx.ConnectError:
+        print(f"Error: Cannot connect to API at {API_URL}")
     except Exception as e:
-        return f"Error: {str(e)}"
+        print(f"Error: {str(e)}")
 
 
 def interactive_mode(default_provider: str = None):
@@ -98,7 +98,7 @@ def interactive_mode(default_provider: str = None):
                 continue
 
             print("\nResponse:")
-            print(ask_provider(prompt, default_provider))
+            ask_provider(prompt, default_provider)
 
         except KeyboardInterrupt:
             print("\nGoodbye!")
@@ -141,7 +141,7 @@ def main():
         return
 
     if args.prompt:
-        print(ask_provider(args.prompt, args.provider))
+        ask_provider(args.prompt, args.provider)
     else:
         parser.print_help()
 
@@ -1,26 +1,112 @@
 """Multi-provider CLI API wrapper using FastAPI."""
 
 import os
+import json
+import time
 import asyncio
 from pathlib import Path
+from typing import AsyncIterator, Optional
+from contextlib import asynccontextmanager
+from pydantic import ValidationError
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, StreamingResponse
 
 from backend.config import config
-from backend.models import PromptRequest, PromptResponse, ProviderInfo, ProvidersListResponse
+from backend.models import (
+    PromptRequest,
+    PromptResponse,
+    BatchRequest,
+    BatchItemResponse,
+    BatchResponse,
+    JobResponse,
+    ProviderInfo,
+    ProvidersListResponse,
+    RemoteWorkerInfo,
+    RemoteWorkersResponse,
+    SchedulerStatsResponse,
+    RoutingStatsResponse,
+    SessionCreateRequest,
+    SessionResponse,
+    SessionListResponse,
+    UsageResponse,
+    WorkspaceInfo,
+    WorkspacesListResponse,
+)
 from backend.providers import registry
+from backend.providers.remote import remote_cluster
+from backend.cache import response_cache, prompt_key
+from backend.singleflight import SingleFlight
+from backend.jobs import job_manager
+from backend.scheduler import scheduler, SchedulerError, QueueFullError, BATCH, INTERACTIVE
+from backend.routing import router
+from backend.sessions import SessionConflictError, session_manager
+from backend.workspaces import workspace_manager
+from backend.artifacts import PURGE_INTERVAL, artifact_store
+from backend.providers.output import JSON, TEXT
+from backend.quota import (
+    APIKeyMiddleware,
+    RateLimitError,
+    api_keys,
+    batch_clients,
+    current_client,
+    rate_limiter,
+    usage_admins,
+    usage_tracker,
+)
+from backend.metrics import metrics, CACHE_HITS, POOL_IDLE_WORKERS, REQUESTS, TIMEOUTS
 
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run background work (remote workers, availability refresh, worker pools, workspaces, jobs, usage, artifacts) while the app runs."""
+    if remote_cluster is not None:
+        await remote_cluster.start()
+        registry.start_remote(remote_cluster)
+    refresh_task = asyncio.create_task(
+        registry.refresh_periodically(config.AVAILABILITY_REFRESH_INTERVAL)
+    )
+    usage_task = asyncio.create_task(
+        usage_tracker.flush_periodically(config.USAGE_FLUSH_INTERVAL)
+    )
+    artifacts_task = asyncio.create_task(artifact_store.purge_periodically(PURGE_INTERVAL))
+    registry.start_pools()
+    workspace_manager.start()
+    session_manager.store.purge(config.SESSION_RETENTION)
+    job_manager.start(ask_llm_safe)
+    try:
+        yield
+    finally:
+        refresh_task.cancel()
+        usage_task.cancel()
+        artifacts_task.cancel()
+        await job_manager.stop()
+        await registry.close_pools()
+        await workspace_manager.close()
+        if remote_cluster is not None:
+            await remote_cluster.close()
+        usage_tracker.flush()
+
+
 app = FastAPI(
     title="Multi-Provider CLI API Wrapper",
     description="Universal CLI API wrapper supporting multiple LLM providers",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
+# Identical executions currently running, shared between callers
+inflight = SingleFlight()
+
+# Seconds between checks for a client that has gone away
+DISCONNECT_POLL_INTERVAL = 1.0
+
+# API keys (added first so CORS wraps it and 401s carry CORS headers)
+app.add_middleware(APIKeyMiddleware, keys=api_keys)
+
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -31,40 +117,1120 @@ app.add_middleware(
 )
 
 
+def get_provider_or_404(provider_name: str):
+    """
+    Look up a provider by name.
+
+    Raises:
+        HTTPException: 404 if the provider is not registered
+    """
+    provider = registry.get(provider_name)
+    if not provider:
+        available = ", ".join(registry.list_all().keys())
+        raise HTTPException(
+            status_code=404,
+            detail=f"Provider '{provider_name}' not found. Available: {available}"
+        )
+    return provider
+
+
+def unavailable_error(provider_name: str) -> Optional[str]:
+    """
+    Return an error message if the provider was recently found to be down.
+
+    Only uses the cached availability result, so no process is spawned.
+    Returns None when FAIL_FAST_UNAVAILABLE is off or the result is stale.
+    """
+    if not config.FAIL_FAST_UNAVAILABLE:
+        return None
+    status = registry.cached_status(provider_name)
+    if status is None or status["available"] or status["age"] > config.AVAILABILITY_TTL:
+        return None
+    return f"Provider '{provider_name}' is unavailable: {status['error'] or 'check failed'}"
+
+
+def execution_timeout(provider_name: str, request: PromptRequest) -> float:
+    """
+    Seconds the CLI may run: the request's timeout, capped at the
+    provider's MAX_EXECUTION_TIMEOUT, else the provider's EXECUTION_TIMEOUT.
+    """
+    if request.timeout is not None:
+        return min(
+            request.timeout,
+            config.for_provider(provider_name, "MAX_EXECUTION_TIMEOUT", config.MAX_EXECUTION_TIMEOUT)
+        )
+    return config.for_provider(provider_name, "EXECUTION_TIMEOUT", config.EXECUTION_TIMEOUT)
+
+
+def timeout_result(timeout: float) -> dict:
+    """execute()-shaped result for a run that was killed at its timeout."""
+    return {
+        "success": False,
+        "response": "",
+        "error": f"Execution timed out after {timeout:g}s",
+        "execution_time": timeout,
+        "timed_out": True
+    }
+
+
+def caller_fault(provider_name: str, result: dict, timeout: float) -> bool:
+    """
+    Whether a run failed because of the request rather than the provider.
+
+    That is a run killed at a timeout shorter than the provider's
+    EXECUTION_TIMEOUT, or one whose working directory doesn't exist.
+    Such runs don't count against the provider's circuit breaker or
+    routing health, so one client can't take a provider down for the others.
+    """
+    if result["success"]:
+        return False
+    if result.get("caller_error"):
+        return True
+    default = config.for_provider(provider_name, "EXECUTION_TIMEOUT", config.EXECUTION_TIMEOUT)
+    return bool(result.get("timed_out")) and timeout < default
+
+
+def check_run_options(request: PromptRequest):
+    """
+    Validate request.workspace and request.output_format.
+
+    Raises:
+        HTTPException: 404 if the workspace isn't configured, 400 if the
+            request also sets working_directory or session_id, or asks for
+            JSON output in a session
+    """
+    if request.session_id and request.output_format != TEXT:
+        raise HTTPException(status_code=400, detail="Sessions only support output_format 'text'")
+    if not request.workspace:
+        return
+    if workspace_manager.get(request.workspace) is None:
+        available = ", ".join(workspace_manager.pools) or "none"
+        raise HTTPException(
+            status_code=404,
+            detail=f"Workspace '{request.workspace}' not found. Available: {available}"
+        )
+    if request.working_directory or request.session_id:
+        raise HTTPException(
+            status_code=400,
+            detail="workspace can't be combined with working_directory or session_id"
+        )
+
+
+@asynccontextmanager
+async def lease_workspace(request: PromptRequest) -> AsyncIterator[Optional[str]]:
+    """
+    Working directory to run a request in.
+
+    Yields a leased copy of request.workspace, which is reset afterwards,
+    or request.working_directory when no workspace is set.
+    """
+    if not request.workspace:
+        yield request.working_directory
+        return
+    async with workspace_manager.get(request.workspace).lease() as path:
+        yield path
+
+
+async def execute_request(provider, request: PromptRequest) -> dict:
+    """
+    Run a request on a provider, in a workspace copy if it names one.
+
+    Uses execute(), or execute_json() for output_format "json".
+    """
+    async with lease_workspace(request) as working_directory:
+        if request.output_format == JSON:
+            result = await provider.execute_json(request.prompt, working_directory)
+        else:
+            result = await provider.execute(request.prompt, working_directory)
+        if request.workspace and request.return_diff:
+            result = {**result, "diff": await workspace_manager.diff(request.workspace, working_directory)}
+    return result
+
+
+def request_priority(request: PromptRequest) -> str:
+    """Priority class of a request: its own, else batch for API_BATCH_KEYS clients, else interactive."""
+    if request.priority:
+        return request.priority
+    return BATCH if current_client.get() in batch_clients else INTERACTIVE
+
+
+async def execute_in_slot(provider_name: str, execution, timeout: float, priority: str = INTERACTIVE) -> dict:
+    """
+    Run an execution once a concurrency slot is free, killing it after timeout.
+
+    Args:
+        provider_name: Provider whose slot to take
+        execution: Function returning the provider coroutine to await
+        timeout: Seconds the CLI may run
+        priority: Priority class to wait in; the calling client is the tenant
+
+    Raises:
+        SchedulerError: if the provider's circuit breaker is open, it is
+            over its rate limit or its queue refuses the request
+    """
+    breaker = registry.get(provider_name).breaker
+    probe = breaker.acquire() if breaker is not None else False
+    recorded = False
+    try:
+        rate_limiter.check_provider(provider_name)
+        async with scheduler.slot(provider_name, priority, current_client.get()):
+            try:
+                result = await asyncio.wait_for(execution(), timeout)
+            except asyncio.TimeoutError:
+                TIMEOUTS.inc(provider=provider_name)
+                result = timeout_result(timeout)
+            # While the slot is held, so the adaptive limit sees this run as in flight
+            scheduler.queue(provider_name).record_result(
+                result["success"], result["execution_time"], result.get("error")
+            )
+        fault = caller_fault(provider_name, result, timeout)
+        if breaker is not None and not fault:
+            breaker.record(result["success"], probe)
+            recorded = True
+    finally:
+        if breaker is not None and not recorded:
+            breaker.abandon(probe)
+    if not fault:
+        router.record(provider_name, result["success"], result["execution_time"])
+    return result
+
+
+async def run_prompt(provider_name: str, provider, request: PromptRequest) -> dict:
+    """
+    Execute a prompt under the scheduler and store the result in the cache.
+
+    Identical concurrent requests (same provider, prompt, working
+    directory, output format, timeout and priority) share a single
+    execution when COALESCE_REQUESTS is enabled.
+    The CLI is killed if it runs past its timeout. Workspace runs are
+    neither cached nor shared, since each works on its own copy.
+
+    Returns:
+        An execute() result, plus "coalesced" for callers that joined
+        another caller's execution
+
+    Raises:
+        SchedulerError: if the provider's queue refuses the request
+    """
+    timeout = execution_timeout(provider_name, request)
+    priority = request_priority(request)
+
+    async def execute():
+        result = await execute_in_slot(
+            provider_name,
+            lambda: execute_request(provider, request),
+            timeout,
+            priority
+        )
+        if not request.workspace:
+            response_cache.set(
+                provider_name,
+                request.prompt,
+                request.working_directory,
+                result,
+                ttl=request.cache_ttl,
+                output_format=request.output_format
+            )
+        return result
+
+    if not config.COALESCE_REQUESTS or request.workspace:
+        return await execute()
+    # A caller only joins a run with its own time limit and priority, so a short
+    # timeout or a batch slot can't leak into another caller's request
+    key = prompt_key(provider_name, request.prompt, request.working_directory, request.output_format)
+    result, leader = await inflight.do(f"{key}:{timeout:g}:{priority}", execute)
+    return result if leader else {**result, "coalesced": True}
+
+
+async def run_until_disconnected(raw_request: Optional[Request], coro):
+    """
+    Await coro, cancelling it if the HTTP client disconnects first.
+
+    Cancelling reaches the CLI through run_prompt(), so its process group
+    is killed instead of running on for nobody.
+
+    Returns:
+        (result, disconnected); result is None if the client disconnected
+    """
+    if raw_request is None:
+        return await coro, False
+
+    task = asyncio.ensure_future(coro)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+        if done:
+            return task.result(), False
+        if await raw_request.is_disconnected():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            return None, True
+
+
+def scheduler_http_error(error: SchedulerError) -> HTTPException:
+    """Map a refusal to 429 (queue full, rate limit) or 503 (queue timeout) with Retry-After."""
+    return HTTPException(
+        status_code=429 if isinstance(error, (QueueFullError, RateLimitError)) else 503,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+async def with_deadline(events, timeout: float, provider_name: str):
+    """
+    Relay execute_stream() events, ending with a timeout "done" event at the deadline.
+
+    Stopping the provider's stream kills the CLI's process group.
+    """
+    deadline = time.monotonic() + timeout
+    pending = None
+    try:
+        while True:
+            pending = asyncio.ensure_future(events.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=max(deadline - time.monotonic(), 0))
+            if not done:
+                TIMEOUTS.inc(provider=provider_name)
+                result = timeout_result(timeout)
+                yield {"type": "done", **{key: value for key, value in result.items() if key != "response"}}
+                return
+            try:
+                event = pending.result()
+            except StopAsyncIteration:
+                return
+            pending = None
+            yield event
+    finally:
+        # The provider's generator must be idle before it can be closed
+        if pending is not None and not pending.done():
+            pending.cancel()
+            await asyncio.gather(pending, return_exceptions=True)
+        await events.aclose()
+
+
+def check_client_rate_limit():
+    """
+    Take a token from the calling client's rate limit.
+
+    Raises:
+        HTTPException: 429 if the client is over its limit
+    """
+    try:
+        rate_limiter.check_client(current_client.get())
+    except RateLimitError as e:
+        raise scheduler_http_error(e)
+
+
+def utf8_len(text: str) -> int:
+    """Size of text in UTF-8 bytes."""
+    return len(text.encode("utf-8"))
+
+
+def response_size(result: dict) -> int:
+    """Size of a result's output in bytes, including any part left in an artifact."""
+    return result.get("output_bytes") or utf8_len(result["response"])
+
+
+def record_usage(provider_name: str, prompt: str, response_bytes: int, cli_seconds: Optional[float]):
+    """Count an answered request against the calling client."""
+    usage_tracker.record(
+        current_client.get(),
+        provider_name,
+        utf8_len(prompt),
+        response_bytes,
+        cli_seconds or 0.0
+    )
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Format a single Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def ask_provider(provider_name: str, request: PromptRequest) -> dict:
+    """
+    Run a prompt on one provider, serving it from the cache when possible.
+
+    Returns:
+        An execute() result, plus "cached" for cache hits or "coalesced"
+        for requests that shared another request's execution
+
+    Raises:
+        SchedulerError: if the provider's queue refuses the request
+    """
+    # Don't spawn a process for a provider known to be down
+    error = unavailable_error(provider_name)
+    if error:
+        return {"success": False, "response": "", "error": error, "execution_time": 0.0}
+
+    # Serve identical earlier prompts from the cache
+    if not request.bypass_cache and not request.workspace:
+        cached = response_cache.get(
+            provider_name, request.prompt, request.working_directory, request.output_format
+        )
+        if cached:
+            CACHE_HITS.inc(provider=provider_name)
+            return {**cached, "cached": True}
+
+    # Execute the prompt once a concurrency slot is free
+    return await run_prompt(provider_name, registry.get(provider_name), request)
+
+
+def route_candidates(request: PromptRequest) -> list:
+    """
+    Providers a request may run on: its provider, then its fallback list.
+
+    Raises:
+        HTTPException: 404 if any of them is unknown
+    """
+    candidates = [request.provider or config.DEFAULT_PROVIDER]
+    for name in request.fallback or []:
+        if name not in candidates:
+            candidates.append(name)
+    for name in candidates:
+        get_provider_or_404(name)
+    return candidates
+
+
 @app.post("/api/ask", response_model=PromptResponse)
-async def ask_llm(request: PromptRequest):
+async def ask_llm(request: PromptRequest, raw_request: Request = None):
     """
     Send prompt to specified provider.
 
+    With request.session_id, the prompt continues that session instead.
+    Otherwise, if the provider fails, the providers in request.fallback
+    are tried in order; with request.hedge_delay, a fallback is also started when the
+    first provider hasn't answered within that many seconds, and the
+    slower of the two is cancelled.
+
     Args:
         request: PromptRequest with provider, prompt, and optional working_directory
+        raw_request: The HTTP request, used to stop the CLI if the client disconnects
 
     Returns:
-        PromptResponse with success status and response/error
+        PromptResponse with success status and response/error; provider is
+        the one that produced the response
     """
-    # Determine which provider to use
-    provider_name = request.provider or config.DEFAULT_PROVIDER
+    check_client_rate_limit()
+    check_run_options(request)
+    if request.session_id:
+        return await ask_session(request, raw_request)
 
-    # Get the provider
-    provider = registry.get(provider_name)
-    if not provider:
-        available = ", ".join(registry.list_all().keys())
-        raise HTTPException(
-            status_code=404,
-            detail=f"Provider '{provider_name}' not found. Available: {available}"
+    candidates = route_candidates(request)
+    REQUESTS.inc(provider=candidates[0])
+
+    try:
+        routed, disconnected = await run_until_disconnected(
+            raw_request,
+            router.run(
+                candidates,
+                lambda name: ask_provider(name, request),
+                request.hedge_delay
+            )
         )
+    except SchedulerError as e:
+        raise scheduler_http_error(e)
 
-    # Execute the prompt
-    result = await provider.execute(request.prompt, request.working_directory)
+    if disconnected:
+        # Nobody is listening; this response is never delivered
+        return PromptResponse(
+            success=False,
+            provider=candidates[0],
+            response="",
+            error="Client disconnected"
+        )
 
+    provider_name, result = routed
+    record_usage(
+        provider_name,
+        request.prompt,
+        response_size(result),
+        # Only the caller whose request started the CLI is charged for its time
+        0.0 if result.get("cached") or result.get("coalesced") else result["execution_time"]
+    )
     return PromptResponse(
         provider=provider_name,
         **result
     )
 
 
+def get_session_or_404(session_id: str) -> dict:
+    """
+    Get session by id or raise 404.
+
+    Raises:
+        HTTPException: If session not found
+    """
+    session = session_manager.store.get(session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found")
+    return session
+
+
+def session_provider(request: PromptRequest) -> str:
+    """
+    Provider of the session a request continues.
+
+    Raises:
+        HTTPException: 404 if the session or its provider doesn't exist,
+            400 if the request names a different provider
+    """
+    session = get_session_or_404(request.session_id)
+    if request.provider and request.provider != session["provider"]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Session '{session['id']}' belongs to provider '{session['provider']}'"
+        )
+    get_provider_or_404(session["provider"])
+    return session["provider"]
+
+
+async def ask_session(request: PromptRequest, raw_request: Optional[Request]) -> PromptResponse:
+    """
+    Run the next turn of a session.
+
+    Turns of one session run one at a time. They are never cached,
+    coalesced or routed to another provider, since the reply depends on
+    the conversation so far.
+    """
+    provider_name = session_provider(request)
+    provider = registry.get(provider_name)
+    REQUESTS.inc(provider=provider_name)
+
+    error = unavailable_error(provider_name)
+    if error:
+        return PromptResponse(
+            success=False,
+            provider=provider_name,
+            response="",
+            error=error,
+            execution_time=0.0,
+            session_id=request.session_id
+        )
+
+    timeout = execution_timeout(provider_name, request)
+
+    async def run_turn():
+        async with session_manager.lock(request.session_id):
+            # Re-read: turns may have been added while waiting for the lock
+            session = get_session_or_404(request.session_id)
+            result = await execute_in_slot(
+                provider_name,
+                lambda: session_manager.execute(provider, session, request.prompt),
+                timeout,
+                request_priority(request)
+            )
+            if result["success"]:
+                try:
+                    session_manager.record_turn(session["id"], request.prompt, result["response"])
+                except SessionConflictError as e:
+                    raise HTTPException(status_code=409, detail=str(e))
+            return result
+
+    try:
+        result, disconnected = await run_until_disconnected(raw_request, run_turn())
+    except SchedulerError as e:
+        raise scheduler_http_error(e)
+
+    if disconnected:
+        return PromptResponse(
+            success=False,
+            provider=provider_name,
+            response="",
+            error="Client disconnected",
+            session_id=request.session_id
+        )
+
+    record_usage(provider_name, request.prompt, response_size(result), result["execution_time"])
+    return PromptResponse(provider=provider_name, session_id=request.session_id, **result)
+
+
+async def session_events(request: PromptRequest) -> AsyncIterator[dict]:
+    """Start the next turn of a session, streaming its events like stream_events()."""
+    provider_name = session_provider(request)
+    provider = registry.get(provider_name)
+    REQUESTS.inc(provider=provider_name)
+
+    lock = session_manager.lock(request.session_id)
+    await lock.acquire()
+    queue = scheduler.queue(provider_name)
+    breaker = provider.breaker
+    probe = False
+    try:
+        if breaker is not None:
+            probe = breaker.acquire()
+        rate_limiter.check_provider(provider_name)
+        await queue.acquire(request_priority(request), current_client.get())
+    except BaseException as e:
+        if breaker is not None:
+            breaker.abandon(probe)
+        lock.release()
+        if isinstance(e, SchedulerError):
+            raise scheduler_http_error(e)
+        raise
+
+    timeout = execution_timeout(provider_name, request)
+
+    async def event_stream():
+        start = time.monotonic()
+        chunks = []
+        recorded = False
+        try:
+            session = get_session_or_404(request.session_id)
+            events = with_deadline(
+                session_manager.execute_stream(provider, session, request.prompt),
+                timeout,
+                provider_name
+            )
+            async for event in events:
+                event_type = event.pop("type")
+                if event_type == "chunk":
+                    chunks.append(event["data"])
+                if event_type == "done":
+                    queue.record_result(event["success"], event["execution_time"], event.get("error"))
+                    # Left unrecorded, a caller's fault leaves the breaker to abandon() below
+                    if not caller_fault(provider_name, event, timeout):
+                        router.record(provider_name, event["success"], event["execution_time"])
+                        if breaker is not None:
+                            breaker.record(event["success"], probe)
+                            recorded = True
+                    record_usage(provider_name, request.prompt, utf8_len("".join(chunks)), event["execution_time"])
+                    if event["success"]:
+                        try:
+                            session_manager.record_turn(session["id"], request.prompt, "".join(chunks))
+                        except SessionConflictError as e:
+                            # The reply was streamed but isn't part of the session
+                            event["success"] = False
+                            event["error"] = str(e)
+                    event["provider"] = provider_name
+                    event["session_id"] = session["id"]
+                yield {"type": event_type, **event}
+        finally:
+            queue.release(time.monotonic() - start)
+            if breaker is not None and not recorded:
+                breaker.abandon(probe)
+            lock.release()
+
+    return event_stream()
+
+
+async def iterate(*events: dict) -> AsyncIterator[dict]:
+    """Events known up front, as a stream."""
+    for event in events:
+        yield event
+
+
+async def stream_events(request: PromptRequest) -> AsyncIterator[dict]:
+    """
+    Start a prompt, returning its output as a stream of events.
+
+    Every event is a dict with a "type": "chunk" ({"data": str}) for each
+    piece of stdout as the CLI produces it, "tool" for each finished tool
+    call with output_format "json", and a single final "done" carrying
+    success, provider, error and execution_time. With output_format
+    "json", chunks carry the answer text only and "done" also carries
+    response, usage and tool_events. Stdout past OUTPUT_MAX_BYTES is
+    dropped, and "done" then carries truncated and output_bytes.
+
+    Output can't be taken back once sent, so request.fallback only picks
+    the first healthy, available provider up front, and hedge_delay is
+    ignored.
+
+    A slot is taken before returning, so a refusal is still raised here;
+    the stream must be consumed or closed to give it back.
+
+    Args:
+        request: PromptRequest with provider, prompt, and optional working_directory
+
+    Returns:
+        Async iterator of events
+
+    Raises:
+        HTTPException: 429 or 503 if the request is refused, or a lookup error
+    """
+    check_client_rate_limit()
+    check_run_options(request)
+    if request.session_id:
+        return await session_events(request)
+
+    provider_name = router.order(route_candidates(request))[0]
+    provider = registry.get(provider_name)
+    REQUESTS.inc(provider=provider_name)
+
+    error = unavailable_error(provider_name)
+    if error:
+        return iterate({
+            "type": "done",
+            "success": False,
+            "error": error,
+            "execution_time": 0.0,
+            "provider": provider_name
+        })
+
+    # Streams are only cached as text, since tool events aren't kept
+    streams_cacheable = not request.workspace and request.output_format == TEXT
+    if not request.bypass_cache and streams_cacheable:
+        cached = response_cache.get(provider_name, request.prompt, request.working_directory)
+        if cached:
+            CACHE_HITS.inc(provider=provider_name)
+            record_usage(provider_name, request.prompt, utf8_len(cached["response"]), 0.0)
+            return iterate(
+                {"type": "chunk", "data": cached["response"]},
+                {
+                    "type": "done",
+                    "success": True,
+                    "error": None,
+                    "execution_time": cached.get("execution_time"),
+                    "provider": provider_name,
+                    "cached": True
+                }
+            )
+
+    # Wait for a slot before responding so a full queue is still a 429
+    queue = scheduler.queue(provider_name)
+    breaker = provider.breaker
+    probe = False
+    try:
+        if breaker is not None:
+            probe = breaker.acquire()
+        rate_limiter.check_provider(provider_name)
+        await queue.acquire(request_priority(request), current_client.get())
+    except BaseException as e:
+        if breaker is not None:
+            breaker.abandon(probe)
+        if isinstance(e, SchedulerError):
+            raise scheduler_http_error(e)
+        raise
+
+    timeout = execution_timeout(provider_name, request)
+
+    async def event_stream():
+        start = time.monotonic()
+        # Output is only kept around when it may be cached
+        chunks = [] if response_cache.enabled and streams_cacheable else None
+        response_bytes = 0
+        recorded = False
+        try:
+            async with lease_workspace(request) as working_directory:
+                if request.output_format == JSON:
+                    provider_events = provider.execute_json_stream(request.prompt, working_directory)
+                else:
+                    provider_events = provider.execute_stream(request.prompt, working_directory)
+                events = with_deadline(
+                    provider_events,
+                    timeout,
+                    provider_name
+                )
+                async for event in events:
+                    event_type = event.pop("type")
+                    if event_type == "chunk":
+                        response_bytes += utf8_len(event["data"])
+                        if chunks is not None:
+                            chunks.append(event["data"])
+                            # Too large to cache inline; stop holding it in memory
+                            if response_bytes > config.OUTPUT_INLINE_BYTES:
+                                chunks = None
+                    if event_type == "done":
+                        queue.record_result(event["success"], event["execution_time"], event.get("error"))
+                        # Left unrecorded, a caller's fault leaves the breaker to abandon() below
+                        if not caller_fault(provider_name, event, timeout):
+                            router.record(provider_name, event["success"], event["execution_time"])
+                            if breaker is not None:
+                                breaker.record(event["success"], probe)
+                                recorded = True
+                        record_usage(
+                            provider_name,
+                            request.prompt,
+                            event.get("output_bytes") or response_bytes,
+                            event["execution_time"]
+                        )
+                        if chunks is not None:
+                            response_cache.set(
+                                provider_name,
+                                request.prompt,
+                                request.working_directory,
+                                {"response": "".join(chunks), **event},
+                                ttl=request.cache_ttl
+                            )
+                        if request.workspace and request.return_diff:
+                            event["diff"] = await workspace_manager.diff(request.workspace, working_directory)
+                        event["provider"] = provider_name
+                    yield {"type": event_type, **event}
+        finally:
+            queue.release(time.monotonic() - start)
+            if breaker is not None and not recorded:
+                breaker.abandon(probe)
+
+    return event_stream()
+
+
+@app.post("/api/ask/stream")
+async def ask_llm_stream(request: PromptRequest):
+    """
+    Send prompt to specified provider and stream output as Server-Sent Events.
+
+    Sends each event of stream_events() as an SSE event named by its type.
+    A refusal is still an HTTP 429 or 503, since a slot is taken before
+    responding.
+
+    Args:
+        request: PromptRequest with provider, prompt, and optional working_directory
+
+    Returns:
+        StreamingResponse with media type text/event-stream
+    """
+    events = await stream_events(request)
+
+    async def event_stream():
+        try:
+            async for event in events:
+                yield format_sse(event.pop("type"), event)
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def socket_error(prompt_id, status: int, error: str, retry_after: Optional[str] = None) -> dict:
+    """An "error" frame for /ws, with the HTTP status the request would have got."""
+    frame = {"type": "error", "id": prompt_id, "status": status, "error": error}
+    if retry_after is not None:
+        frame["retry_after"] = int(retry_after)
+    return frame
+
+
+@app.websocket("/ws")
+async def chat_socket(websocket: WebSocket):
+    """
+    Chat over one WebSocket connection: prompts in, streamed output out.
+
+    The client sends JSON messages:
+        {"type": "prompt", "id": ..., <PromptRequest fields>} runs a prompt
+        {"type": "cancel", "id": ...} stops it, killing its CLI
+        {"type": "ping"} is answered with {"type": "pong"}
+
+    Frames about a prompt carry its id: "progress" with state "queued"
+    while it waits for a slot and "running" once it has one, then the
+    events of stream_events() ("chunk", "tool", "done"). A refused prompt
+    gets an "error" frame with the HTTP status and retry_after instead,
+    and a cancelled one a "cancelled" frame. Every WS_HEARTBEAT_INTERVAL
+    seconds a "heartbeat" frame lists the prompts in flight with their
+    state, elapsed seconds and output bytes so far; it also keeps idle
+    proxies from closing the connection.
+
+    Up to WS_MAX_PROMPTS prompts may run at once on a connection, and all
+    of them are cancelled when it closes.
+    """
+    await websocket.accept()
+    outbox: asyncio.Queue = asyncio.Queue()
+    runs = {}  # Prompt id -> {"task", "state", "start", "output_bytes"}
+
+    async def write():
+        try:
+            while True:
+                await websocket.send_json(await outbox.get())
+        except Exception:
+            pass  # Connection closed; the receive loop ends too
+
+    async def heartbeat():
+        while True:
+            await asyncio.sleep(config.WS_HEARTBEAT_INTERVAL)
+            now = time.monotonic()
+            outbox.put_nowait({"type": "heartbeat", "prompts": [
+                {
+                    "id": prompt_id,
+                    "state": run["state"],
+                    "elapsed": round(now - run["start"], 3),
+                    "output_bytes": run["output_bytes"]
+                }
+                for prompt_id, run in runs.items()
+            ]})
+
+    # Frames are queued rather than awaited, so nothing can interrupt a
+    # prompt between taking its slot and starting the stream that gives it back
+    async def relay(prompt_id, request: PromptRequest, run: dict):
+        try:
+            outbox.put_nowait({"type": "progress", "id": prompt_id, "state": "queued"})
+            try:
+                events = await stream_events(request)
+            except HTTPException as e:
+                outbox.put_nowait(socket_error(
+                    prompt_id, e.status_code, str(e.detail), (e.headers or {}).get("Retry-After")
+                ))
+                return
+            run["state"] = "running"
+            outbox.put_nowait({"type": "progress", "id": prompt_id, "state": "running"})
+            try:
+                async for event in events:
+                    if event["type"] == "chunk":
+                        run["output_bytes"] += utf8_len(event["data"])
+                    outbox.put_nowait({**event, "id": prompt_id})
+            finally:
+                await events.aclose()
+        except asyncio.CancelledError:
+            outbox.put_nowait({"type": "cancelled", "id": prompt_id})
+            raise
+        except Exception as e:
+            outbox.put_nowait(socket_error(prompt_id, 500, f"Error running prompt: {str(e)}"))
+
+    def start(message: dict):
+        prompt_id = message.get("id")
+        if prompt_id is None:
+            outbox.put_nowait(socket_error(None, 400, "Prompt needs an id"))
+            return
+        if prompt_id in runs:
+            outbox.put_nowait(socket_error(prompt_id, 409, f"Prompt '{prompt_id}' is already running"))
+            return
+        if len(runs) >= config.WS_MAX_PROMPTS:
+            outbox.put_nowait(socket_error(
+                prompt_id, 429, f"Only {config.WS_MAX_PROMPTS} prompts may run at once on a connection"
+            ))
+            return
+        try:
+            request = PromptRequest(**{k: v for k, v in message.items() if k not in ("type", "id")})
+        except ValidationError as e:
+            outbox.put_nowait(socket_error(prompt_id, 422, str(e)))
+            return
+        run = {"state": "queued", "start": time.monotonic(), "output_bytes": 0}
+        run["task"] = asyncio.ensure_future(relay(prompt_id, request, run))
+        runs[prompt_id] = run
+        run["task"].add_done_callback(lambda _: runs.pop(prompt_id, None))
+
+    writer = asyncio.ensure_future(write())
+    pinger = asyncio.ensure_future(heartbeat())
+    try:
+        while True:
+            try:
+                message = json.loads(await websocket.receive_text())
+            except ValueError:
+                outbox.put_nowait(socket_error(None, 400, "Messages must be JSON"))
+                continue
+            if not isinstance(message, dict):
+                outbox.put_nowait(socket_error(None, 400, "Messages must be JSON objects"))
+                continue
+            if message.get("type") == "prompt":
+                start(message)
+            elif message.get("type") == "cancel":
+                # Prompts that already finished have nothing to cancel
+                if message.get("id") in runs:
+                    runs[message["id"]]["task"].cancel()
+            elif message.get("type") == "ping":
+                outbox.put_nowait({"type": "pong"})
+            else:
+                outbox.put_nowait(socket_error(message.get("id"), 400, f"Unknown message type {message.get('type')!r}"))
+    except WebSocketDisconnect:
+        pass
+    finally:
+        tasks = [run["task"] for run in runs.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        pinger.cancel()
+        writer.cancel()
+        await asyncio.gather(pinger, writer, return_exceptions=True)
+
+
+async def ask_llm_safe(request: PromptRequest) -> PromptResponse:
+    """
+    Run ask_llm, reporting errors in the response instead of raising.
+
+    Used where there is no HTTP response to carry an error status, such
+    as batch items and background jobs.
+    """
+    try:
+        return await ask_llm(request)
+    except HTTPException as e:
+        error = str(e.detail)
+    except Exception as e:
+        error = f"Error running prompt: {str(e)}"
+    return PromptResponse(
+        success=False,
+        provider=request.provider or config.DEFAULT_PROVIDER,
+        response="",
+        error=error
+    )
+
+
+@app.post("/api/ask/batch", response_model=BatchResponse)
+async def ask_llm_batch(batch: BatchRequest):
+    """
+    Run many prompts concurrently.
+
+    Items run through the same path as /api/ask, at most `parallelism` at
+    a time. A failing item (unknown provider, full queue, CLI error) is
+    reported in its own result and does not fail the batch. Items without
+    a priority run at batch priority.
+
+    Args:
+        batch: BatchRequest with items, optional parallelism and stream flag
+
+    Returns:
+        BatchResponse in input order, or NDJSON lines (one BatchItemResponse
+        each) in completion order when stream is true
+    """
+    if len(batch.items) > config.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(batch.items)} items; the limit is {config.BATCH_MAX_ITEMS}"
+        )
+
+    parallelism = min(batch.parallelism or config.BATCH_MAX_PARALLELISM, config.BATCH_MAX_PARALLELISM)
+    semaphore = asyncio.Semaphore(max(parallelism, 1))
+
+    async def run_item(index: int, item: PromptRequest) -> BatchItemResponse:
+        if item.priority is None:
+            item.priority = BATCH
+        async with semaphore:
+            response = await ask_llm_safe(item)
+        return BatchItemResponse(index=index, **response.model_dump())
+
+    if not batch.stream:
+        results = await asyncio.gather(
+            *(run_item(index, item) for index, item in enumerate(batch.items))
+        )
+        return BatchResponse(results=results)
+
+    async def ndjson_stream():
+        tasks = [
+            asyncio.ensure_future(run_item(index, item))
+            for index, item in enumerate(batch.items)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                yield result.model_dump_json() + "\n"
+        finally:
+            # Client went away: stop the items that haven't finished
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+
+def job_response(job: dict) -> JobResponse:
+    """Build a JobResponse from a stored job."""
+    return JobResponse(
+        id=job["id"],
+        status=job["status"],
+        provider=job["request"].provider or config.DEFAULT_PROVIDER,
+        created_at=job["created_at"],
+        started_at=job["started_at"],
+        finished_at=job["finished_at"],
+        result=job["result"]
+    )
+
+
+@app.post("/api/jobs", response_model=JobResponse, status_code=202)
+async def create_job(request: PromptRequest):
+    """
+    Run a prompt in the background and return a job id immediately.
+
+    Poll GET /api/jobs/{job_id} for the result. Job state is kept in
+    SQLite, so it survives a server restart. Jobs without a priority run
+    at batch priority.
+
+    Args:
+        request: PromptRequest, as for /api/ask
+
+    Returns:
+        JobResponse with status "queued"
+    """
+    get_provider_or_404(request.provider or config.DEFAULT_PROVIDER)
+    check_run_options(request)
+    if request.priority is None:
+        request.priority = BATCH
+    return job_response(job_manager.submit(request))
+
+
+@app.get("/api/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """
+    Get the status of a job, and its result once finished.
+
+    Returns:
+        JobResponse
+    """
+    job = job_manager.store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job_response(job)
+
+
+@app.delete("/api/jobs/{job_id}", response_model=JobResponse)
+async def cancel_job(job_id: str):
+    """
+    Cancel a queued or running job.
+
+    Returns:
+        JobResponse; 409 if the job has already finished
+    """
+    job = job_manager.store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    if not job_manager.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' has already finished")
+    # Let the task record its cancellation
+    await asyncio.sleep(0)
+    return job_response(job_manager.store.get(job_id))
+
+
+def session_response(session: dict, messages: Optional[list] = None) -> SessionResponse:
+    """Build a SessionResponse from a stored session."""
+    return SessionResponse(**session, messages=messages)
+
+
+@app.post("/api/sessions", response_model=SessionResponse, status_code=201)
+async def create_session(request: SessionCreateRequest):
+    """
+    Start a conversation session.
+
+    Send prompts with its id as session_id; each turn then sends only the
+    new message. Claude continues the conversation itself (mode "native");
+    for other providers the server replays earlier turns (mode "transcript").
+
+    Returns:
+        SessionResponse
+    """
+    provider = get_provider_or_404(request.provider or config.DEFAULT_PROVIDER)
+    return session_response(session_manager.create(provider, request.working_directory))
+
+
+@app.get("/api/sessions", response_model=SessionListResponse)
+async def list_sessions():
+    """
+    List sessions, most recently used first.
+
+    Returns:
+        SessionListResponse
+    """
+    return SessionListResponse(
+        sessions=[session_response(session) for session in session_manager.store.list()]
+    )
+
+
+@app.get("/api/sessions/{session_id}", response_model=SessionResponse)
+async def get_session(session_id: str):
+    """
+    Get a session with its messages.
+
+    Returns:
+        SessionResponse including messages
+    """
+    session = get_session_or_404(session_id)
+    return session_response(session, session_manager.store.messages(session_id))
+
+
+@app.delete("/api/sessions/{session_id}", status_code=204)
+async def delete_session(session_id: str):
+    """Delete a session and its messages."""
+    if not session_manager.delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Session '{session_id}' not found")
+
+
 @app.post("/ask", response_model=PromptResponse)
-async def ask_legacy(request: PromptRequest):
+async def ask_legacy(request: PromptRequest, raw_request: Request = None):
     """
     Legacy endpoint for backwards compatibility.
 
@@ -72,36 +1238,211 @@ async def ask_legacy(request: PromptRequest):
     """
     if not request.provider:
         request.provider = config.DEFAULT_PROVIDER
-    return await ask_llm(request)
+    return await ask_llm(request, raw_request)
 
 
 @app.get("/api/providers", response_model=ProvidersListResponse)
-async def list_providers():
+async def list_providers(refresh: bool = False):
     """
     List all available providers with their status.
 
+    Availability results are cached for AVAILABILITY_TTL seconds and
+    refreshed in the background, so polling this endpoint does not spawn
+    a process per provider. Each provider's circuit breaker state is
+    included as well.
+
+    Args:
+        refresh: Re-check every provider now instead of using cached results
+
     Returns:
         ProvidersListResponse with list of provider info
     """
-    # Check all providers in parallel for faster response
-    tasks = [
-        provider.check_availability()
-        for name, provider in registry.list_all().items()
-    ]
-    statuses = await asyncio.gather(*tasks)
+    statuses = await registry.get_all_statuses(config.AVAILABILITY_TTL, refresh=refresh)
 
     providers_info = [
         ProviderInfo(
             name=provider.name,
             display_name=provider.display_name,
-            **status
+            circuit=provider.breaker.stats() if provider.breaker is not None else None,
+            **statuses[name]
         )
-        for (name, provider), status in zip(registry.list_all().items(), statuses)
+        for name, provider in registry.list_all().items()
     ]
 
     return ProvidersListResponse(providers=providers_info)
 
 
+@app.get("/api/scheduler", response_model=SchedulerStatsResponse)
+async def scheduler_stats():
+    """
+    Report concurrency limit, in-flight count, queue depth and wait times per provider.
+
+    Returns:
+        SchedulerStatsResponse keyed by provider name
+    """
+    return SchedulerStatsResponse(providers={
+        name: scheduler.queue(name).stats()
+        for name in registry.list_all()
+    })
+
+
+@app.get("/api/routing", response_model=RoutingStatsResponse)
+async def routing_stats():
+    """
+    Report each provider's recent latency and error rate, as used for fallback and hedging.
+
+    Returns:
+        RoutingStatsResponse keyed by provider name
+    """
+    return RoutingStatsResponse(providers=router.stats())
+
+
+@app.get("/api/workspaces", response_model=WorkspacesListResponse)
+async def list_workspaces():
+    """
+    List configured workspaces and the state of their pools of copies.
+
+    Returns:
+        WorkspacesListResponse
+    """
+    return WorkspacesListResponse(workspaces=[
+        WorkspaceInfo(name=name, **pool.stats())
+        for name, pool in workspace_manager.pools.items()
+    ])
+
+
+def check_admin():
+    """
+    Allow only clients named in API_ADMINS, when API keys are configured.
+
+    Raises:
+        HTTPException: 403 for other clients
+    """
+    if api_keys and current_client.get() not in usage_admins:
+        raise HTTPException(status_code=403, detail="Only API_ADMINS may do this")
+
+
+def get_remote_worker_or_404(address: str):
+    """
+    Look up a remote worker by address.
+
+    Raises:
+        HTTPException: 404 if it isn't in REMOTE_WORKERS
+    """
+    worker = remote_cluster.get(address) if remote_cluster is not None else None
+    if worker is None:
+        raise HTTPException(status_code=404, detail=f"Remote worker '{address}' not found")
+    return worker
+
+
+@app.get("/api/remote/workers", response_model=RemoteWorkersResponse)
+async def list_remote_workers():
+    """
+    List remote worker agents with their connection state and load per provider.
+
+    Returns:
+        RemoteWorkersResponse; empty without REMOTE_WORKERS
+    """
+    workers = remote_cluster.stats() if remote_cluster is not None else []
+    return RemoteWorkersResponse(workers=[RemoteWorkerInfo(**worker) for worker in workers])
+
+
+@app.post("/api/remote/workers/{address}/drain", response_model=RemoteWorkerInfo)
+async def drain_remote_worker(address: str):
+    """
+    Stop sending new runs to a remote worker; runs already sent finish there.
+
+    The worker is drained once in_flight reaches 0. Only API_ADMINS may
+    drain workers when API keys are configured.
+
+    Args:
+        address: The worker's host:port, as in REMOTE_WORKERS
+
+    Returns:
+        RemoteWorkerInfo
+    """
+    check_admin()
+    worker = get_remote_worker_or_404(address)
+    worker.draining = True
+    return RemoteWorkerInfo(**worker.stats())
+
+
+@app.post("/api/remote/workers/{address}/resume", response_model=RemoteWorkerInfo)
+async def resume_remote_worker(address: str):
+    """
+    Send runs to a drained remote worker again.
+
+    Args:
+        address: The worker's host:port, as in REMOTE_WORKERS
+
+    Returns:
+        RemoteWorkerInfo
+    """
+    check_admin()
+    worker = get_remote_worker_or_404(address)
+    worker.draining = False
+    return RemoteWorkerInfo(**worker.stats())
+
+
+@app.get("/api/artifacts/{artifact_id}")
+async def get_artifact(artifact_id: str):
+    """
+    Download the full output of a run whose response was truncated.
+
+    Artifacts are deleted ARTIFACT_RETENTION seconds after they were written.
+
+    Returns:
+        The output as a streamed file
+    """
+    path = artifact_store.path(artifact_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Artifact '{artifact_id}' not found")
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=f"{artifact_id}.txt")
+
+
+@app.get("/api/usage", response_model=UsageResponse)
+async def get_usage(since: Optional[str] = None):
+    """
+    Report requests, prompt/response bytes and CLI seconds per client and provider.
+
+    Clients see only their own usage, except those named in API_ADMINS;
+    without API keys all usage is shown. Counts from other workers may
+    lag by up to USAGE_FLUSH_INTERVAL seconds.
+
+    Args:
+        since: Only count days on or after this date (YYYY-MM-DD, UTC)
+
+    Returns:
+        UsageResponse
+    """
+    if since is not None:
+        try:
+            time.strptime(since, "%Y-%m-%d")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="since must be a date in YYYY-MM-DD format")
+    client = current_client.get()
+    if not api_keys or client in usage_admins:
+        client = None
+    return UsageResponse(since=since, usage=usage_tracker.totals(since, client))
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """
+    Expose request, latency and subprocess metrics for Prometheus to scrape.
+
+    Returns:
+        Metrics in the Prometheus text exposition format
+    """
+    for name, provider in registry.list_all().items():
+        if provider.pool is not None:
+            POOL_IDLE_WORKERS.set(provider.pool.idle_count, provider=name)
+    return PlainTextResponse(
+        metrics.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
@@ -118,4 +1459,8 @@ async def root():
 if __name__ == "__main__":
     import uvicorn
 
-    uvicorn.run(app, host=config.HOST, port=config.PORT)
+    if config.WORKERS > 1:
+        # Each worker imports the app itself; shared state lives in SHARED_STATE_PATH
+        uvicorn.run("main:app", host=config.HOST, port=config.PORT, workers=config.WORKERS)
+    else:
+        uvicorn.run(app, host=config.HOST, port=config.PORT)
@@ -24,6 +24,23 @@ print_info() {
     echo "ℹ $1"
 }
 
+# Read a setting from the environment or .env, falling back to a default
+env_value() {
+    local value=${!1}
+    if [ -z "$value" ] && [ -f ".env" ]; then
+        value=$(grep "^$1=" .env | cut -d '=' -f2)
+    fi
+    if [ -z "$value" ]; then
+        value=$2
+    fi
+    echo $value
+}
+
+# PIDs of the uvicorn worker processes started by the server (WORKERS > 1)
+worker_pids() {
+    echo $(pgrep -P $1 -f spawn_main 2> /dev/null)
+}
+
 # Start the application
 start() {
     # Check if already running
@@ -50,14 +67,8 @@ start() {
         pip install -q -r requirements.txt
     fi
 
-    # Read port from .env (default to 5000)
-    PORT=5000
-    if [ -f ".env" ]; then
-        PORT_VAL=$(grep "^PORT=" .env | cut -d '=' -f2)
-        if [ ! -z "$PORT_VAL" ]; then
-            PORT=$PORT_VAL
-        fi
-    fi
+    PORT=$(env_value PORT 5000)
+    WORKERS=$(env_value WORKERS 1)
 
     print_info "Starting Code Agent API Wrapper..."
     # Start app in background with nohup
@@ -67,6 +78,9 @@ start() {
     echo $! > $PID_FILE
 
     print_success "Server started! (PID: $!)"
+    if [ "$WORKERS" -gt 1 ]; then
+        print_info "Workers: $WORKERS"
+    fi
     print_info "URL: http://localhost:$PORT"
     print_info "Log: tail -f $LOG_FILE"
 }
@@ -81,13 +95,20 @@ stop() {
     PID=$(cat $PID_FILE)
     if ps -p $PID > /dev/null 2>&1; then
         print_info "Stopping server (PID: $PID)..."
+        WORKER_PIDS=$(worker_pids $PID)
+        # The server stops its workers and their CLI processes on SIGTERM
         kill $PID
-        sleep 1
+        for i in 1 2 3 4 5 6 7 8 9 10; do
+            if ! ps -p $PID $WORKER_PIDS > /dev/null 2>&1; then
+                break
+            fi
+            sleep 1
+        done
 
-        # Force kill if still running
-        if ps -p $PID > /dev/null 2>&1; then
+        # Force kill the server and any worker still running
+        if ps -p $PID $WORKER_PIDS > /dev/null 2>&1; then
             print_info "Force killing server..."
-            kill -9 $PID
+            kill -9 $PID $WORKER_PIDS 2> /dev/null
         fi
 
         rm $PID_FILE
@@ -110,12 +131,15 @@ status() {
     if ps -p $PID > /dev/null 2>&1; then
         print_success "Server is running (PID: $PID)"
 
-        # Read port from .env
-        PORT=5000
-        if [ -f ".env" ]; then
-            PORT_VAL=$(grep "^PORT=" .env | cut -d '=' -f2)
-            if [ ! -z "$PORT_VAL" ]; then
-                PORT=$PORT_VAL
+        PORT=$(env_value PORT 5000)
+        WORKERS=$(env_value WORKERS 1)
+        if [ "$WORKERS" -gt 1 ]; then
+            WORKER_PIDS=$(worker_pids $PID)
+            RUNNING=$(echo $WORKER_PIDS | wc -w | tr -d ' ')
+            if [ "$RUNNING" -eq "$WORKERS" ]; then
+                print_success "Workers: $RUNNING/$WORKERS (PIDs: $WORKER_PIDS)"
+            else
+                print_error "Workers: $RUNNING/$WORKERS (PIDs: $WORKER_PIDS)"
             fi
         fi
 
@@ -173,7 +197,7 @@ Usage: ./manage.sh [COMMAND]
 Commands:
   start       Start the application
   stop        Stop the application
-  status      Check application status
+  status      Check application and worker status
   restart     Restart the application
   logs        View application logs (tail -f)
   errors      View error logs (tail -f)
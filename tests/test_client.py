@@ -0,0 +1,59 @@
+"""Tests for the Python client package."""
+
+import asyncio
+import json
+import unittest
+
+import httpx
+
+from client import AsyncClient, Client
+from client.base import prompt_body
+
+
+def echo_transport(requests: list) -> httpx.MockTransport:
+    """Transport answering /api/ask with the provider each request named, recording the bodies."""
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+        return httpx.Response(200, json={"success": True, "provider": body.get("provider"), "response": "ok"})
+    return httpx.MockTransport(handler)
+
+
+class PromptBodyTest(unittest.TestCase):
+    def test_provider_argument_fills_in_missing_provider(self):
+        self.assertEqual(prompt_body("hi", "claude", {}), {"prompt": "hi", "provider": "claude"})
+
+    def test_prompt_provider_wins_over_provider_argument(self):
+        body = prompt_body({"prompt": "hi", "provider": "gemini"}, "claude", {})
+        self.assertEqual(body["provider"], "gemini")
+
+    def test_prompt_fields_win_over_options(self):
+        body = prompt_body({"prompt": "hi", "timeout": 5}, None, {"timeout": 60, "priority": "batch"})
+        self.assertEqual(body, {"prompt": "hi", "timeout": 5, "priority": "batch"})
+
+
+class MapTest(unittest.TestCase):
+    prompts = ["a", {"prompt": "b", "provider": "gemini"}, {"prompt": "c"}]
+
+    def test_sync_map_keeps_per_prompt_provider(self):
+        requests = []
+        with Client("http://test") as client:
+            client._http.close()
+            client._http = httpx.Client(base_url="http://test", transport=echo_transport(requests))
+            results = client.map(self.prompts, provider="claude", concurrency=1)
+        self.assertEqual([result["provider"] for result in results], ["claude", "gemini", "claude"])
+
+    def test_async_map_keeps_per_prompt_provider(self):
+        async def run():
+            requests = []
+            async with AsyncClient("http://test") as client:
+                await client._http.aclose()
+                client._http = httpx.AsyncClient(base_url="http://test", transport=echo_transport(requests))
+                return await client.map(self.prompts, provider="claude")
+
+        results = asyncio.run(run())
+        self.assertEqual([result["provider"] for result in results], ["claude", "gemini", "claude"])
+
+
+if __name__ == "__main__":
+    unittest.main()